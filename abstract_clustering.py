@@ -1,50 +1,187 @@
-import json
+import argparse
 import csv
-from matplotlib import pyplot as plt
-from sklearn.cluster import KMeans
-
-with open('categorized_abstracts.json', 'r') as f:
-    abstracts = json.load(f)
-
-abstract_vectors = []
-n_categories = len(abstracts[0]['category_scores'])
-categories = list(abstracts[0]['category_scores'].keys())
-
-for a in abstracts:
-    # Ensure all vectors are of the same length
-    if len(a['category_scores']) != n_categories:
-        print(f"Warning: Abstract {a['number']} has a different number of categories.")
-        continue
-    vector = [a['category_scores'].get(c, 0) for c in sorted(a['category_scores'].keys())]
-    abstract_vectors.append(vector)
-#
-# inertias = []
-# for k in range(1, 20):
-#     kmeans = KMeans(n_clusters=k)
-#     kmeans.fit(abstract_vectors)
-#     inertias.append(kmeans.inertia_)
-#
-# plt.plot(inertias, marker='o')
-# plt.show()
-
-N_CLUSTERS = 10
-kmeans = KMeans(n_clusters=N_CLUSTERS)
-kmeans.fit(abstract_vectors)
-
-centers = kmeans.cluster_centers_
-labels = kmeans.labels_
-
-cluster_infos = []
-for cluster in range(N_CLUSTERS):
-    cluster_info = {}
-    for i, category in enumerate(categories):
-        cluster_info[category] = centers[cluster][i]
-    cluster_info['N'] = sum(labels == cluster)
-    cluster_infos.append(cluster_info)
-
-# save as csv
-with open('clusters.csv', 'w') as f:
-    writer = csv.DictWriter(f, fieldnames=cluster_infos[0].keys())
-    writer.writeheader()
-    for cluster_info in cluster_infos:
-        writer.writerow(cluster_info)
\ No newline at end of file
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Dict, List, Sequence, Union
+
+import numpy as np
+from sklearn.cluster import MiniBatchKMeans
+from sklearn.metrics import silhouette_score
+from threadpoolctl import threadpool_limits
+
+from score_matrix import load_scores, matrix_files
+
+ABSTRACTS_FILE = 'categorized_abstracts.json'
+CENTERS_FILE = 'clusters.csv'
+ASSIGNMENTS_FILE = 'cluster_assignments.csv'
+
+K_MIN = 2
+K_MAX = 20
+SILHOUETTE_SAMPLE = 2000  # abstracts used for the silhouette score, it is quadratic in the number of points
+BATCH_SIZE = 1024
+N_INIT = 3
+RANDOM_STATE = 0
+WORKERS = os.cpu_count() or 1
+
+METHOD_SILHOUETTE = 'silhouette'
+METHOD_KNEE = 'knee'
+
+
+def fit_k(matrix: Union[np.ndarray, str], k: int, silhouette_sample: int = SILHOUETTE_SAMPLE,
+          random_state: int = RANDOM_STATE) -> Dict[str, Any]:
+    """
+    Fit MiniBatchKMeans with k clusters and score the result. Runs in a worker process.
+    matrix is the score matrix, or the path of the .npy matrix, which the workers then map instead of
+    receiving a copy.
+    """
+    if isinstance(matrix, str):
+        matrix = np.load(matrix, mmap_mode='r')
+    # one thread per worker, the workers already use all cores
+    with threadpool_limits(1):
+        kmeans = MiniBatchKMeans(n_clusters=k, batch_size=BATCH_SIZE, n_init=N_INIT, random_state=random_state)
+        labels = kmeans.fit_predict(matrix)
+        silhouette = None
+        if 1 < len(set(labels)) < len(matrix):
+            silhouette = float(silhouette_score(matrix, labels, sample_size=min(silhouette_sample, len(matrix)),
+                                                random_state=random_state))
+    return {'k': k, 'inertia': float(kmeans.inertia_), 'silhouette': silhouette,
+            'labels': labels, 'centers': kmeans.cluster_centers_}
+
+
+def sweep(matrix: Union[np.ndarray, str], n_rows: int, k_values: Sequence[int], workers: int = WORKERS,
+          silhouette_sample: int = SILHOUETTE_SAMPLE) -> List[Dict[str, Any]]:
+    """Fit all the k values in a process pool. Returns the fit of each k, in the order of k_values."""
+    k_values = [k for k in k_values if 1 <= k <= n_rows]
+    if workers <= 1 or len(k_values) == 1:
+        return [fit_k(matrix, k, silhouette_sample) for k in k_values]
+    with ProcessPoolExecutor(max_workers=min(workers, len(k_values))) as executor:
+        return list(executor.map(fit_k, [matrix] * len(k_values), k_values, [silhouette_sample] * len(k_values)))
+
+
+def inertia_knee(k_values: Sequence[int], inertias: Sequence[float]) -> int:
+    """k at the knee of the inertia curve: the point farthest below the line from the first to the last point."""
+    if len(k_values) < 3:
+        return k_values[0]
+    x = np.asarray(k_values, dtype=float)
+    y = np.asarray(inertias, dtype=float)
+    x = (x - x[0]) / (x[-1] - x[0])
+    y = (y - y[-1]) / ((y[0] - y[-1]) or 1)
+    # the normalized curve decreases from (0, 1) to (1, 0), its distance below the line is 1 - x - y
+    return int(k_values[int(np.argmax(1 - x - y))])
+
+
+def select_k(results: List[Dict[str, Any]], method: str = METHOD_SILHOUETTE) -> Dict[str, Any]:
+    """Fit with the best k: the highest silhouette score, or the knee of the inertia curve."""
+    if method == METHOD_SILHOUETTE:
+        scored = [r for r in results if r['silhouette'] is not None]
+        if scored:
+            return max(scored, key=lambda r: r['silhouette'])
+        print("Warning: no silhouette score, selecting k at the inertia knee.")
+    elif method != METHOD_KNEE:
+        raise ValueError(f"Unknown k selection method: {method}")
+    k = inertia_knee([r['k'] for r in results], [r['inertia'] for r in results])
+    return next(r for r in results if r['k'] == k)
+
+
+def clustered_scores(abstracts_file: str):
+    """
+    Category scores of the abstracts to cluster, read from the memory-mapped matrix of score_matrix.py.
+    Abstracts without category scores (a row of zeros) are not clustered.
+
+    Returns:
+        Matrix, or the path of the exported .npy matrix if all its rows are clustered, so that the workers
+        map it instead of receiving a copy; categories of the columns; references of the rows
+    """
+    scores = load_scores(abstracts_file, export=False)
+    scored = np.flatnonzero(np.any(scores.matrix, axis=1))
+    if len(scored) == len(scores):
+        matrix = matrix_files(abstracts_file)[0] if isinstance(scores.matrix, np.memmap) else scores.matrix
+        return matrix, scores.categories, scores.references
+    print(f"Warning: {len(scores) - len(scored)} abstracts without category scores are not clustered.")
+    return np.asarray(scores.matrix[scored]), scores.categories, [scores.references[i] for i in scored]
+
+
+def cluster_abstracts(matrix: Union[np.ndarray, str], n_rows: int, k_values: Sequence[int],
+                      method: str = METHOD_SILHOUETTE, workers: int = WORKERS,
+                      silhouette_sample: int = SILHOUETTE_SAMPLE):
+    """
+    Cluster the n_rows abstracts of a score matrix (see clustered_scores), selecting k among k_values.
+
+    Returns:
+        Fit of the selected k, fits of all k values
+    """
+    results = sweep(matrix, n_rows, k_values, workers, silhouette_sample)
+    for r in results:
+        silhouette = f"{r['silhouette']:.3f}" if r['silhouette'] is not None else '-'
+        print(f"k={r['k']:3d}  inertia={r['inertia']:12.1f}  silhouette={silhouette}")
+    best = select_k(results, method)
+    print(f"Selected k={best['k']} ({method})")
+    return best, results
+
+
+def write_centers(output_file: str, result: Dict[str, Any], categories: List[str]):
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.DictWriter(f, fieldnames=['cluster'] + categories + ['N'])
+        writer.writeheader()
+        for cluster, center in enumerate(result['centers']):
+            row = {'cluster': cluster, 'N': int(np.sum(result['labels'] == cluster))}
+            row.update(zip(categories, center.tolist()))
+            writer.writerow(row)
+
+
+def write_assignments(output_file: str, result: Dict[str, Any], numbers: List[Any]):
+    with open(output_file, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['number', 'cluster'])
+        for number, label in zip(numbers, result['labels']):
+            writer.writerow([number, int(label)])
+
+
+def load_assignments(assignments_file: str = ASSIGNMENTS_FILE) -> Dict[str, int]:
+    """Cluster of each abstract number (as a string), from the file written by this script."""
+    with open(assignments_file, 'r', newline='') as f:
+        return {row['number']: int(row['cluster']) for row in csv.DictReader(f)}
+
+
+def plot_sweep(results: List[Dict[str, Any]]):
+    from matplotlib import pyplot as plt
+    k_values = [r['k'] for r in results]
+    fig, (ax_inertia, ax_silhouette) = plt.subplots(1, 2, figsize=(10, 4))
+    ax_inertia.plot(k_values, [r['inertia'] for r in results], marker='o')
+    ax_inertia.set_xlabel('k')
+    ax_inertia.set_ylabel('inertia')
+    ax_silhouette.plot(k_values, [r['silhouette'] for r in results], marker='o')
+    ax_silhouette.set_xlabel('k')
+    ax_silhouette.set_ylabel('silhouette')
+    plt.show()
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Cluster the abstracts by category scores')
+    parser.add_argument('abstracts_file', nargs='?', default=ABSTRACTS_FILE)
+    parser.add_argument('--k', type=int, help='Number of clusters (default: select it in the k range)')
+    parser.add_argument('--k-min', type=int, default=K_MIN)
+    parser.add_argument('--k-max', type=int, default=K_MAX)
+    parser.add_argument('--method', choices=[METHOD_SILHOUETTE, METHOD_KNEE], default=METHOD_SILHOUETTE,
+                        help='Selection of k: best silhouette score on a sample, or knee of the inertia curve')
+    parser.add_argument('--silhouette-sample', type=int, default=SILHOUETTE_SAMPLE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--centers', default=CENTERS_FILE)
+    parser.add_argument('--assignments', default=ASSIGNMENTS_FILE)
+    parser.add_argument('--plot', action='store_true', help='Plot inertia and silhouette score against k')
+    args = parser.parse_args()
+
+    matrix, categories, numbers = clustered_scores(args.abstracts_file)
+    if args.k is not None and not 1 <= args.k <= len(numbers):
+        parser.error(f"--k must be between 1 and the number of abstracts with category scores ({len(numbers)})")
+    k_values = [args.k] if args.k is not None else range(args.k_min, args.k_max + 1)
+    if not any(1 <= k <= len(numbers) for k in k_values):
+        parser.error(f"no k between --k-min and --k-max fits the {len(numbers)} abstracts with category scores")
+    best, results = cluster_abstracts(matrix, len(numbers), k_values, args.method, args.workers,
+                                      args.silhouette_sample)
+    write_centers(args.centers, best, categories)
+    write_assignments(args.assignments, best, numbers)
+    print(f"{best['k']} cluster centers written to {args.centers}, assignments of {len(numbers)} abstracts "
+          f"written to {args.assignments}")
+    if args.plot:
+        plot_sweep(results)
@@ -1,21 +1,20 @@
-import csv
 import json
 import re
 import os
 from typing import List, Dict, Tuple
-import anthropic
 
 #from unidecode import unidecode
 # Do not remove unicode characters, as they may be important for the text
 def unidecode(text: str) -> str:
     return text
-from api_token import CLAUDE_API_KEY
+from abstract_store import load_store
+from llm_client import create_client
 
 ABSTRACT_EXPORT = 'Export_ESMRMB_2025_Abstract_20250520_141544.csv'
 IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
 
 
-client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+client = create_client('abstract_csv_to_json_print')
 
 def create_parsing_prompt(text: str) -> str:
     """
@@ -59,12 +58,13 @@ Text to parse:
     return prompt
 
 
-def parse_refs(text: str):
+def parse_refs(text: str, raise_errors: bool = False):
     """
     Parse a single text using Claude API.
 
     Args:
         text: The academic text to parse
+        raise_errors: Re-raise API and JSON errors instead of returning a "PARSE FAILED" result
 
     Returns:
         Dictionary with parsed sections
@@ -122,6 +122,8 @@ def parse_refs(text: str):
     except json.JSONDecodeError as e:
         print(f"JSON parsing error: {e}")
         print(f"Response was: {response_text}")
+        if raise_errors:
+            raise
         return {
             "Acknowledgments": "PARSE FAILED",
             "Data and Code Availability Statement": None,
@@ -130,6 +132,8 @@ def parse_refs(text: str):
         }
     except Exception as e:
         print(f"API or other error: {e}")
+        if raise_errors:
+            raise
         return {
             "Acknowledgments": "PARSE FAILED",
             "Data and Code Availability Statement": None,
@@ -236,52 +240,49 @@ def process_figure_field(field: str):
     return figures, caption_refs, captions
 
 if __name__ == "__main__":
-    with open(ABSTRACT_EXPORT, 'r', encoding='ISO-8859-15') as f:
-        reader = csv.DictReader(f, delimiter=';', quotechar='"')
-        abstracts = []
-        row_number = 0
-        for row in reader:
-            #if row_number > 10:
-            #    break
-            row_number += 1
-
-            print(f"Processing row {row_number}: {row['Reference']} - {row['Titre']}")
-
-            if row['Statut'] != 'Reviewing Pending':
-                continue
-            abstract = {}
-            abstract['title'] = unidecode(row['Titre'])
-            abstract['reference'] = '#' + row['Reference']
-
-            authors_line = re.sub(multispace_cleanup_re, ' ', unidecode(row['Auteurs']))
-            authors_list = [unidecode(a.strip()) for a in authors_line.split(',')]
-            abstract['authors'] = parse_author_list(authors_line)
-            speaker = unidecode(row['Orateur nom'].strip())
-            abstract['speaker'] = 0
-            for i, (author_name, affiliations) in enumerate(abstract['authors']):
-                if speaker.lower() in author_name.lower():
-                    abstract['speaker'] = i
-                    break
-
-            affiliations = unidecode(row['Affiliations']).splitlines()
-            # clean up affiliations
-            abstract['affiliations'] = [re.sub(aff_cleanup_re, '', aff) for aff in affiliations if aff.strip()]
-
-            abstract['introduction'] = unidecode(row['Résumé'])
-            abstract['methods'] = unidecode(row['Methods'])
-            abstract['results'] = unidecode(row['Results'])
-            abstract['discussion'] = unidecode(row['Discussion'])
-            abstract['conclusion'] = unidecode(row['Conclusion'])
-            abstract['original_availability'] = unidecode(row['Data and Code Availability Statement and References (Information not included in the word counting)'])
-            refs = parse_refs(abstract['original_availability'])
-            #refs = {'Acknowledgments': unidecode(row['Data and Code Availability Statement and References (Information not included in the word counting)'])}
-            abstract['acknowledgments'] = refs.get('Acknowledgments', '')
-            abstract['data_and_code_availability'] = refs.get('Data and Code Availability Statement', '')
-            abstract['references'] = refs.get('References', [])
-            abstract['figure_files'], abstract['figure_refs'], abstract['figure_captions'] = process_figure_field(unidecode(row['Figure']))
-            abstracts.append(abstract)
-
-            with open('abstracts_for_print.json', 'w', encoding='utf-8') as json_file:
-                json.dump(abstracts, json_file, ensure_ascii=False, indent=4)
+    abstracts = []
+    row_number = 0
+    for row in load_store(ABSTRACT_EXPORT):
+        #if row_number > 10:
+        #    break
+        row_number += 1
+
+        print(f"Processing row {row_number}: {row['reference']} - {row['title']}")
 
+        if row['status'] != 'Reviewing Pending':
+            continue
+        abstract = {}
+        abstract['title'] = unidecode(row['title'])
+        abstract['reference'] = row['reference']
+
+        authors_line = re.sub(multispace_cleanup_re, ' ', unidecode(row['authors']))
+        authors_list = [unidecode(a.strip()) for a in authors_line.split(',')]
+        abstract['authors'] = parse_author_list(authors_line)
+        speaker = unidecode(row['speaker_last_name'])
+        abstract['speaker'] = 0
+        for i, (author_name, affiliations) in enumerate(abstract['authors']):
+            if speaker.lower() in author_name.lower():
+                abstract['speaker'] = i
+                break
+
+        affiliations = unidecode(row['affiliations']).splitlines()
+        # clean up affiliations
+        abstract['affiliations'] = [re.sub(aff_cleanup_re, '', aff) for aff in affiliations if aff.strip()]
+
+        abstract['introduction'] = unidecode(row['introduction'])
+        abstract['methods'] = unidecode(row['methods'])
+        abstract['results'] = unidecode(row['results'])
+        abstract['discussion'] = unidecode(row['discussion'])
+        abstract['conclusion'] = unidecode(row['conclusion'])
+        abstract['original_availability'] = unidecode(row['availability'])
+        refs = parse_refs(abstract['original_availability'])
+        #refs = {'Acknowledgments': unidecode(row['availability'])}
+        abstract['acknowledgments'] = refs.get('Acknowledgments', '')
+        abstract['data_and_code_availability'] = refs.get('Data and Code Availability Statement', '')
+        abstract['references'] = refs.get('References', [])
+        abstract['figure_files'], abstract['figure_refs'], abstract['figure_captions'] = process_figure_field(unidecode(row['figures']))
+        abstracts.append(abstract)
+
+        with open('abstracts_for_print.json', 'w', encoding='utf-8') as json_file:
+            json.dump(abstracts, json_file, ensure_ascii=False, indent=4)
 
@@ -0,0 +1,139 @@
+import hashlib
+import os
+
+import pypandoc
+from docx.image.exceptions import UnrecognizedImageError
+from docx.shared import Inches
+
+import figure_cache
+import figure_names
+import figure_preprocessing
+from figure_cache import figure_image
+from figure_manifest import load_manifest
+
+IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
+
+# Page margins of the PDF files in inches, passed to pandoc and set in the docx for the office converter
+PAGE_MARGINS = {'top': 1.5, 'bottom': 1, 'left': 1.25, 'right': 1.25}
+
+PDF_EXTRA_ARGS = [arg for side, inches in PAGE_MARGINS.items() for arg in ['-V', f'geometry:{side}={inches}in']]
+
+
+def renderer_hash():
+    """Hash of the rendering code, so that cached renderings are invalidated when it changes."""
+    h = hashlib.sha256()
+    # figure_preprocessing crops the rasterized figures, figure_names resolves the figure files
+    for module_file in [__file__, figure_cache.__file__, figure_preprocessing.__file__, figure_names.__file__]:
+        with open(module_file, 'rb') as f:
+            h.update(f.read())
+    return h.hexdigest()
+
+
+def add_abstract(doc, abstract, heading):
+    """
+    Append an abstract to a docx document.
+
+    Args:
+        doc: python-docx Document
+        abstract: Abstract in the abstracts_for_print.json format
+        heading: Text before the title, e.g. the reference or the program number
+    """
+    # figures that are missing or broken according to the manifest (figure_manifest.py) are skipped
+    manifest = load_manifest()
+    title_par = doc.add_paragraph()
+    title_par.add_run(heading + ' \n' + abstract['title']).bold = True
+    authors_par = doc.add_paragraph('')
+    for i, (author_name, affiliations) in enumerate(abstract['authors']):
+        auth_run = authors_par.add_run(author_name)
+        if i == abstract['speaker']:
+            auth_run.underline = True
+        aff_run = authors_par.add_run(affiliations)
+        aff_run.font.superscript = True
+        if (i + 1) < len(abstract['authors']):
+            authors_par.add_run(', ')
+
+    affiliations_par = doc.add_paragraph('')
+    affiliations_par.italic = True
+    for i, aff in enumerate(abstract['affiliations']):
+        aff_run = affiliations_par.add_run(f'{i+1} {aff}').italic = True
+        if (i + 1) < len(abstract['affiliations']):
+            affiliations_par.add_run('\n')
+
+    p = doc.add_paragraph('')
+    p.add_run('Introduction: ').bold = True
+    p.add_run(abstract['introduction'])
+
+    p = doc.add_paragraph('')
+    p.add_run('Methods: ').bold = True
+    p.add_run(abstract['methods'])
+
+    p = doc.add_paragraph('')
+    p.add_run('Results: ').bold = True
+    p.add_run(abstract['results'])
+
+    p = doc.add_paragraph('')
+    p.add_run('Discussion: ').bold = True
+    p.add_run(abstract['discussion'])
+
+    p = doc.add_paragraph('')
+    p.add_run('Conclusion: ').bold = True
+    p.add_run(abstract['conclusion'])
+
+    if abstract['acknowledgments']:
+        p = doc.add_paragraph('')
+        p.add_run('Acknowledgments: ').bold = True
+        p.add_run(abstract['acknowledgments'])
+
+    if abstract['data_and_code_availability']:
+        p = doc.add_paragraph('')
+        p.add_run('Data and Code Availability: ').bold = True
+        p.add_run(abstract['data_and_code_availability'])
+
+    if abstract['figure_files']:
+        for f_num, figure in enumerate(abstract['figure_files']):
+            figure_path = figure_names.figure_path(figure, IMAGE_FOLDER)
+            figure = os.path.basename(figure_path)
+            if manifest is not None and not manifest.is_valid(figure_path):
+                print("Warning: Invalid figure file:", figure_path, manifest.get(figure_path)['error'])
+                continue
+            img_path = figure_image(figure_path)
+            if img_path is None:
+                print("Warning: PDF conversion failed for", figure_path)
+                continue
+            try:
+                doc.add_picture(img_path, width=Inches(5.0))
+            except FileNotFoundError:
+                print("Warning: Figure file not found:", IMAGE_FOLDER + figure)
+                continue
+            except UnrecognizedImageError:
+                print("Warning: Unrecognized image format for file:", IMAGE_FOLDER + figure)
+                continue
+            p = doc.add_paragraph('')
+            try:
+                if not abstract['figure_refs'][f_num]:
+                    p.add_run('Figure ' + str(f_num + 1) + ' ').bold = True
+                else:
+                    p.add_run(abstract['figure_refs'][f_num]).bold = True
+                p.add_run(abstract['figure_captions'][f_num])
+            except IndexError:
+                print('Warning: Figure caption not found for figure', f_num + 1)
+
+    if abstract['references']:
+        p = doc.add_paragraph('')
+        p.add_run('References:\n').bold = True
+        for i, ref in enumerate(abstract['references']):
+            ref_run = p.add_run(f'{i+1}. {ref}')
+            if i+1 < len(abstract['references']):
+                p.add_run('\n')
+
+
+def set_page_margins(doc):
+    for section in doc.sections:
+        section.top_margin = Inches(PAGE_MARGINS['top'])
+        section.bottom_margin = Inches(PAGE_MARGINS['bottom'])
+        section.left_margin = Inches(PAGE_MARGINS['left'])
+        section.right_margin = Inches(PAGE_MARGINS['right'])
+
+
+def docx_to_pdf(docx_file, pdf_file):
+    pypandoc.convert_file(docx_file, 'pdf', outputfile=pdf_file, extra_args=PDF_EXTRA_ARGS)
@@ -0,0 +1,262 @@
+import argparse
+import csv
+import os
+import pickle
+import random
+import tempfile
+import time
+from collections import Counter
+from typing import Any, Callable, Dict, Iterator, List, Tuple
+
+# Abstract export of the conference management system
+EXPORT_ENCODING = 'ISO-8859-15'
+EXPORT_DELIMITER = ';'
+
+STORE_SUFFIX = '.store.pkl'
+STORE_VERSION = 2
+
+
+def to_reference(value: str) -> str:
+    return '#' + value
+
+
+def to_pitch(value: str) -> bool:
+    return value.startswith('Y')
+
+
+# Typed fields: name -> (export column, converter). The converter receives the value with normalized line endings.
+# All the other columns (e.g. review scores and comments) are stored as strings under their header.
+FIELDS: Dict[str, Tuple[str, Callable[[str], Any]]] = {
+    'reference': ('Reference', to_reference),
+    'status': ('Statut', str),
+    'theme': ('Theme', str),
+    'title': ('Titre', str),
+    'authors': ('Auteurs', str),
+    'speaker_last_name': ('Orateur nom', str),
+    'affiliations': ('Affiliations', str),
+    'keywords': ('Mots-clefs', str),
+    'primary_subcategory': ('Primary Sub-Category', str),
+    'secondary_subcategory': ('Secondary Sub-Category', str),
+    'introduction': ('Résumé', str),
+    'methods': ('Methods', str),
+    'results': ('Results', str),
+    'discussion': ('Discussion', str),
+    'conclusion': ('Conclusion', str),
+    'availability': ('Data and Code Availability Statement and References (Information not included in the word counting)', str),
+    'figures': ('Figure', str),
+    'preferred_format': ('Format souhaité', str),
+    'submitter_first_name': ('Soumissionaire prénom', str),
+    'submitter_last_name': ('Soumissionaire nom', str),
+    'submitter_email': ('Soumissionaire Email', str),
+}
+# Fields whose surrounding whitespace is stripped, as the scripts did when reading the export directly
+STRIPPED_FIELDS = {'speaker_last_name'}
+# The header of the general audience pitch column contains the full question and changes every year
+PITCH_FIELD = 'general_audience_pitch'
+PITCH_COLUMN_MARKER = 'COMPETITION'
+
+
+def normalize_value(value: str) -> str:
+    """Normalize the line endings of an exported field."""
+    if value is None:
+        return ''
+    return value.replace('\r\n', '\n').replace('\r', '\n')
+
+
+class AbstractRecord:
+    """Read-only view of one row of an ExportStore."""
+
+    __slots__ = ('store', 'row')
+
+    def __init__(self, store: 'ExportStore', row: int):
+        self.store = store
+        self.row = row
+
+    def __getitem__(self, name: str):
+        return self.store.columns[name][self.row]
+
+    def __contains__(self, name: str):
+        return name in self.store.columns
+
+    def get(self, name: str, default=None):
+        column = self.store.columns.get(name)
+        if column is None:
+            return default
+        return column[self.row]
+
+
+class ExportStore:
+    """
+    Column-oriented copy of an abstract export: one list per field, with a reference -> row index.
+
+    Fields in FIELDS are available under their typed name, all the other columns under their original header.
+    """
+
+    def __init__(self, columns: Dict[str, List[Any]], source: str = None):
+        self.columns = columns
+        self.source = source
+        self.index = {reference: i for i, reference in enumerate(columns.get('reference', []))}
+
+    def __len__(self):
+        return len(self.columns.get('reference', []))
+
+    def __iter__(self) -> Iterator[AbstractRecord]:
+        for i in range(len(self)):
+            yield AbstractRecord(self, i)
+
+    def get(self, reference: str):
+        """Record of an abstract reference ('#1234'), or None."""
+        row = self.index.get(reference)
+        return AbstractRecord(self, row) if row is not None else None
+
+    def column(self, name: str) -> List[Any]:
+        return self.columns[name]
+
+
+def ingest_export(export_file: str, encoding: str = EXPORT_ENCODING) -> ExportStore:
+    """
+    Read an abstract export in a single streaming pass, decoding and converting every field once.
+
+    Args:
+        export_file: Path to the ';'-delimited CSV export
+        encoding: Encoding of the export
+
+    Returns:
+        ExportStore with the content of the export. A duplicated column is stored as strings under its header
+        with a ' (2)', ' (3)'... suffix.
+    """
+    with open(export_file, 'r', encoding=encoding, newline='') as f:
+        reader = csv.reader(f, delimiter=EXPORT_DELIMITER, quotechar='"')
+        header = next(reader)
+
+        # resolve the position and the converter of each column once
+        header_to_field = {column: (name, converter) for name, (column, converter) in FIELDS.items()}
+        columns = {}
+        appenders = []
+        occurrences = Counter()
+        for column in header:
+            if column in header_to_field:
+                name, converter = header_to_field[column]
+            elif PITCH_COLUMN_MARKER in column:
+                name, converter = PITCH_FIELD, to_pitch
+            else:
+                name, converter = column, None
+            occurrences[column] += 1
+            if occurrences[column] > 1 or name in columns:
+                # only the first column of a typed field is typed, the others are kept as strings
+                name, converter = column, None
+                if occurrences[column] > 1:
+                    name = f'{column} ({occurrences[column]})'
+                print(f"Warning: duplicate column {column!r} in {export_file}, stored as {name!r}")
+            columns[name] = []
+            appenders.append((columns[name].append, converter, name in STRIPPED_FIELDS))
+
+        for row in reader:
+            if not row:
+                continue
+            row += [''] * (len(appenders) - len(row))
+            for (append, converter, strip), value in zip(appenders, row):
+                value = normalize_value(value)
+                if strip:
+                    value = value.strip()
+                append(converter(value) if converter else value)
+
+    return ExportStore(columns, export_file)
+
+
+def _signature(export_file: str, encoding: str):
+    stat = os.stat(export_file)
+    return STORE_VERSION, stat.st_size, stat.st_mtime_ns, encoding
+
+
+def load_store(export_file: str, encoding: str = EXPORT_ENCODING) -> ExportStore:
+    """
+    Load the store of an export, ingesting the export only if it changed since the store was written.
+
+    The store is kept next to the export, in a file with the STORE_SUFFIX extension. A store that cannot be read
+    is ingested again.
+    """
+    store_file = export_file + STORE_SUFFIX
+    signature = _signature(export_file, encoding)
+    if os.path.exists(store_file):
+        try:
+            with open(store_file, 'rb') as f:
+                stored_signature, columns = pickle.load(f)
+            if stored_signature == signature:
+                return ExportStore(columns, export_file)
+        except (EOFError, pickle.UnpicklingError, ValueError) as e:
+            print(f"Warning: cannot read {store_file} ({type(e).__name__}: {e}), ingesting {export_file} again")
+
+    store = ingest_export(export_file, encoding)
+    # the temporary file is per process, as the stages of a parallel pipeline run may load the same export
+    tmp_file = f'{store_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        pickle.dump((signature, store.columns), f, protocol=pickle.HIGHEST_PROTOCOL)
+    os.replace(tmp_file, store_file)
+    return store
+
+
+def write_synthetic_export(export_file: str, n_rows: int, seed: int = 0):
+    """Write an export with the same columns as the real one and random content of a realistic size."""
+    rng = random.Random(seed)
+    words = ['magnetic', 'resonance', 'diffusion', 'relaxometry', 'brain', 'cardiac', 'quantitative',
+             'sequence', 'reconstruction', 'validation', 'phantom', 'patients', 'signal', 'été', 'contrast']
+
+    def text(n_words):
+        return ' '.join(rng.choice(words) for _ in range(n_words))
+
+    header = [column for column, _ in FIELDS.values()] + \
+             ['\xa0COMPETITION: I would like to participate in the General Audience Pitches Competition'] + \
+             [f'Relevance of the scientific question {i}' for i in range(1, 4)] + \
+             [f'Commentaires {i}' for i in range(1, 4)]
+    with open(export_file, 'w', encoding=EXPORT_ENCODING, newline='') as f:
+        writer = csv.writer(f, delimiter=EXPORT_DELIMITER, quotechar='"')
+        writer.writerow(header)
+        for i in range(n_rows):
+            values = {column: text(5) for column, _ in FIELDS.values()}
+            values['Reference'] = str(10000 + i)
+            values['Statut'] = 'Reviewing Pending'
+            values['Titre'] = text(15)
+            values['Auteurs'] = ', '.join(f'{text(1)}  {text(1)} (1, 2)' for _ in range(8))
+            for column in ['Résumé', 'Methods', 'Results', 'Discussion', 'Conclusion']:
+                values[column] = text(80) + '\r\n' + text(40)
+            writer.writerow([values.get(column, '') for column, _ in FIELDS.values()] +
+                            [rng.choice(['Yes', 'No'])] +
+                            [str(rng.randint(1, 10)) for _ in range(3)] +
+                            [text(20) for _ in range(3)])
+
+
+def benchmark(n_rows: int = 10000):
+    with tempfile.TemporaryDirectory() as tmpdir:
+        export_file = os.path.join(tmpdir, 'synthetic_export.csv')
+        write_synthetic_export(export_file, n_rows)
+        size_mb = os.path.getsize(export_file) / 1e6
+
+        t0 = time.perf_counter()
+        store = load_store(export_file)
+        ingest_time = time.perf_counter() - t0
+
+        t0 = time.perf_counter()
+        load_store(export_file)
+        load_time = time.perf_counter() - t0
+
+    print(f"Synthetic export: {len(store)} rows, {size_mb:.1f} MB")
+    print(f"Ingest: {ingest_time:.2f} s ({len(store) / ingest_time:.0f} rows/s, {size_mb / ingest_time:.1f} MB/s)")
+    print(f"Load of the stored columns: {load_time * 1000:.1f} ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Ingest an abstract export into a column store')
+    parser.add_argument('export', nargs='?', help='CSV export to ingest')
+    parser.add_argument('--encoding', default=EXPORT_ENCODING)
+    parser.add_argument('--benchmark', type=int, nargs='?', const=10000, metavar='ROWS',
+                        help='Measure the ingest throughput on a synthetic export')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    elif args.export:
+        store = load_store(args.export, args.encoding)
+        print(f"{len(store)} abstracts, {len(store.columns)} columns in {args.export + STORE_SUFFIX}")
+    else:
+        parser.print_help()
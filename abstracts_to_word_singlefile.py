@@ -1,144 +1,234 @@
 # create doc file
-import pypandoc
 from docx import Document
-from docx.image.exceptions import UnrecognizedImageError
-from docx.shared import Inches
+import argparse
+import csv
 import json
+import multiprocessing
+import multiprocessing.connection
 import os
-from unidecode import unidecode
-import tempfile
-from pdf2image import convert_from_path
-from PIL import Image, ImageChops
+import signal
+import time
+
+from abstract_docx import add_abstract, docx_to_pdf, set_page_margins
+from batch_converter import ENGINE_LIBREOFFICE, ENGINE_PANDOC, BatchConverter
+from figure_cache import prune_cache
 
-IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
 OUTPUT_FOLDER  = '/media/bigboy2/ESMRMB2025/abstracts/'
+REPORT_FILE = 'render_report.csv'
+
+# Abstracts rendered in parallel by a pool of worker processes
+WORKERS = os.cpu_count() or 1
+TIMEOUT = 300  # seconds per abstract
+
+STATUS_OK = 'ok'
+STATUS_SKIPPED = 'skipped'
+STATUS_ERROR = 'error'
+STATUS_TIMEOUT = 'timeout'
 
-def crop_whitespace(img):
-    bg = Image.new(img.mode, img.size, (255, 255, 255))
-    diff = ImageChops.difference(img, bg)
-    bbox = diff.getbbox()
-    if bbox:
-        return img.crop(bbox)
-    return img
 
-os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+def output_base_name(abstract):
+    return os.path.join(OUTPUT_FOLDER, abstract['reference'][1:])
 
-with open('abstracts_for_print.json', 'r', encoding='utf-8') as f:
-    abstracts = json.load(f)
 
-for i, abstract in enumerate(abstracts):
-    print(f'Processing abstract {i+1}: {abstract["reference"]} - {abstract["title"]}')
-    output_base_name = os.path.join(OUTPUT_FOLDER, f'{abstract['reference'][1:]}')
-    if os.path.exists(output_base_name + '.pdf'):
-        continue
+def render_abstract(abstract, convert=True):
+    """
+    Write the docx of an abstract and, with convert, convert it to PDF.
+    Raises an exception if the conversion fails.
+    """
     doc = Document()
-    title_par = doc.add_paragraph()
-    title_par.add_run(abstract['reference'] + ' \n' + abstract['title']).bold = True
-    authors_par = doc.add_paragraph('')
-    for i, (author_name, affiliations) in enumerate(abstract['authors']):
-        auth_run = authors_par.add_run(author_name)
-        if i == abstract['speaker']:
-            auth_run.underline = True
-        aff_run = authors_par.add_run(affiliations)
-        aff_run.font.superscript = True
-        if (i + 1) < len(abstract['authors']):
-            authors_par.add_run(', ')
-
-    affiliations_par = doc.add_paragraph('')
-    affiliations_par.italic = True
-    for i, aff in enumerate(abstract['affiliations']):
-        aff_run = affiliations_par.add_run(f'{i+1} {aff}').italic = True
-        if (i + 1) < len(abstract['affiliations']):
-            affiliations_par.add_run('\n')
-
-    p = doc.add_paragraph('')
-    p.add_run('Introduction: ').bold = True
-    p.add_run(abstract['introduction'])
-
-    p = doc.add_paragraph('')
-    p.add_run('Methods: ').bold = True
-    p.add_run(abstract['methods'])
-
-    p = doc.add_paragraph('')
-    p.add_run('Results: ').bold = True
-    p.add_run(abstract['results'])
-
-    p = doc.add_paragraph('')
-    p.add_run('Discussion: ').bold = True
-    p.add_run(abstract['discussion'])
-
-    p = doc.add_paragraph('')
-    p.add_run('Conclusion: ').bold = True
-    p.add_run(abstract['conclusion'])
-
-    if abstract['acknowledgments']:
-        p = doc.add_paragraph('')
-        p.add_run('Acknowledgments: ').bold = True
-        p.add_run(abstract['acknowledgments'])
-
-    if abstract['data_and_code_availability']:
-        p = doc.add_paragraph('')
-        p.add_run('Data and Code Availability: ').bold = True
-        p.add_run(abstract['data_and_code_availability'])
-
-    if abstract['figure_files']:
-        for f_num, figure in enumerate(abstract['figure_files']):
-            figure = unidecode(figure.replace('?', ''))
-            figure_path = os.path.join(IMAGE_FOLDER, figure)
-            img_path = figure_path
-            is_temp = False
-
-            if figure.lower().endswith('.pdf'):
-                print("Converting PDF figure to image:", figure_path)
-                with tempfile.TemporaryDirectory() as tmpdir:
-                    images = convert_from_path(figure_path, dpi=150, output_folder=tmpdir, fmt='png')
-                    if images:
-                        img = images[0]
-                        img = crop_whitespace(img)
-                        img_path = figure_path + '.png'
-                        img.save(img_path)
-                        is_temp = True
-                    else:
-                        print("Warning: PDF conversion failed for", figure_path)
-                        continue
+    add_abstract(doc, abstract, abstract['reference'])
+    set_page_margins(doc)
+    base_name = output_base_name(abstract)
+    doc.save(base_name + '.docx')
+    if convert:
+        docx_to_pdf(base_name + '.docx', base_name + '.pdf')
+
+
+def render_worker(tasks, connection, convert=True):
+    """
+    Process target of a render worker: render the (index, abstract) tasks of the task queue until it gets None.
+    Sends ('start', index) before and ('done', index, status, seconds, message) after each abstract on its pipe.
+    A pipe write is synchronous, so the main process knows the abstract of a worker that crashes.
+    """
+    # own process group, so that a worker killed on timeout is killed with its pandoc and pdftoppm processes
+    os.setpgrp()
+    for i, abstract in iter(tasks.get, None):
+        connection.send(('start', i))
+        print(f'Processing abstract {i+1}: {abstract["reference"]} - {abstract["title"]}')
+        t0 = time.perf_counter()
+        try:
+            render_abstract(abstract, convert)
+            status, message = STATUS_OK, ''
+        except Exception as e:
+            status, message = STATUS_ERROR, f'{type(e).__name__}: {e}'
+        connection.send(('done', i, status, time.perf_counter() - t0, message))
+
+
+def render_sequential(abstracts, convert=True):
+    """Render the abstracts one at a time in this process. Returns the report rows."""
+    report = []
+    for i, abstract in enumerate(abstracts):
+        print(f'Processing abstract {i+1}: {abstract["reference"]} - {abstract["title"]}')
+        t0 = time.perf_counter()
+        try:
+            render_abstract(abstract, convert)
+            status, message = STATUS_OK, ''
+        except Exception as e:
+            print(f"Error rendering {abstract['reference']}: {e}")
+            status, message = STATUS_ERROR, f'{type(e).__name__}: {e}'
+        report.append((abstract['reference'], status, time.perf_counter() - t0, message))
+    return report
+
+
+def render_parallel(abstracts, workers=WORKERS, timeout=TIMEOUT, convert=True):
+    """
+    Render the abstracts with a fixed pool of worker processes fed from a task queue.
+    A worker whose abstract takes longer than timeout seconds is killed with its children, and a crashed
+    worker (e.g. a segfault while decoding a figure) only fails its current abstract. Both are replaced
+    by a new worker.
+
+    Returns:
+        Report rows (reference, status, seconds, message)
+    """
+    tasks = multiprocessing.Queue()
+    for task in enumerate(abstracts):
+        tasks.put(task)
+    workers = max(1, min(workers, len(abstracts)))
+    # each worker stops at a None; a replaced worker did not take its None, its replacement takes it
+    for _ in range(workers):
+        tasks.put(None)
+
+    pool = {}  # connection -> process of each worker
+    current = {}  # connection -> (index, start time) of the abstract being rendered
+    report = []
+
+    def start_worker():
+        connection, worker_connection = multiprocessing.Pipe(duplex=False)
+        process = multiprocessing.Process(target=render_worker, args=(tasks, worker_connection, convert))
+        process.start()
+        # only the worker holds the write end, the pipe reaches EOF when it exits
+        worker_connection.close()
+        pool[connection] = process
+
+    def finish(connection, status, seconds, message):
+        i, _ = current.pop(connection)
+        if status != STATUS_OK:
+            print(f"Error rendering {abstracts[i]['reference']}: {message}")
+        report.append((abstracts[i]['reference'], status, seconds, message))
+
+    def remove_worker(connection):
+        process = pool.pop(connection)
+        process.join()
+        connection.close()
+        # a worker that exits with code 0 took its None, a crashed or killed one is replaced
+        if process.exitcode != 0 and len(report) < len(abstracts):
+            start_worker()
+
+    for _ in range(workers):
+        start_worker()
+    while len(report) < len(abstracts):
+        # block until a worker sends a message or exits, or until the next timeout
+        deadline = min([start + timeout for _, start in current.values()], default=None)
+        wait = None if deadline is None else max(deadline - time.perf_counter(), 0)
+        for connection in multiprocessing.connection.wait(list(pool), wait):
             try:
-                doc.add_picture(img_path, width=Inches(5.0))
-            except FileNotFoundError:
-                print("Warning: Figure file not found:", IMAGE_FOLDER + figure)
+                message = connection.recv()
+            except EOFError:
+                process = pool[connection]
+                process.join()
+                if connection in current:
+                    finish(connection, STATUS_ERROR, time.perf_counter() - current[connection][1],
+                           f'worker exited with code {process.exitcode}')
+                remove_worker(connection)
                 continue
-            except UnrecognizedImageError:
-                print("Warning: Unrecognized image format for file:", IMAGE_FOLDER + figure)
-                continue
-            p = doc.add_paragraph('')
-            try:
-                if not abstract['figure_refs'][f_num]:
-                    p.add_run('Figure ' + str(f_num + 1) + ' ').bold = True
-                else:
-                    p.add_run(abstract['figure_refs'][f_num]).bold = True
-                p.add_run(abstract['figure_captions'][f_num])
-            except IndexError:
-                print('Warning: Figure caption not found for figure', f_num + 1)
-
-    if abstract['references']:
-        p = doc.add_paragraph('')
-        p.add_run('References:\n').bold = True
-        for i, ref in enumerate(abstract['references']):
-            ref_run = p.add_run(f'{i+1}. {ref}')
-            if i+1 < len(abstract['references']):
-                p.add_run('\n')
-
-
-    output_base_name = os.path.join(OUTPUT_FOLDER, f'{abstract['reference'][1:]}')
-    doc.save(output_base_name + '.docx')
-    extra_args = [
-        '-V', 'geometry:top=1.5in',
-        '-V', 'geometry:bottom=1in',
-        '-V', 'geometry:left=1.25in',
-        '-V', 'geometry:right=1.25in'
-    ]
-    try:
-        pypandoc.convert_file(output_base_name + '.docx', 'pdf', outputfile=output_base_name + '.pdf', extra_args=extra_args)
-    except Exception as e:
-        print(f"Error converting {output_base_name}.docx to PDF: {e}")
-        continue
-
+            if message[0] == 'start':
+                current[connection] = (message[1], time.perf_counter())
+            else:
+                finish(connection, *message[2:])
+
+        for connection, (i, start) in list(current.items()):
+            if time.perf_counter() - start > timeout:
+                try:
+                    os.killpg(pool[connection].pid, signal.SIGKILL)
+                except ProcessLookupError:
+                    pass
+                finish(connection, STATUS_TIMEOUT, time.perf_counter() - start, f'killed after {timeout} s')
+                remove_worker(connection)
+
+    for process in pool.values():
+        process.join()
+    return report
+
+
+def convert_batch(report, engine, workers):
+    """Convert the docx files of the rendered abstracts with the batch converter and update their report rows."""
+    rendered = {reference: i for i, (reference, status, _, _) in enumerate(report) if status == STATUS_OK}
+    docx_files = {os.path.abspath(output_base_name({'reference': reference}) + '.docx'): reference
+                  for reference in rendered}
+    t0 = time.perf_counter()
+    errors = BatchConverter(engine, workers).convert(list(docx_files))
+    print(f"Converted {len(docx_files) - len(errors)} documents to PDF in {time.perf_counter() - t0:.1f} s")
+    for docx_file, error in errors.items():
+        reference = docx_files[docx_file]
+        print(f"Error converting {docx_file} to PDF: {error}")
+        _, _, seconds, _ = report[rendered[reference]]
+        report[rendered[reference]] = (reference, STATUS_ERROR, seconds, error)
+
+
+def write_report(report, report_file=REPORT_FILE):
+    """Write the per-abstract render times to a CSV file and print a summary."""
+    with open(report_file, 'w', encoding='utf-8', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(['reference', 'status', 'seconds', 'message'])
+        for reference, status, seconds, message in report:
+            writer.writerow([reference, status, f'{seconds:.2f}', message])
+
+    rendered = [row for row in report if row[1] != STATUS_SKIPPED]
+    for status in [STATUS_OK, STATUS_SKIPPED, STATUS_ERROR, STATUS_TIMEOUT]:
+        print(f"{status}: {sum(1 for row in report if row[1] == status)}")
+    if rendered:
+        total = sum(row[2] for row in rendered)
+        print(f"Render time: {total:.1f} s in total, {total / len(rendered):.1f} s per abstract")
+        print("Slowest abstracts:")
+        for reference, status, seconds, _ in sorted(rendered, key=lambda row: row[2], reverse=True)[:10]:
+            print(f"  {reference}: {seconds:.1f} s ({status})")
+    print(f"Report written to {report_file}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Render each abstract to a docx and PDF file')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='Number of abstracts rendered in parallel, 0 to render them in this process')
+    parser.add_argument('--timeout', type=float, default=TIMEOUT, help='Maximum render time of an abstract in seconds')
+    parser.add_argument('--batch-convert', choices=[ENGINE_LIBREOFFICE, ENGINE_PANDOC],
+                        help='Only write the docx files while rendering, then convert them all to PDF with a pool '
+                             'of converter workers. Only libreoffice converts a batch of documents per process, '
+                             'pandoc still converts one document per process. The libreoffice output layout '
+                             '(fonts, spacing, page breaks) differs from the default pandoc/LaTeX conversion')
+    args = parser.parse_args()
+
+    os.makedirs(OUTPUT_FOLDER, exist_ok=True)
+
+    with open('abstracts_for_print.json', 'r', encoding='utf-8') as f:
+        abstracts = json.load(f)
+
+    # abstracts that already have a PDF are not rendered again
+    report = []
+    to_render = []
+    for abstract in abstracts:
+        if os.path.exists(output_base_name(abstract) + '.pdf'):
+            report.append((abstract['reference'], STATUS_SKIPPED, 0.0, ''))
+        else:
+            to_render.append(abstract)
+    print(f"Rendering {len(to_render)} abstracts, {len(report)} already rendered")
+
+    convert = args.batch_convert is None
+    if args.workers > 0:
+        report += render_parallel(to_render, args.workers, args.timeout, convert)
+    else:
+        report += render_sequential(to_render, convert)
+    if not convert:
+        convert_batch(report, args.batch_convert, max(args.workers, 1))
+    write_report(report)
+    # the figure cache is pruned once, after the figures of all abstracts were used
+    prune_cache()
@@ -0,0 +1,350 @@
+import argparse
+import csv
+import json
+import sqlite3
+from typing import Any, Dict, Iterable, List
+
+STORE_FILE = 'abstracts.sqlite'
+
+# Fields stored in their own columns, for indexed lookups. The full record is kept as JSON in 'data'.
+ABSTRACT_COLUMNS = ['program_number', 'title', 'focus_topic', 'session_number']
+
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS abstracts (
+    reference TEXT PRIMARY KEY,
+    program_number TEXT,
+    title TEXT,
+    focus_topic TEXT,
+    session_number TEXT,
+    data TEXT NOT NULL DEFAULT '{}'
+);
+CREATE INDEX IF NOT EXISTS abstracts_program_number ON abstracts(program_number);
+
+CREATE TABLE IF NOT EXISTS authors (
+    reference TEXT NOT NULL REFERENCES abstracts(reference) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    name TEXT,
+    affiliations TEXT,
+    first_name TEXT,
+    last_name TEXT,
+    PRIMARY KEY (reference, position)
+);
+CREATE INDEX IF NOT EXISTS authors_last_name ON authors(last_name);
+
+CREATE TABLE IF NOT EXISTS category_scores (
+    reference TEXT NOT NULL REFERENCES abstracts(reference) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (reference, category)
+);
+CREATE INDEX IF NOT EXISTS category_scores_category ON category_scores(category, score);
+
+CREATE TABLE IF NOT EXISTS figures (
+    reference TEXT NOT NULL REFERENCES abstracts(reference) ON DELETE CASCADE,
+    position INTEGER NOT NULL,
+    file TEXT,
+    figure_ref TEXT,
+    caption TEXT,
+    PRIMARY KEY (reference, position)
+);
+
+CREATE TABLE IF NOT EXISTS reviewers (
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    email TEXT,
+    experience INTEGER,
+    data TEXT NOT NULL DEFAULT '{}',
+    PRIMARY KEY (first_name, last_name)
+);
+
+CREATE TABLE IF NOT EXISTS assignments (
+    reference TEXT NOT NULL,
+    first_name TEXT NOT NULL,
+    last_name TEXT NOT NULL,
+    match_score REAL,
+    experienced INTEGER,
+    PRIMARY KEY (reference, first_name, last_name)
+);
+
+CREATE TABLE IF NOT EXISTS sessions (
+    reference TEXT PRIMARY KEY,
+    program_number TEXT,
+    presentation_type TEXT,
+    focus_topic TEXT,
+    session_number TEXT,
+    session_title TEXT,
+    order_in_session TEXT
+);
+CREATE INDEX IF NOT EXISTS sessions_program_number ON sessions(program_number);
+'''
+
+
+def record_reference(record: Dict[str, Any]) -> str:
+    """Reference of an abstract record: 'reference' in the print JSON files, 'number' in the categorized ones."""
+    return record.get('reference') or record['number']
+
+
+class ArtifactStore:
+    """
+    SQLite store of the pipeline artifacts.
+
+    The complete abstract records are stored as JSON, so that they can be exported in the format of the
+    original JSON files. Category scores have their own table, the JSON record keeps a null 'category_scores'
+    placeholder at the position of the field. Authors and figures are indexed copies of the corresponding
+    fields of the records.
+    """
+
+    def __init__(self, store_file: str = STORE_FILE):
+        self.connection = sqlite3.connect(store_file)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    # Abstracts
+
+    def upsert_abstract(self, record: Dict[str, Any]):
+        """Insert an abstract, or merge the fields of the record into the stored one."""
+        record = dict(record)
+        reference = record_reference(record)
+        category_scores = record.get('category_scores')
+        if 'category_scores' in record:
+            record['category_scores'] = None
+        self.connection.execute('INSERT OR IGNORE INTO abstracts (reference) VALUES (?)', (reference,))
+        self._merge_data(reference, record)
+        if category_scores is not None:
+            self.set_category_scores(reference, category_scores)
+
+    def _merge_data(self, reference: str, fields: Dict[str, Any]):
+        # merged in Python rather than with json_patch, which would drop the fields set to null
+        row = self.connection.execute('SELECT data FROM abstracts WHERE reference = ?', (reference,)).fetchone()
+        if row is None:
+            raise KeyError(reference)
+        data = json.loads(row['data'])
+        data.update(fields)
+        self.connection.execute('UPDATE abstracts SET data = ? WHERE reference = ?',
+                                (json.dumps(data, ensure_ascii=False), reference))
+        self._refresh_columns(reference, fields)
+
+    def _refresh_columns(self, reference: str, fields: Dict[str, Any]):
+        """Update the indexed columns and tables that derive from the given fields."""
+        columns = [c for c in ABSTRACT_COLUMNS if c in fields]
+        if columns:
+            self.connection.execute(
+                f'UPDATE abstracts SET {", ".join(c + " = ?" for c in columns)} WHERE reference = ?',
+                [fields[c] for c in columns] + [reference])
+        if 'authors' in fields or 'authors_separated' in fields:
+            record = self.get_abstract(reference, ['authors', 'authors_separated'])
+            self._write_authors(reference, record.get('authors') or [], record.get('authors_separated') or [])
+        if 'figure_files' in fields:
+            record = self.get_abstract(reference, ['figure_files', 'figure_refs', 'figure_captions'])
+            self._write_figures(reference, record)
+
+    def _write_authors(self, reference: str, authors: List[Any], authors_separated: List[Any]):
+        self.connection.execute('DELETE FROM authors WHERE reference = ?', (reference,))
+        rows = []
+        for position, author in enumerate(authors):
+            # print JSON: [name, affiliations]; categorized JSON: name only
+            name, affiliations = (author[0], author[1]) if isinstance(author, (list, tuple)) else (author, None)
+            first, last = authors_separated[position] if position < len(authors_separated) else (None, None)
+            rows.append((reference, position, name, affiliations, first, last))
+        self.connection.executemany('INSERT INTO authors VALUES (?, ?, ?, ?, ?, ?)', rows)
+
+    def _write_figures(self, reference: str, record: Dict[str, Any]):
+        self.connection.execute('DELETE FROM figures WHERE reference = ?', (reference,))
+        refs = record.get('figure_refs') or []
+        captions = record.get('figure_captions') or []
+        self.connection.executemany('INSERT INTO figures VALUES (?, ?, ?, ?, ?)', [
+            (reference, position, file,
+             refs[position] if position < len(refs) else None,
+             captions[position] if position < len(captions) else None)
+            for position, file in enumerate(record.get('figure_files') or [])])
+
+    def get_abstract(self, reference: str, fields: Iterable[str] = None):
+        """
+        Read an abstract, or only some of its fields.
+
+        Args:
+            reference: Abstract reference, e.g. '#1234'
+            fields: Fields to read, None for the full record
+
+        Returns:
+            Dictionary with the requested fields, or None if the abstract does not exist
+        """
+        if fields is None:
+            row = self.connection.execute('SELECT data FROM abstracts WHERE reference = ?', (reference,)).fetchone()
+            if row is None:
+                return None
+            record = json.loads(row['data'])
+            scores = self.get_category_scores(reference)
+            # records stored without the placeholder get their scores at the end
+            if 'category_scores' in record or scores:
+                record['category_scores'] = scores
+            return record
+
+        fields = list(fields)
+        record = {}
+        json_fields = [f for f in fields if f != 'category_scores']
+        if json_fields:
+            # json_quote makes every extracted value valid JSON, including strings
+            row = self.connection.execute(
+                'SELECT ' + ', '.join('json_quote(json_extract(data, ?))' for _ in json_fields) +
+                ' FROM abstracts WHERE reference = ?',
+                ['$."' + f + '"' for f in json_fields] + [reference]).fetchone()
+            if row is None:
+                return None
+            for field, value in zip(json_fields, row):
+                record[field] = json.loads(value) if value is not None else None
+        if 'category_scores' in fields:
+            record['category_scores'] = self.get_category_scores(reference)
+        return record
+
+    def update_fields(self, reference: str, **fields):
+        """Update some fields of a stored abstract in place."""
+        fields = dict(fields)
+        category_scores = fields.get('category_scores')
+        if category_scores is not None:
+            fields['category_scores'] = None
+        if fields:
+            self._merge_data(reference, fields)
+        if category_scores is not None:
+            self.set_category_scores(reference, category_scores)
+        self.connection.commit()
+
+    def references(self, program_numbers_only: bool = False) -> List[str]:
+        """References of the stored abstracts, in insertion order."""
+        query = 'SELECT reference FROM abstracts'
+        if program_numbers_only:
+            query += " WHERE program_number IS NOT NULL AND program_number != ''"
+        return [row['reference'] for row in self.connection.execute(query + ' ORDER BY rowid')]
+
+    def find_by_program_number(self, program_number: str):
+        row = self.connection.execute('SELECT reference FROM abstracts WHERE program_number = ?',
+                                      (str(program_number),)).fetchone()
+        return self.get_abstract(row['reference']) if row else None
+
+    # Category scores
+
+    def set_category_scores(self, reference: str, scores: Dict[str, float]):
+        self.connection.execute('DELETE FROM category_scores WHERE reference = ?', (reference,))
+        self.connection.executemany('INSERT INTO category_scores VALUES (?, ?, ?)',
+                                    [(reference, category, score) for category, score in scores.items()])
+
+    def get_category_scores(self, reference: str) -> Dict[str, float]:
+        return {row['category']: _as_number(row['score']) for row in self.connection.execute(
+            'SELECT category, score FROM category_scores WHERE reference = ? ORDER BY rowid', (reference,))}
+
+    def abstracts_with_score(self, category: str, threshold: float) -> List[str]:
+        """References of the abstracts whose score for a category is at least threshold."""
+        return [row['reference'] for row in self.connection.execute(
+            'SELECT reference FROM category_scores WHERE category = ? AND score >= ?', (category, threshold))]
+
+    # Reviewers, assignments and sessions
+
+    def import_reviewers(self, reviewers: List[Dict[str, Any]]):
+        self.connection.executemany(
+            'INSERT OR REPLACE INTO reviewers VALUES (?, ?, ?, ?, ?)',
+            [(r['first_name'], r['last_name'], r.get('email'), r.get('experience'), json.dumps(r, ensure_ascii=False))
+             for r in reviewers])
+        self.connection.commit()
+
+    def reviewers(self) -> List[Dict[str, Any]]:
+        return [json.loads(row['data']) for row in self.connection.execute('SELECT data FROM reviewers ORDER BY rowid')]
+
+    def import_assignments(self, assignments: List[Dict[str, Any]]):
+        """Import the reviewer_assignments.json format."""
+        rows = []
+        for assignment in assignments:
+            for reviewer in assignment['assigned_reviewers']:
+                first, last = reviewer['reviewer_name']
+                rows.append((assignment['abstract_number'], first, last, reviewer['match_score'],
+                             int(reviewer['experienced'])))
+        self.connection.executemany('INSERT OR REPLACE INTO assignments VALUES (?, ?, ?, ?, ?)', rows)
+        self.connection.commit()
+
+    def import_sessions(self, session_csv: str):
+        """Import the session assignment CSV (';'-delimited, Id without '#')."""
+        with open(session_csv, 'r', encoding='utf-8') as f:
+            reader = csv.DictReader(f, delimiter=';', quotechar='"')
+            self.connection.executemany('INSERT OR REPLACE INTO sessions VALUES (?, ?, ?, ?, ?, ?, ?)', [
+                ('#' + row['Id'], row['Program number'], row['Presentation type'], row['Focus topic'],
+                 row['Session number'], row['Session title'], row['Order in Session']) for row in reader])
+        self.connection.commit()
+
+    # JSON compatibility
+
+    def import_json(self, json_file: str, fields: List[str] = None):
+        """
+        Import (or merge) a JSON list of abstracts, in any of the formats of the pipeline.
+
+        Args:
+            json_file: JSON file with a list of abstracts
+            fields: Only import these fields. The categorized JSON files have a different 'authors' format than
+                the print JSON files, so they should be merged with e.g. ['category_scores', 'keywords']
+        """
+        with open(json_file, 'r', encoding='utf-8') as f:
+            records = json.load(f)
+        with self.connection:
+            for record in records:
+                if fields is not None:
+                    record = {'reference': record_reference(record),
+                              **{field: record[field] for field in fields if field in record}}
+                self.upsert_abstract(record)
+        return len(records)
+
+    def export_json(self, json_file: str, references: List[str] = None):
+        """Write the stored abstracts as a JSON list, in the format of the original files."""
+        if references is None:
+            references = self.references()
+        with open(json_file, 'w', encoding='utf-8') as f:
+            json.dump([self.get_abstract(r) for r in references], f, indent=4, ensure_ascii=False)
+        return len(references)
+
+
+def _as_number(value: float):
+    """Scores are stored as REAL, return integer scores as int as in the original JSON."""
+    return int(value) if float(value).is_integer() else value
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Import and export the pipeline artifacts from the SQLite store')
+    parser.add_argument('--store', default=STORE_FILE)
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    import_parser = subparsers.add_parser('import', help='Import a JSON list of abstracts')
+    import_parser.add_argument('json_file')
+    import_parser.add_argument('--fields', nargs='+', help='Only import these fields')
+    export_parser = subparsers.add_parser('export', help='Export the abstracts to a JSON list')
+    export_parser.add_argument('json_file')
+    export_parser.add_argument('--program-only', action='store_true', help='Only abstracts with a program number')
+    reviewers_parser = subparsers.add_parser('import-reviewers', help='Import reviewers.json')
+    reviewers_parser.add_argument('json_file', nargs='?', default='reviewers.json')
+    assignments_parser = subparsers.add_parser('import-assignments', help='Import reviewer_assignments.json')
+    assignments_parser.add_argument('json_file', nargs='?', default='reviewer_assignments.json')
+    sessions_parser = subparsers.add_parser('import-sessions', help='Import the session assignment CSV')
+    sessions_parser.add_argument('csv_file', nargs='?', default='assigned_sessions_final_cleaned.csv')
+    args = parser.parse_args()
+
+    with ArtifactStore(args.store) as store:
+        if args.command == 'import':
+            print(f"Imported {store.import_json(args.json_file, args.fields)} abstracts from {args.json_file}")
+        elif args.command == 'export':
+            n = store.export_json(args.json_file, store.references(args.program_only))
+            print(f"Exported {n} abstracts to {args.json_file}")
+        elif args.command == 'import-reviewers':
+            with open(args.json_file, 'r') as f:
+                store.import_reviewers(json.load(f))
+        elif args.command == 'import-assignments':
+            with open(args.json_file, 'r') as f:
+                store.import_assignments(json.load(f))
+        elif args.command == 'import-sessions':
+            store.import_sessions(args.csv_file)
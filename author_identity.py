@@ -0,0 +1,100 @@
+import re
+import sys
+from functools import lru_cache
+from typing import Any, Dict, Iterable, List, Set, Tuple
+
+from unidecode import unidecode
+
+# spaces and hyphens separate the words of a name, other punctuation is dropped
+_separator_re = re.compile(r'[\s\-]+')
+_punctuation_re = re.compile(r'[^\w\s\-]')
+
+AuthorKey = Tuple[str, str]
+
+
+@lru_cache(maxsize=None)
+def normalize_name(name: str) -> str:
+    """Comparable form of a name: ASCII, lower case, single spaces, no punctuation."""
+    return sys.intern(_separator_re.sub(' ', _punctuation_re.sub('', unidecode(name).lower())).strip())
+
+
+def initials(first: str) -> str:
+    """Initials of first names as written, e.g. 'Jean pierre' -> 'J. P.', 'Łukasz' -> 'Ł.'"""
+    return sys.intern(' '.join(f[0].upper() + '.' for f in first.split() if f))
+
+
+def author_key(first: str, last: str) -> AuthorKey:
+    """Identity of an author: normalized last name and ASCII initials. Accents and spacing do not matter."""
+    return normalize_name(last), sys.intern(unidecode(initials(first)))
+
+
+def split_author(author: str) -> Tuple[str, str]:
+    """(first names, last name) of a full name string, taking the last word as last name."""
+    words = author.split()
+    if not words:
+        return '', ''
+    return ' '.join(words[:-1]), words[-1]
+
+
+def abstract_authors(abstract: Dict[str, Any]) -> List[Tuple[str, str]]:
+    """(first names, last name) of the authors: authors_separated if present, otherwise the author strings."""
+    if 'authors_separated' in abstract:
+        return [(first, last) for first, last in abstract['authors_separated']]
+    return [split_author(author) for author in abstract.get('authors') or []]
+
+
+def _word_sequences(name: str) -> Iterable[str]:
+    """All sequences of consecutive words of a normalized name (a name has only a few words)."""
+    words = name.split(' ')
+    for i in range(len(words)):
+        for j in range(i + 1, len(words) + 1):
+            yield ' '.join(words[i:j])
+
+
+class AuthorIndex:
+    """
+    Authors of a set of abstracts, built in one pass over their author lists.
+
+    - numbers: author key -> abstract numbers of the author, in the order of the abstracts
+    - names: author key -> display name (last name, initials as written); the accented spelling is preferred
+    - words: word or sequence of words of a full author name -> abstract numbers, to test in O(1) whether
+      a person (e.g. a reviewer, by last name) is an author of an abstract
+
+    Name strings are normalized once (normalize_name is cached) and interned, so the repeated names of the
+    authors share one string.
+    """
+
+    def __init__(self, abstracts: Iterable[Dict[str, Any]], number_field: str = 'program_number'):
+        self.numbers: Dict[AuthorKey, List[Any]] = {}
+        self.names: Dict[AuthorKey, AuthorKey] = {}
+        self.words: Dict[str, Set[Any]] = {}
+        for abstract in abstracts:
+            number = abstract.get(number_field)
+            if not number:
+                continue
+            for first, last in abstract_authors(abstract):
+                self.add(number, first, last)
+
+    def add(self, number: Any, first: str, last: str):
+        key = author_key(first, last)
+        if not key[0]:
+            return
+        numbers = self.numbers.setdefault(key, [])
+        if number not in numbers:
+            numbers.append(number)
+        display = (' '.join(last.split()), initials(first))
+        if key not in self.names or (''.join(self.names[key]).isascii() and not ''.join(display).isascii()):
+            self.names[key] = display
+        for sequence in _word_sequences(normalize_name(f'{first} {last}')):
+            self.words.setdefault(sequence, set()).add(number)
+
+    def __len__(self):
+        return len(self.numbers)
+
+    def sorted_keys(self) -> List[AuthorKey]:
+        """Author keys in alphabetical order of the normalized names."""
+        return sorted(self.numbers)
+
+    def has_author(self, number: Any, name: str) -> bool:
+        """Whether an author of the abstract has this name (or these words of a name, e.g. a last name)."""
+        return number in self.words.get(normalize_name(name), ())
@@ -0,0 +1,128 @@
+import argparse
+import os
+import queue
+import shutil
+import subprocess
+import tempfile
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List
+
+from abstract_docx import docx_to_pdf
+
+SOFFICE = 'soffice'
+ENGINE_LIBREOFFICE = 'libreoffice'
+ENGINE_PANDOC = 'pandoc'
+
+WORKERS = os.cpu_count() or 1
+BATCH_SIZE = 25  # documents converted by one office process (libreoffice engine only)
+TIMEOUT = 120  # seconds per document
+
+
+class BatchConverter:
+    """
+    Convert docx files to PDF files with the same name, next to them, with a pool of converter workers.
+
+    With the libreoffice engine, each worker converts a batch of documents with a single headless office
+    process, so the startup cost is paid once per batch instead of once per document. The page geometry
+    comes from the margins set in the docx (abstract_docx.set_page_margins). Each worker has its own office
+    profile, as parallel office processes cannot share one.
+    With the pandoc engine, each worker runs pandoc with the geometry of abstract_docx.PDF_EXTRA_ARGS.
+    pandoc (through LaTeX) writes one PDF per run, so its documents are not batched: batch_size is ignored and
+    the pool only runs the conversions in parallel.
+
+    The two engines do not produce the same layout: LibreOffice renders the docx itself, pandoc typesets its
+    content with LaTeX (fonts, spacing, figure placement and page breaks differ).
+    """
+
+    def __init__(self, engine: str = ENGINE_LIBREOFFICE, workers: int = WORKERS, batch_size: int = BATCH_SIZE,
+                 timeout: float = TIMEOUT):
+        if engine not in (ENGINE_LIBREOFFICE, ENGINE_PANDOC):
+            raise ValueError(f"Unknown conversion engine: {engine}")
+        if engine == ENGINE_LIBREOFFICE and shutil.which(SOFFICE) is None:
+            raise RuntimeError(f"{SOFFICE} not found, install LibreOffice or use the pandoc engine")
+        self.engine = engine
+        self.workers = workers
+        self.batch_size = batch_size if engine == ENGINE_LIBREOFFICE else 1
+        self.timeout = timeout
+
+    def _convert_batch(self, docx_files: List[str], profile_dir: str) -> Dict[str, str]:
+        """Convert the files of a batch, all in the same folder. Returns the error of each failed file."""
+        if self.engine == ENGINE_PANDOC:
+            try:
+                docx_to_pdf(docx_files[0], os.path.splitext(docx_files[0])[0] + '.pdf')
+                return {}
+            except Exception as e:
+                return {docx_files[0]: f'{type(e).__name__}: {e}'}
+
+        # remove the PDF files of a previous run, so that only the files written by this batch are found below
+        for docx_file in docx_files:
+            pdf_file = os.path.splitext(docx_file)[0] + '.pdf'
+            if os.path.exists(pdf_file):
+                os.remove(pdf_file)
+        command = [SOFFICE, '--headless', '--norestore', f'-env:UserInstallation=file://{profile_dir}',
+                   '--convert-to', 'pdf', '--outdir', os.path.dirname(docx_files[0]) or '.'] + docx_files
+        try:
+            subprocess.run(command, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE,
+                           timeout=self.timeout * len(docx_files), check=True)
+        except subprocess.TimeoutExpired:
+            error = f'batch timed out after {self.timeout * len(docx_files):.0f} s'
+        except subprocess.CalledProcessError as e:
+            error = f'{SOFFICE} exited with code {e.returncode}: {e.stderr.decode(errors="replace").strip()}'
+        else:
+            error = 'no PDF written'
+        return {docx_file: error for docx_file in docx_files
+                if not os.path.exists(os.path.splitext(docx_file)[0] + '.pdf')}
+
+    def convert(self, docx_files: List[str]) -> Dict[str, str]:
+        """
+        Convert the files, in batches queued to the workers.
+
+        Returns:
+            Error message of each file that could not be converted
+        """
+        batches = []
+        by_folder = {}
+        for docx_file in docx_files:
+            by_folder.setdefault(os.path.dirname(os.path.abspath(docx_file)), []).append(os.path.abspath(docx_file))
+        for files in by_folder.values():
+            batches += [files[i:i + self.batch_size] for i in range(0, len(files), self.batch_size)]
+
+        errors = {}
+        with tempfile.TemporaryDirectory() as profiles, ThreadPoolExecutor(max_workers=self.workers) as executor:
+            # one office profile per worker, reused by its next batches
+            free_profiles = queue.Queue()
+            for i in range(self.workers):
+                free_profiles.put(os.path.join(profiles, f'profile_{i}'))
+
+            def run_batch(batch):
+                profile_dir = free_profiles.get()
+                try:
+                    return self._convert_batch(batch, profile_dir)
+                finally:
+                    free_profiles.put(profile_dir)
+
+            futures = [executor.submit(run_batch, batch) for batch in batches]
+            for i, future in enumerate(futures):
+                batch_errors = future.result()
+                errors.update(batch_errors)
+                print(f"Converted batch {i + 1}/{len(batches)}: {len(batches[i]) - len(batch_errors)} PDF files, "
+                      f"{len(batch_errors)} errors")
+        return errors
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert docx files to PDF with a pool of converter workers')
+    parser.add_argument('docx_files', nargs='+')
+    parser.add_argument('--engine', choices=[ENGINE_LIBREOFFICE, ENGINE_PANDOC], default=ENGINE_LIBREOFFICE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE,
+                        help='Documents converted by one office process (libreoffice engine only)')
+    args = parser.parse_args()
+
+    t0 = time.perf_counter()
+    converter = BatchConverter(args.engine, args.workers, args.batch_size)
+    errors = converter.convert(args.docx_files)
+    for docx_file, error in errors.items():
+        print(f"Error converting {docx_file} to PDF: {error}")
+    print(f"{len(args.docx_files) - len(errors)} PDF files in {time.perf_counter() - t0:.1f} s")
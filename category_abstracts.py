@@ -1,93 +1,151 @@
+import argparse
 import json
 import csv
 import os
+import re
 import shutil
+from collections import defaultdict
 
-ABSTRACTS_FOLDER = '/media/bigboy2/ESMRMB2025/abstracts/pdf/'
-ABSTRACTS_BASE_OUTPUT = '/media/bigboy2/ESMRMB2025/'
+import numpy as np
 
-## GLIMR configuration
-#LIST_NAME = 'glimr'
-#LIST_NAME = 'microstructure'
-LIST_NAME = 'mritogether'
-
-if LIST_NAME == 'glimr':
-    CATEGORIES_OF_INTEREST = [
-        'Brain tumors: Data and MR technology driving innovation',
-        'Aligning Clinical Expectations with imaging Research in Neuro-Oncology',
-        'brain tumors'
-    ]
-
-    KEYWORDS_OF_INTEREST = []
-    SUBCATEGORIES_OF_INTEREST = []
-
-elif LIST_NAME == 'microstructure':
-    CATEGORIES_OF_INTEREST = [
-        "diffusion",
-        "brain physiology (modifiers)",
-        "brain function",
-    ]
-
-    KEYWORDS_OF_INTEREST = [
-        'diffusion',
-        'microstructure',
-        'relaxation',
-        'glymphatic',
-        'BBB',
-        'blood-brain',
-        'water exchange',
-        'tractography',
-        'connectivity',
-        'white matter',
-        'grey matter',
-    ]
-    SUBCATEGORIES_OF_INTEREST = []
-
-elif LIST_NAME == 'mritogether':
-    CATEGORIES_OF_INTEREST = [
-        'open science',
-        'reproducibility and validation',
-    ]
-
-    KEYWORDS_OF_INTEREST = []
-    SUBCATEGORIES_OF_INTEREST = CATEGORIES_OF_INTEREST
-
-PDF_OUTPUT_FOLDER = os.path.join(ABSTRACTS_BASE_OUTPUT, LIST_NAME)
-os.makedirs(PDF_OUTPUT_FOLDER, exist_ok=True)
-
-with open('abstracts_merged.json', 'r', encoding='utf-8') as f:
-    abstracts = json.load(f)
+from score_matrix import load_scores, score_value
 
+ABSTRACTS_FILE = 'abstracts_merged.json'
+ABSTRACTS_FOLDER = '/media/bigboy2/ESMRMB2025/abstracts/pdf/'
+ABSTRACTS_BASE_OUTPUT = '/media/bigboy2/ESMRMB2025/'
 
 CATEGORY_THRESHOLD = 6
 
-output_list = []
-for abstract in abstracts:
-    if not abstract['program_number']:
-        continue
-    to_include = False
-    for category in CATEGORIES_OF_INTEREST:
-        if abstract['category_scores'].get(category, 0) >= CATEGORY_THRESHOLD:
-            to_include = True
-            break
-    for keyword_of_interest in KEYWORDS_OF_INTEREST:
-        for keyword_in_abstract in abstract['keywords']:
-            if keyword_of_interest.lower() in keyword_in_abstract.lower():
-                to_include = True
-                break
-        if keyword_of_interest.lower() in abstract['title'].lower():
-            to_include = True
-            break
-    for subcategory_of_interest in SUBCATEGORIES_OF_INTEREST:
-        if subcategory_of_interest.lower() in abstract['primary_subcategory'].lower() or \
-           subcategory_of_interest.lower() in abstract['secondary_subcategory'].lower():
-            to_include = True
-            break
-
-    if not to_include:
-        continue
-
-    abstract_to_include = {
+# An abstract is in a list if it scores at least CATEGORY_THRESHOLD in one of its categories, if one of its keywords
+# or its title contains one of its keywords, or if its primary or secondary subcategory contains one of its
+# subcategories (case insensitive).
+LISTS = {
+    'glimr': {
+        'categories': [
+            'Brain tumors: Data and MR technology driving innovation',
+            'Aligning Clinical Expectations with imaging Research in Neuro-Oncology',
+            'brain tumors',
+        ],
+        'keywords': [],
+        'subcategories': [],
+    },
+    'microstructure': {
+        'categories': [
+            "diffusion",
+            "brain physiology (modifiers)",
+            "brain function",
+        ],
+        'keywords': [
+            'diffusion',
+            'microstructure',
+            'relaxation',
+            'glymphatic',
+            'BBB',
+            'blood-brain',
+            'water exchange',
+            'tractography',
+            'connectivity',
+            'white matter',
+            'grey matter',
+        ],
+        'subcategories': [],
+    },
+    'mritogether': {
+        'categories': [
+            'open science',
+            'reproducibility and validation',
+        ],
+        'keywords': [],
+        'subcategories': [
+            'open science',
+            'reproducibility and validation',
+        ],
+    },
+}
+
+token_re = re.compile(r'\w+')
+
+
+class AbstractIndex:
+    """
+    Inverted indexes of the abstracts of the book (the abstracts with a program number), built in one pass:
+    word -> abstracts whose title or one of whose keywords contains it, and subcategory -> abstracts.
+    Category scores come from the memory-mapped score matrix.
+    """
+
+    def __init__(self, abstracts, abstracts_file=ABSTRACTS_FILE):
+        self.abstracts = [a for a in abstracts if a['program_number']]
+        self.scores = load_scores(abstracts_file)
+        self.score_rows = np.array([self.scores.rows[a['reference']] for a in self.abstracts], dtype=np.intp)
+        # lower case title and keywords of each abstract, a keyword matches inside one of them
+        self.texts = []
+        self.words = defaultdict(set)
+        self.subcategories = defaultdict(set)
+        for i, a in enumerate(self.abstracts):
+            texts = [a['title'].lower()] + [keyword.lower() for keyword in a['keywords']]
+            self.texts.append(texts)
+            for text in texts:
+                for word in token_re.findall(text):
+                    self.words[word].add(i)
+            for subcategory in (a['primary_subcategory'], a['secondary_subcategory']):
+                self.subcategories[subcategory.lower()].add(i)
+
+    def with_category(self, category, threshold=CATEGORY_THRESHOLD):
+        return set(np.flatnonzero(self.scores.column(category)[self.score_rows] >= threshold).tolist())
+
+    def with_keyword(self, keyword):
+        """Abstracts whose title or a keyword contains keyword."""
+        keyword = keyword.lower()
+        candidates = None
+        for query_word in token_re.findall(keyword):
+            # the words of the keyword can be part of longer words of the text
+            rows = set().union(*(rows for word, rows in self.words.items() if query_word in word))
+            candidates = rows if candidates is None else candidates & rows
+        if candidates is None:
+            candidates = range(len(self.abstracts))
+        return {i for i in candidates if any(keyword in text for text in self.texts[i])}
+
+    def with_subcategory(self, subcategory):
+        """Abstracts whose primary or secondary subcategory contains subcategory."""
+        subcategory = subcategory.lower()
+        return set().union(*(rows for value, rows in self.subcategories.items() if subcategory in value))
+
+    def select(self, definition):
+        """Indices of the abstracts of a list definition, in the order of the abstracts."""
+        selected = set()
+        for category in definition['categories']:
+            selected |= self.with_category(category)
+        for keyword in definition['keywords']:
+            selected |= self.with_keyword(keyword)
+        for subcategory in definition['subcategories']:
+            selected |= self.with_subcategory(subcategory)
+        return sorted(selected)
+
+
+def link_or_copy(src, dst_folder):
+    """
+    Put a file in a folder as a hard link, which takes no space, or as a copy if the folder is on another
+    file system. A file that is already the same file is kept.
+
+    Returns:
+        True if the file was linked
+    """
+    dst = os.path.join(dst_folder, os.path.basename(src))
+    if os.path.exists(dst):
+        if os.path.samefile(src, dst):
+            return True
+        os.remove(dst)
+    try:
+        os.link(src, dst)
+        return True
+    except OSError:
+        shutil.copy(src, dst)
+        return False
+
+
+def list_row(abstract, category_scores):
+    """CSV row of an abstract in a list, with its scores in the categories of the list."""
+    row = {
         'program_number': abstract['program_number'],
         'reference': abstract['reference'],
         'submitter': abstract['submitter'],
@@ -99,14 +157,54 @@ for abstract in abstracts:
         'primary_subcategory': abstract['primary_subcategory'],
         'secondary_subcategory': abstract['secondary_subcategory']
     }
-    for category in CATEGORIES_OF_INTEREST:
-        abstract_to_include[category] = abstract['category_scores'].get(category, 0)
-    print(f'Including abstract {abstract["reference"]}: {abstract["title"]}')
-    output_list.append(abstract_to_include)
-    shutil.copy(os.path.join(ABSTRACTS_FOLDER, abstract['reference'][1:] + '.pdf'), PDF_OUTPUT_FOLDER)
-
-with open(os.path.join(PDF_OUTPUT_FOLDER, LIST_NAME + '.csv'), 'w', encoding='utf-8') as f:
-    writer = csv.DictWriter(f, fieldnames=list(output_list[0].keys()))
-    writer.writeheader()
-    for row in output_list:
-        writer.writerow(row)
\ No newline at end of file
+    row.update(category_scores)
+    return row
+
+
+def export_list(name, output_folder, abstracts, category_scores):
+    """
+    Write the CSV file of a list (name.csv) and link the PDF files of its abstracts in output_folder.
+    category_scores are the scores of each abstract in the categories of the list.
+    """
+    os.makedirs(output_folder, exist_ok=True)
+    output_list = []
+    n_linked = 0
+    for abstract, scores in zip(abstracts, category_scores):
+        print(f'{name}: including abstract {abstract["reference"]}: {abstract["title"]}')
+        output_list.append(list_row(abstract, scores))
+        n_linked += link_or_copy(os.path.join(ABSTRACTS_FOLDER, abstract['reference'][1:] + '.pdf'), output_folder)
+
+    if not output_list:
+        print(f'Warning: no abstracts in list {name}')
+        return
+    with open(os.path.join(output_folder, name + '.csv'), 'w', encoding='utf-8') as f:
+        writer = csv.DictWriter(f, fieldnames=list(output_list[0].keys()))
+        writer.writeheader()
+        for row in output_list:
+            writer.writerow(row)
+    print(f'{name}: {len(output_list)} abstracts, {n_linked} PDF files linked, '
+          f'{len(output_list) - n_linked} copied, in {output_folder}')
+
+
+def write_list(name, definition, index):
+    selected = index.select(definition)
+    category_scores = [{category: score_value(index.scores.column(category)[index.score_rows[i]])
+                        for category in definition['categories']} for i in selected]
+    export_list(name, os.path.join(ABSTRACTS_BASE_OUTPUT, name), [index.abstracts[i] for i in selected],
+                category_scores)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Extract the abstracts of topic lists, with their PDF files')
+    parser.add_argument('lists', nargs='*', help=f'Lists to extract: {", ".join(LISTS)} (default: all)')
+    args = parser.parse_args()
+    for name in args.lists:
+        if name not in LISTS:
+            parser.error(f'Unknown list: {name}')
+
+    with open(ABSTRACTS_FILE, 'r', encoding='utf-8') as f:
+        abstracts = json.load(f)
+
+    index = AbstractIndex(abstracts)
+    for name in args.lists or LISTS:
+        write_list(name, LISTS[name], index)
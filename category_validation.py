@@ -0,0 +1,126 @@
+import difflib
+import json
+import re
+import unicodedata
+from typing import Any, Dict, List, Tuple
+
+CATEGORIES_FILE = 'categories.txt'
+INPUT_FILE = 'categorized_abstracts.json'
+OUTPUT_FILE = 'categorized_abstracts_validated.json'
+
+MIN_SCORE = 0
+MAX_SCORE = 10
+FUZZY_CUTOFF = 0.85  # minimum difflib similarity to accept a misspelled category
+
+non_alnum_re = re.compile(r'[^a-z0-9]+')
+
+
+def normalize_key(key: str) -> str:
+    """Lowercase, strip accents and punctuation, and collapse whitespace."""
+    key = unicodedata.normalize('NFKD', key)
+    key = ''.join(c for c in key if not unicodedata.combining(c))
+    return non_alnum_re.sub(' ', key.lower()).strip()
+
+
+def clamp_score(value: Any):
+    """Convert a score to an integer in the MIN_SCORE-MAX_SCORE range. Returns None if it is not a number."""
+    if isinstance(value, bool):
+        return None
+    try:
+        score = round(float(value))
+    except (TypeError, ValueError):
+        return None
+    return min(MAX_SCORE, max(MIN_SCORE, score))
+
+
+class CategoryValidator:
+    """
+    Maps the category keys returned by the LLM to the canonical names in categories.txt.
+
+    Exact and normalized matches are resolved with a precomputed lookup table, misspelled keys
+    with difflib. Fuzzy matches are added to the lookup table, so each variant is only matched once.
+    """
+
+    def __init__(self, categories: List[str]):
+        self.categories = categories
+        self.lookup = {}
+        for category in categories:
+            self.lookup[category] = category
+            self.lookup.setdefault(normalize_key(category), category)
+        self.normalized_keys = [normalize_key(c) for c in categories]
+        self.normalized_to_category = dict(zip(self.normalized_keys, categories))
+
+    def canonical(self, key: str):
+        """Canonical category name of a key returned by the LLM, or None if nothing is close enough."""
+        if key in self.lookup:
+            return self.lookup[key]
+        normalized = normalize_key(key)
+        if normalized in self.lookup:
+            category = self.lookup[normalized]
+        else:
+            matches = difflib.get_close_matches(normalized, self.normalized_keys, n=1, cutoff=FUZZY_CUTOFF)
+            category = self.normalized_to_category[matches[0]] if matches else None
+            self.lookup[normalized] = category
+        self.lookup[key] = category
+        return category
+
+    def validate(self, scores: Dict[str, Any]) -> Tuple[Dict[str, int], List[str], List[str]]:
+        """
+        Normalize the keys and clamp the values of the category scores returned by the LLM.
+
+        Args:
+            scores: Raw category scores
+
+        Returns:
+            Tuple of (valid scores, missing categories, unrecognized keys)
+        """
+        if not isinstance(scores, dict):
+            return {}, list(self.categories), []
+        valid = {}
+        unknown = []
+        for key, value in scores.items():
+            category = self.canonical(key)
+            score = clamp_score(value)
+            if category is None or score is None:
+                unknown.append(key)
+                continue
+            # if two variants map to the same category, keep the highest score
+            valid[category] = max(score, valid.get(category, MIN_SCORE))
+        missing = [c for c in self.categories if c not in valid]
+        return valid, missing, unknown
+
+    def complete(self, scores: Dict[str, int]) -> Dict[str, int]:
+        """Return the scores in categories.txt order, with MIN_SCORE for the missing categories."""
+        return {c: scores.get(c, MIN_SCORE) for c in self.categories}
+
+
+def main():
+    """Validate an existing categorization file, without calling the LLM."""
+    with open(CATEGORIES_FILE, 'r') as f:
+        categories = [line.strip() for line in f if line.strip()]
+
+    with open(INPUT_FILE, 'r') as f:
+        abstracts = json.load(f)
+
+    validator = CategoryValidator(categories)
+    n_incomplete = 0
+    for abstract in abstracts:
+        if not abstract.get('category_scores'):
+            # failed categorization, left empty so that reparse_abstracts.py retries it
+            print(f"Abstract {abstract['number']}: no category scores")
+            continue
+        valid, missing, unknown = validator.validate(abstract['category_scores'])
+        if unknown:
+            print(f"Abstract {abstract['number']}: unrecognized categories {unknown}")
+        if missing:
+            n_incomplete += 1
+            print(f"Abstract {abstract['number']}: {len(missing)} missing categories, set to {MIN_SCORE}")
+        abstract['category_scores'] = validator.complete(valid)
+
+    print(f"{n_incomplete}/{len(abstracts)} abstracts had missing categories")
+    with open(OUTPUT_FILE, 'w') as f:
+        json.dump(abstracts, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -2,6 +2,12 @@ import json
 import csv
 import re
 
+import numpy as np
+
+from abstract_store import load_store
+from join_index import KeyIndex, join
+from score_matrix import load_scores
+
 SCORES_CSV = 'Export_ESMRMB_2025_Abstract_20250619_095047_review.csv'
 CATEGORIZED_ABSTRACTS_JSON = 'categorized_abstracts_clean.json'
 
@@ -31,58 +37,60 @@ def get_score(abstract_row, reviewer_index, score_name):
 # load categorized abstracts
 with open(CATEGORIZED_ABSTRACTS_JSON, 'r', encoding='utf-8') as f:
     categorized_abstracts = json.load(f)
+category_scores = load_scores(CATEGORIZED_ABSTRACTS_JSON)
 
-# load scores from CSV into a dictionary
-scores_dict = {}
-with open(SCORES_CSV, 'r', encoding='ISO-8859-15') as f:
-    reader = csv.DictReader(f, delimiter=';', quotechar='"')
-    for row in reader:
-        reference = '#' + row['Reference']
-        format = 'Oral' if row.get('Format souhaité', '').startswith('Oral') else 'Poster'
-        comments = []
-        scores = []
-        n_reviewers = 0
-        for i in range(N_REVIEWERS):
-            reviewer_ok = False
-            scores.append([])
-            for score_index, score_name in enumerate(SCORE_NAMES):
-                score = get_score(row, i, score_name)
-                if score > 0:
-                    reviewer_ok = True
-                scores[i].append(score)
-            if reviewer_ok:
-                n_reviewers += 1
-            comments.append(row.get(f'Commentaires {i + 1}', ''))
-        if n_reviewers < 2:
-            print(f'Warning: Abstract {reference} has less than 2 reviewers!')
-        scores_dict[reference] = {
-            'format': format,
-            'scores': scores,
-            'comments': comments
-        }
+# load scores from CSV into an index by reference
+review_scores = []
+for row in load_store(SCORES_CSV):
+    reference = row['reference']
+    format = 'Oral' if row.get('preferred_format', '').startswith('Oral') else 'Poster'
+    comments = []
+    scores = []
+    n_reviewers = 0
+    for i in range(N_REVIEWERS):
+        reviewer_ok = False
+        scores.append([])
+        for score_index, score_name in enumerate(SCORE_NAMES):
+            score = get_score(row, i, score_name)
+            if score > 0:
+                reviewer_ok = True
+            scores[i].append(score)
+        if reviewer_ok:
+            n_reviewers += 1
+        comments.append(row.get(f'Commentaires {i + 1}', ''))
+    if n_reviewers < 2:
+        print(f'Warning: Abstract {reference} has less than 2 reviewers!')
+    review_scores.append({
+        'reference': reference,
+        'format': format,
+        'scores': scores,
+        'comments': comments
+    })
+scores_index = KeyIndex(review_scores, 'reference', SCORES_CSV)
 
 # Creating output data structure
 # Fields: ID, Title, Authors, Focus Topic, Main Categories, Preferred Presentation Type, ReviewerX ScoreY
 
 multispace_cleanup_re = re.compile(r'\s+')
 
+scores_join = join(categorized_abstracts, scores_index, 'number', how='inner')
+scores_join.report(CATEGORIZED_ABSTRACTS_JSON, SCORES_CSV, unmatched_right=False)
+
 abstract_output = []
-for abstract in categorized_abstracts:
+for abstract, abstract_scores in scores_join:
     output_dict = {}
     reference = abstract['number']
-    if reference not in scores_dict:
-        print(f'Warning: No scores found for abstract {reference}')
-        continue
     output_dict['ID'] = reference[1:]  # Remove the leading '#'
     output_dict['Title'] = abstract['title']
     output_dict['Authors'] = re.sub(multispace_cleanup_re, ' ', ', '.join(abstract['authors']))
     output_dict['Focus Topic'] = FT_MAP[abstract['focus_topic']]
 
     # find main categories
-    sorted_cats = dict(sorted(abstract['category_scores'].items(), key=lambda x: x[1], reverse=True))
+    scores = category_scores.row(reference)
     main_categories = []
     max_categories = 4
-    for category, score in sorted_cats.items():
+    for i in np.argsort(-scores, kind='stable'):
+        category, score = category_scores.categories[i], scores[i]
         if category == 'Aligning Clinical Expectations with imaging Research in Neuro-Oncology':
             continue
         if category == 'Brain tumors: Data and MR technology driving innovation':
@@ -93,9 +101,9 @@ for abstract in categorized_abstracts:
             break
 
     output_dict['Main Categories'] = ', '.join(main_categories)
-    output_dict['Preferred Presentation Type'] = scores_dict[reference]['format']
+    output_dict['Preferred Presentation Type'] = abstract_scores['format']
     for i in range(N_REVIEWERS):
-        reviewer_scores = scores_dict[reference]['scores'][i]
+        reviewer_scores = abstract_scores['scores'][i]
         for j in range(len(SCORE_NAMES)):
             output_dict[f'Reviewer{i + 1} Score{j + 1}'] = reviewer_scores[j]
     abstract_output.append(output_dict)
@@ -0,0 +1,312 @@
+import argparse
+import hashlib
+import json
+import os
+import tempfile
+from concurrent.futures import ProcessPoolExecutor
+
+from pdf2image import convert_from_path
+from PIL import Image
+
+from figure_names import figure_path
+from figure_preprocessing import crop_whitespace
+
+IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
+CACHE_FOLDER = '/media/bigboy2/ESMRMB2025/figure_cache/'
+MAX_CACHE_SIZE = 2 * 1024 ** 3  # bytes, least recently used figures are removed above this size by prune_cache
+DPI = 150
+# increase when the rendering changes, to invalidate the cached figures
+CACHE_VERSION = 2
+
+# Normalization of the figures for print: 5 inch wide in the documents
+PRINT_WIDTH = 5.0  # inches
+PRINT_DPI = 300
+JPEG_QUALITY = 85
+# images with more distinct colors (on a thumbnail) are photos and saved as JPEG, the others as PNG
+PHOTO_MIN_COLORS = 4096
+WORKERS = os.cpu_count() or 1
+# authors upload very large figures, they are downscaled before embedding. PIL warns above this number of pixels
+# and refuses to open images above twice this number (decompression bombs)
+MAX_FIGURE_PIXELS = 16384 ** 2
+Image.MAX_IMAGE_PIXELS = MAX_FIGURE_PIXELS
+
+
+def content_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+# content hashes of this process by (path, size, modification time)
+_hashes = {}
+
+
+def file_hash(path: str) -> str:
+    """
+    Content hash of a file, computed once per process as long as its size and modification time do not change.
+    The hash recorded in the figure manifest (figure_manifest.py) is used if the file did not change since.
+    """
+    stat = os.stat(path)
+    key = (path, stat.st_size, stat.st_mtime_ns)
+    if key not in _hashes:
+        # imported here, figure_manifest imports this module
+        from figure_manifest import load_manifest
+        manifest = load_manifest()
+        entry = manifest.get(path) if manifest is not None else None
+        if entry and entry['exists'] and entry['hash'] and \
+                (entry['size'], entry['mtime']) == (stat.st_size, stat.st_mtime_ns):
+            _hashes[key] = entry['hash']
+        else:
+            _hashes[key] = content_hash(path)
+    return _hashes[key]
+
+
+def cache_key(path: str, dpi: int, crop: bool) -> str:
+    """Name of the cached image: hash of the source content and of the render parameters."""
+    return f'{file_hash(path)}_v{CACHE_VERSION}_{dpi}dpi{"_crop" if crop else ""}.png'
+
+
+def cache_size(cache_folder: str = CACHE_FOLDER):
+    """Number of files and total size in bytes of the cache."""
+    entries = [entry for entry in os.scandir(cache_folder) if entry.is_file()] if os.path.isdir(cache_folder) else []
+    return len(entries), sum(entry.stat().st_size for entry in entries)
+
+
+def prune_cache(cache_folder: str = CACHE_FOLDER, max_size: int = MAX_CACHE_SIZE) -> int:
+    """
+    Remove the least recently used images until the cache is below max_size.
+    Cache hits update the modification time of the images, which is used as last use time.
+
+    Returns:
+        Number of removed images
+    """
+    if not os.path.isdir(cache_folder):
+        return 0
+    entries = []
+    for entry in os.scandir(cache_folder):
+        try:
+            if entry.is_file():
+                stat = entry.stat()
+                entries.append((stat.st_mtime, stat.st_size, entry.path))
+        except FileNotFoundError:
+            # removed by another process
+            continue
+    total = sum(size for _, size, _ in entries)
+    removed = 0
+    for _, size, path in sorted(entries):
+        if total <= max_size:
+            break
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        total -= size
+        removed += 1
+    return removed
+
+
+def rasterize_pdf(pdf_path: str, dpi: int = DPI, crop: bool = True, cache_folder: str = CACHE_FOLDER):
+    """
+    PNG image of the first page of a PDF figure, rendered only if it is not in the cache yet.
+    The cache is not pruned here, but once per batch by prune_cache.
+
+    Args:
+        pdf_path: PDF figure
+        dpi: Resolution of the rendering
+        crop: Crop the white border of the page
+        cache_folder: Folder of the cached images
+
+    Returns:
+        Path of the cached PNG image, or None if the PDF could not be rendered
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    cached_path = os.path.join(cache_folder, cache_key(pdf_path, dpi, crop))
+    if os.path.exists(cached_path):
+        try:
+            os.utime(cached_path)
+            return cached_path
+        except FileNotFoundError:
+            # removed by another process in the meantime
+            pass
+
+    print("Converting PDF figure to image:", pdf_path)
+    with tempfile.TemporaryDirectory() as tmpdir:
+        images = convert_from_path(pdf_path, dpi=dpi, first_page=1, last_page=1, output_folder=tmpdir, fmt='png')
+        if not images:
+            return None
+        img = images[0]
+        if crop:
+            img = crop_whitespace(img)
+        # write and rename, so that parallel builders never read a partial image
+        fd, tmp_path = tempfile.mkstemp(suffix='.png', dir=cache_folder)
+        os.close(fd)
+        img.save(tmp_path)
+    os.chmod(tmp_path, 0o644)
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+
+def is_photo(img) -> bool:
+    """Photos have many distinct colors, line art (plots, diagrams) only a few."""
+    thumbnail = img.convert('RGB')
+    thumbnail.thumbnail((256, 256))
+    return thumbnail.getcolors(maxcolors=PHOTO_MIN_COLORS) is None
+
+
+def normalize_image(image_path: str, max_width: int, quality: int = JPEG_QUALITY, cache_folder: str = CACHE_FOLDER,
+                    source_key: str = None) -> str:
+    """
+    Downscale an image to max_width pixels and recompress it: photos as JPEG, line art as optimized PNG.
+
+    Args:
+        image_path: Image in any format readable by PIL
+        max_width: Width in pixels at the print resolution
+        quality: JPEG quality of the photos
+        cache_folder: Folder of the cached images
+        source_key: Key of the content of the image, its content hash by default. The rasterized PDF figures
+            use their cache name, so that they are not hashed again
+
+    Returns:
+        Path of the normalized image in the cache, or image_path itself if it is already smaller
+    """
+    os.makedirs(cache_folder, exist_ok=True)
+    key = f'{source_key or file_hash(image_path)}_v{CACHE_VERSION}_{max_width}px_q{quality}'
+    for extension in ['.jpg', '.png', '.orig']:
+        cached_path = os.path.join(cache_folder, key + extension)
+        if os.path.exists(cached_path):
+            try:
+                os.utime(cached_path)
+            except FileNotFoundError:
+                continue
+            return image_path if extension == '.orig' else cached_path
+
+    with Image.open(image_path) as img:
+        img.load()
+        resized = img.width > max_width
+        if resized:
+            img = img.resize((max_width, round(img.height * max_width / img.width)), Image.LANCZOS)
+        if is_photo(img):
+            extension, save_args = '.jpg', {'format': 'JPEG', 'quality': quality, 'optimize': True}
+            if img.mode in ('RGBA', 'LA', 'P'):
+                rgba = img.convert('RGBA')
+                img = Image.new('RGB', rgba.size, (255, 255, 255))
+                img.paste(rgba, mask=rgba.getchannel('A'))
+            elif img.mode != 'RGB':
+                img = img.convert('RGB')
+        else:
+            extension, save_args = '.png', {'format': 'PNG', 'optimize': True}
+            if img.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+                img = img.convert('RGB')
+        fd, tmp_path = tempfile.mkstemp(suffix=extension, dir=cache_folder)
+        os.close(fd)
+        img.save(tmp_path, **save_args)
+    os.chmod(tmp_path, 0o644)
+
+    # keep the original if the recompressed image is not smaller and the original can be embedded as is
+    original_ok = os.path.splitext(image_path)[1].lower() in ('.png', '.jpg', '.jpeg', '.gif')
+    if not resized and original_ok and os.path.getsize(tmp_path) >= os.path.getsize(image_path):
+        os.remove(tmp_path)
+        # empty marker, so that the image is not recompressed again
+        open(os.path.join(cache_folder, key + '.orig'), 'w').close()
+        return image_path
+    cached_path = os.path.join(cache_folder, key + extension)
+    os.replace(tmp_path, cached_path)
+    return cached_path
+
+
+def figure_image(figure_path: str, dpi: int = DPI, crop: bool = True, normalize: bool = True,
+                 width: float = PRINT_WIDTH, print_dpi: int = PRINT_DPI, cache_folder: str = CACHE_FOLDER):
+    """
+    Image file to insert in a document for a figure: the cached rendering of PDF figures, the file itself otherwise.
+    With normalize, the image is downscaled to width inches at print_dpi and recompressed.
+
+    Returns:
+        Path of the image, or None if a PDF figure could not be rendered. Missing files are returned
+        as is, so that the caller reports them when inserting the picture.
+    """
+    if not os.path.exists(figure_path):
+        return figure_path
+    image_path = figure_path
+    source_key = None
+    if figure_path.lower().endswith('.pdf'):
+        image_path = rasterize_pdf(figure_path, dpi, crop, cache_folder)
+        if image_path is None:
+            return None
+        source_key = os.path.splitext(os.path.basename(image_path))[0]
+    if not normalize:
+        return image_path
+    try:
+        return normalize_image(image_path, round(width * print_dpi), cache_folder=cache_folder, source_key=source_key)
+    except OSError as e:
+        # not readable by PIL, let the caller report it
+        print(f"Warning: could not normalize {figure_path}: {e}")
+        return image_path
+
+
+def _prepare_figure(figure_path: str, cache_folder: str = CACHE_FOLDER):
+    try:
+        image_path = figure_image(figure_path, cache_folder=cache_folder)
+    except Exception as e:
+        return figure_path, None, f'{type(e).__name__}: {e}'
+    return figure_path, image_path, ''
+
+
+def prepare_figures(figure_paths, workers: int = WORKERS, max_size: int = MAX_CACHE_SIZE,
+                    cache_folder: str = CACHE_FOLDER):
+    """
+    Rasterize and normalize the figures in a process pool into cache_folder, so that the builders only read the
+    cache, and prune the cache once at the end. Prints the total size of the figures before and after normalization.
+    """
+    original_size = 0
+    normalized_size = 0
+    failed = []
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        results = executor.map(_prepare_figure, figure_paths, [cache_folder] * len(figure_paths), chunksize=4)
+        for figure_path, image_path, error in results:
+            if image_path is None or not os.path.exists(image_path):
+                failed.append((figure_path, error or 'missing or not renderable'))
+                continue
+            original_size += os.path.getsize(figure_path)
+            normalized_size += os.path.getsize(image_path)
+    for figure_path, error in failed:
+        print(f"Warning: {figure_path}: {error}")
+    print(f"{len(figure_paths) - len(failed)} figures: {original_size / 1024 ** 2:.1f} MB -> "
+          f"{normalized_size / 1024 ** 2:.1f} MB ({len(failed)} failed)")
+    if original_size:
+        print(f"Size reduction: {100 * (1 - normalized_size / original_size):.1f}%")
+    n_removed = prune_cache(cache_folder, max_size)
+    if n_removed:
+        print(f"Removed {n_removed} least recently used images from the cache")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Manage the cache of rasterized PDF figures')
+    parser.add_argument('--cache-folder', default=CACHE_FOLDER)
+    parser.add_argument('--prune', type=int, nargs='?', const=MAX_CACHE_SIZE, metavar='MAX_BYTES',
+                        help='Remove the least recently used images above this size')
+    parser.add_argument('--clear', action='store_true', help='Remove all cached images')
+    parser.add_argument('--prepare', metavar='JSON_FILE',
+                        help='Rasterize and normalize the figures of an abstract JSON file (e.g. abstracts_for_print.json)')
+    parser.add_argument('--image-folder', default=IMAGE_FOLDER)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    if args.prepare:
+        with open(args.prepare, 'r', encoding='utf-8') as f:
+            abstracts = json.load(f)
+        figure_paths = sorted({figure_path(figure, args.image_folder)
+                               for abstract in abstracts for figure in abstract.get('figure_files') or []})
+        # skip the figures that the manifest knows to be missing or broken
+        from figure_manifest import load_manifest
+        manifest = load_manifest()
+        if manifest is not None:
+            figure_paths = [path for path in figure_paths if manifest.is_valid(path)]
+        prepare_figures(figure_paths, args.workers, cache_folder=args.cache_folder)
+    elif args.clear:
+        print(f"Removed {prune_cache(args.cache_folder, 0)} images")
+    elif args.prune is not None:
+        print(f"Removed {prune_cache(args.cache_folder, args.prune)} images")
+    n_files, size = cache_size(args.cache_folder)
+    print(f"{n_files} images, {size / 1024 ** 2:.1f} MB in {args.cache_folder}")
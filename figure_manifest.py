@@ -0,0 +1,168 @@
+import argparse
+import json
+import os
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Dict, Iterable, List
+
+from pdf2image import pdfinfo_from_path
+from PIL import Image
+
+from figure_cache import content_hash
+from figure_names import figure_path
+
+IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
+MANIFEST_FILE = 'figure_manifest.json'
+WORKERS = 16  # mostly waiting for the disk
+# increase when the recorded fields change, to inspect all figures again
+MANIFEST_VERSION = 1
+
+
+def inspect_figure(path: str, size: int, mtime: int) -> Dict[str, Any]:
+    """
+    Read the content hash, format, pixel dimensions and page count of a figure file.
+    A figure is valid if it can be decoded as an image, or if it is a PDF with at least one page.
+    Images above twice the pixel limit of figure_cache (MAX_FIGURE_PIXELS) are invalid, as they cannot be normalized.
+    """
+    entry = {'exists': True, 'size': size, 'mtime': mtime, 'hash': None, 'format': None,
+             'width': None, 'height': None, 'pages': None, 'valid': False, 'error': ''}
+    try:
+        entry['hash'] = content_hash(path)
+        if path.lower().endswith('.pdf'):
+            info = pdfinfo_from_path(path)
+            entry['format'] = 'PDF'
+            entry['pages'] = int(info.get('Pages', 0))
+            entry['valid'] = entry['pages'] > 0
+            if not entry['valid']:
+                entry['error'] = 'PDF without pages'
+        else:
+            with Image.open(path) as img:
+                entry['format'] = img.format
+                entry['width'], entry['height'] = img.size
+                entry['pages'] = getattr(img, 'n_frames', 1)
+                img.verify()
+            entry['valid'] = True
+    except Exception as e:
+        entry['error'] = f'{type(e).__name__}: {e}'
+    return entry
+
+
+class FigureManifest:
+    """
+    Index of the figure files by path: existence, size, modification time, content hash, format,
+    pixel dimensions, page count and whether the figure can be rendered.
+
+    Only the figures whose size or modification time changed since the last update are inspected again.
+    """
+
+    def __init__(self, manifest_file: str = MANIFEST_FILE):
+        self.manifest_file = manifest_file
+        self.entries = {}
+        if os.path.exists(manifest_file):
+            with open(manifest_file, 'r', encoding='utf-8') as f:
+                manifest = json.load(f)
+            if manifest.get('version') == MANIFEST_VERSION:
+                self.entries = manifest['figures']
+
+    def __contains__(self, path: str):
+        return path in self.entries
+
+    def get(self, path: str) -> Dict[str, Any]:
+        return self.entries.get(path)
+
+    def is_valid(self, path: str) -> bool:
+        """False for missing or broken figures. Figures that are not in the manifest are assumed valid."""
+        entry = self.entries.get(path)
+        return entry is None or entry['valid']
+
+    def update(self, paths: Iterable[str], workers: int = WORKERS) -> int:
+        """
+        Update the entries of the figures. The folders are listed once (os.scandir gives the size and
+        modification time of every file), and the new or changed figures are inspected in a thread pool.
+
+        Returns:
+            Number of inspected figures
+        """
+        paths = sorted(set(paths))
+        listings = {}
+        for folder in {os.path.dirname(path) for path in paths}:
+            try:
+                listings[folder] = {entry.path: entry.stat() for entry in os.scandir(folder) if entry.is_file()}
+            except FileNotFoundError:
+                listings[folder] = {}
+
+        to_inspect = []
+        for path in paths:
+            stat = listings[os.path.dirname(path)].get(path)
+            if stat is None:
+                self.entries[path] = {'exists': False, 'valid': False, 'error': 'file not found'}
+                continue
+            entry = self.entries.get(path)
+            if entry and entry['exists'] and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                continue
+            to_inspect.append((path, stat.st_size, stat.st_mtime_ns))
+
+        with ThreadPoolExecutor(max_workers=workers) as executor:
+            for (path, _, _), entry in zip(to_inspect, executor.map(lambda args: inspect_figure(*args), to_inspect)):
+                self.entries[path] = entry
+        return len(to_inspect)
+
+    def save(self):
+        tmp_file = self.manifest_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'version': MANIFEST_VERSION, 'figures': self.entries}, f, indent=2)
+        os.replace(tmp_file, self.manifest_file)
+
+
+_manifest = None
+
+
+def load_manifest(manifest_file: str = MANIFEST_FILE):
+    """Manifest of this process, loaded once. None if the manifest has not been built."""
+    global _manifest
+    if _manifest is None and os.path.exists(manifest_file):
+        _manifest = FigureManifest(manifest_file)
+    return _manifest
+
+
+def abstract_figures(abstracts: List[Dict[str, Any]], image_folder: str = IMAGE_FOLDER):
+    """(reference, figure name, path) of every figure of the abstracts."""
+    for abstract in abstracts:
+        for figure in abstract.get('figure_files') or []:
+            yield abstract['reference'], figure, figure_path(figure, image_folder)
+
+
+def build_manifest(abstracts_file: str = 'abstracts_for_print.json', manifest_file: str = MANIFEST_FILE,
+                   image_folder: str = IMAGE_FOLDER, workers: int = WORKERS) -> FigureManifest:
+    """Update the manifest with the figures of an abstract file, report the invalid ones and save it."""
+    with open(abstracts_file, 'r', encoding='utf-8') as f:
+        abstracts = json.load(f)
+    figures = list(abstract_figures(abstracts, image_folder))
+
+    manifest = FigureManifest(manifest_file)
+    n_inspected = manifest.update([path for _, _, path in figures], workers)
+    manifest.save()
+
+    n_invalid = 0
+    for reference, figure, path in figures:
+        entry = manifest.get(path)
+        if not entry['exists']:
+            print(f"Warning: Image file {figure} for abstract {reference} does not exist at {path}.")
+        elif not entry['valid']:
+            print(f"Warning: Image file {figure} for abstract {reference} cannot be rendered: {entry['error']}")
+        else:
+            continue
+        n_invalid += 1
+    print(f"{len(figures)} figures, {n_inspected} inspected, {n_invalid} missing or invalid. "
+          f"Manifest written to {manifest_file}")
+    return manifest
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the manifest of the figures of the abstracts')
+    parser.add_argument('abstracts_file', nargs='?', default='abstracts_for_print.json')
+    parser.add_argument('--manifest', default=MANIFEST_FILE)
+    parser.add_argument('--image-folder', default=IMAGE_FOLDER)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    args = parser.parse_args()
+
+    build_manifest(args.abstracts_file, args.manifest, args.image_folder, args.workers)
@@ -0,0 +1,106 @@
+import json
+import os
+from typing import Dict, Iterable, List, Tuple
+
+from unidecode import unidecode
+
+IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
+NAME_MAP_FILE = 'figure_names.json'
+
+
+def normalize_name(name: str) -> str:
+    """ASCII file name of a figure, as used in the image folder."""
+    return unidecode(name.replace('?', ''))
+
+
+def _with_suffix(name: str, n: int) -> str:
+    stem, extension = os.path.splitext(name)
+    return f'{stem}_{n}{extension}'
+
+
+def plan_renames(filenames: Iterable[str]) -> Tuple[Dict[str, str], List[Tuple[str, str, str]]]:
+    """
+    New name of each file of the image folder. Files whose name is already normalized keep it, and a file
+    whose normalized name is taken gets a numbered suffix instead of overwriting the other file.
+
+    Returns:
+        Map original name -> new name of all files, and the (original, normalized, new name) collisions
+    """
+    filenames = sorted(filenames)
+    renames = {name: name for name in filenames if normalize_name(name) == name}
+    taken = set(renames.values())
+    collisions = []
+    for name in filenames:
+        if name in renames:
+            continue
+        normalized = normalize_name(name)
+        new_name = normalized
+        n = 2
+        while new_name in taken:
+            new_name = _with_suffix(normalized, n)
+            n += 1
+        if new_name != normalized:
+            collisions.append((name, normalized, new_name))
+        renames[name] = new_name
+        taken.add(new_name)
+    return renames, collisions
+
+
+def rename_files(renames: Dict[str, str], image_folder: str = IMAGE_FOLDER) -> int:
+    """Rename the files of the image folder. The targets are unique and never an existing file."""
+    n_renamed = 0
+    for name, new_name in renames.items():
+        if name == new_name:
+            continue
+        dst = os.path.join(image_folder, new_name)
+        if os.path.exists(dst):
+            raise FileExistsError(f'Cannot rename {name}: {dst} exists')
+        os.rename(os.path.join(image_folder, name), dst)
+        n_renamed += 1
+    return n_renamed
+
+
+def reference_map(figures: Iterable[str], files: Dict[str, str]) -> Dict[str, str]:
+    """
+    File name of each figure name of the abstracts. A figure name that is the original name of a file resolves
+    to the new name of that file, even if it collided; the others resolve to their normalized name.
+    """
+    return {figure: files.get(figure, files.get(normalize_name(figure), normalize_name(figure))) for figure in figures}
+
+
+class FigureNames:
+    """Persistent map of the original figure names (file names and names in the abstracts) to the file names."""
+
+    def __init__(self, map_file: str = NAME_MAP_FILE):
+        self.map_file = map_file
+        self.files = {}
+        self.references = {}
+        if os.path.exists(map_file):
+            with open(map_file, 'r', encoding='utf-8') as f:
+                names = json.load(f)
+            self.files = names['files']
+            self.references = names['references']
+
+    def resolve(self, figure: str) -> str:
+        """File name of a figure name of the abstracts."""
+        name = self.references.get(figure)
+        if name is None:
+            name = self.files.get(figure) or normalize_name(figure)
+        return name
+
+    def save(self):
+        tmp_file = self.map_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump({'files': self.files, 'references': self.references}, f, indent=2, ensure_ascii=False)
+        os.replace(tmp_file, self.map_file)
+
+
+_names = None
+
+
+def figure_path(figure: str, image_folder: str = IMAGE_FOLDER) -> str:
+    """Path of a figure name of the abstracts, from the name map if rename_image_files.py wrote one."""
+    global _names
+    if _names is None:
+        _names = FigureNames()
+    return os.path.join(image_folder, _names.resolve(figure))
@@ -0,0 +1,163 @@
+import argparse
+import os
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import List, Optional, Tuple
+
+import numpy as np
+from PIL import Image, ImageChops
+
+# Pixels whose channels are all within TOLERANCE of white (or almost transparent) are background
+TOLERANCE = 10
+# Rows of pixels converted to an array at a time, so that only a strip of the image is copied
+STRIP_ROWS = 256
+WORKERS = os.cpu_count() or 1
+
+Box = Tuple[int, int, int, int]
+
+
+def _strip_flags(strip: np.ndarray, img, tolerance: int):
+    """Flags of the rows and of the columns of a strip of img that contain non-background pixels."""
+    threshold = 255 - tolerance
+    mode = img.mode
+    if mode in ('RGB', 'CMYK'):
+        # test the channels on a 2D view and fold the column flags per pixel afterwards, which avoids
+        # reductions over the short channel axis
+        flat = strip.reshape(strip.shape[0], -1)
+        mask = flat < threshold if mode == 'RGB' else flat > tolerance
+        return mask.any(axis=1), mask.any(axis=0).reshape(-1, strip.shape[2]).any(axis=1)
+    if mode == '1':
+        mask = ~strip
+    elif mode == 'L':
+        mask = strip < threshold
+    elif mode == 'LA':
+        mask = (strip[..., 0] < threshold) & (strip[..., 1] > tolerance)
+    elif mode == 'RGBA':
+        mask = (strip[..., :3] < threshold).any(axis=2) & (strip[..., 3] > tolerance)
+    elif mode == 'P':
+        mask = _palette_lut(img, tolerance)[strip]
+    else:
+        raise ValueError(f"Unsupported image mode: {mode}")
+    return mask.any(axis=1), mask.any(axis=0)
+
+
+def _palette_lut(img, tolerance: int) -> np.ndarray:
+    """Content flag of each palette index of a palette image."""
+    palette = np.array(img.getpalette() or [], dtype=np.uint8).reshape(-1, 3)
+    lut = np.ones(256, dtype=bool)
+    lut[:len(palette)] = (palette < 255 - tolerance).any(axis=1)
+    transparency = img.info.get('transparency')
+    if isinstance(transparency, int):
+        lut[transparency] = False
+    elif isinstance(transparency, bytes):
+        alpha = np.frombuffer(transparency, dtype=np.uint8)
+        lut[:len(alpha)] &= alpha > tolerance
+    return lut
+
+
+def content_bbox(img, tolerance: int = TOLERANCE) -> Optional[Box]:
+    """
+    Bounding box of the non-white content of an image, as (left, upper, right, lower) like Image.getbbox.
+    The image is read in strips of rows and reduced to one flag per row and per column, so no full-size
+    background or difference image is allocated.
+
+    Returns:
+        The bounding box, or None if the image is entirely white
+    """
+    if img.mode not in ('1', 'L', 'LA', 'RGB', 'RGBA', 'CMYK', 'P'):
+        img = img.convert('RGB')
+    width, height = img.size
+    rows = np.zeros(height, dtype=bool)
+    columns = np.zeros(width, dtype=bool)
+    for top in range(0, height, STRIP_ROWS):
+        bottom = min(top + STRIP_ROWS, height)
+        strip = np.asarray(img.crop((0, top, width, bottom)))
+        row_flags, column_flags = _strip_flags(strip, img, tolerance)
+        rows[top:bottom] = row_flags
+        columns |= column_flags
+    if not rows.any():
+        return None
+    row_indices = np.flatnonzero(rows)
+    column_indices = np.flatnonzero(columns)
+    return int(column_indices[0]), int(row_indices[0]), int(column_indices[-1]) + 1, int(row_indices[-1]) + 1
+
+
+def crop_whitespace(img, tolerance: int = TOLERANCE):
+    bbox = content_bbox(img, tolerance)
+    if bbox:
+        return img.crop(bbox)
+    return img
+
+
+def crop_file(image_path: str, output_path: str, tolerance: int = TOLERANCE) -> Optional[Box]:
+    """Crop the white border of an image file. Returns the bounding box of the content."""
+    with Image.open(image_path) as img:
+        img.load()
+        bbox = content_bbox(img, tolerance)
+        (img.crop(bbox) if bbox else img).save(output_path)
+    return bbox
+
+
+def crop_files(image_paths: List[str], output_paths: List[str], tolerance: int = TOLERANCE,
+               workers: int = WORKERS) -> List[Optional[Box]]:
+    """
+    Crop a list of image files in a thread pool (decoding, encoding and the NumPy reductions release the GIL).
+
+    Returns:
+        Bounding box of each image, None for entirely white images. Exceptions are returned in place of the box.
+    """
+    def crop(paths):
+        try:
+            return crop_file(paths[0], paths[1], tolerance)
+        except Exception as e:
+            return e
+
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        return list(executor.map(crop, zip(image_paths, output_paths)))
+
+
+def legacy_crop_whitespace(img):
+    """Previous implementation: difference with a full-size white image."""
+    bg = Image.new(img.mode, img.size, (255, 255, 255))
+    diff = ImageChops.difference(img, bg)
+    bbox = diff.getbbox()
+    if bbox:
+        return img.crop(bbox)
+    return img
+
+
+def benchmark(width: int = 6000, height: int = 4000, repeats: int = 3):
+    """Compare the NumPy bounding box with the previous implementation on a synthetic figure."""
+    img = Image.new('RGB', (width, height), (255, 255, 255))
+    content = np.random.default_rng(0).integers(0, 256, (height // 2, width // 2, 3), dtype=np.uint8)
+    img.paste(Image.fromarray(content), (width // 4, height // 4))
+
+    for name, func in [('Difference image', lambda: legacy_crop_whitespace(img)),
+                       ('NumPy row/column reduction', lambda: crop_whitespace(img, 0))]:
+        t0 = time.perf_counter()
+        for _ in range(repeats):
+            cropped = func()
+        elapsed = (time.perf_counter() - t0) / repeats
+        print(f"{name}: {elapsed * 1000:.0f} ms per {width}x{height} image, cropped to {cropped.size}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Crop the white border of figures')
+    parser.add_argument('images', nargs='*')
+    parser.add_argument('--output-folder', help='Folder of the cropped images (default: crop in place)')
+    parser.add_argument('--tolerance', type=int, default=TOLERANCE)
+    parser.add_argument('--workers', type=int, default=WORKERS)
+    parser.add_argument('--benchmark', action='store_true', help='Compare with the previous implementation')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark()
+    elif args.images:
+        output_paths = args.images
+        if args.output_folder:
+            os.makedirs(args.output_folder, exist_ok=True)
+            output_paths = [os.path.join(args.output_folder, os.path.basename(path)) for path in args.images]
+        for path, bbox in zip(args.images, crop_files(args.images, output_paths, args.tolerance, args.workers)):
+            print(f"{path}: {bbox}")
+    else:
+        parser.print_help()
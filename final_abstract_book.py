@@ -1,144 +1,248 @@
 # create doc file
-import pypandoc
 from docx import Document
-from docx.image.exceptions import UnrecognizedImageError
-from docx.shared import Inches
+from docxcompose.composer import Composer
+from pypdf import PdfWriter
+import argparse
+import hashlib
 import json
 import os
 import csv
-from unidecode import unidecode
-import tempfile
-from pdf2image import convert_from_path
-from PIL import Image, ImageChops
+import time
+from concurrent.futures import ProcessPoolExecutor
 
-IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
-OUTPUT_FILE  = '/media/bigboy2/ESMRMB2025/esmrmb2025_abstracts.docx'
+from abstract_docx import IMAGE_FOLDER, add_abstract, docx_to_pdf, renderer_hash
+import figure_names
+from figure_cache import prune_cache
+from figure_manifest import load_manifest
+from join_index import KeyIndex, field_key, join
 
-def find_abstract_by_reference(abstracts, reference):
-    for abstract in abstracts:
-        if abstract['reference'] == reference:
-            return abstract
-    return None
-
-def crop_whitespace(img):
-    bg = Image.new(img.mode, img.size, (255, 255, 255))
-    diff = ImageChops.difference(img, bg)
-    bbox = diff.getbbox()
-    if bbox:
-        return img.crop(bbox)
-    return img
-
-with open('abstracts_merged.json', 'r', encoding='utf-8') as f:
-    abstracts = json.load(f)
-
-doc = Document()
-
-with open('assigned_sessions_final_cleaned.csv', 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f, delimiter=';', quotechar='"')
-    for abstract_number,row in enumerate(reader):
-        reference = '#' + row['Id']
-        program_number = row['Program number']
-        if not program_number:
+OUTPUT_FILE  = '/media/bigboy2/ESMRMB2025/esmrmb2025_abstracts.docx'
+SHARD_FOLDER = '/media/bigboy2/ESMRMB2025/book_shards/'
+FRAGMENT_FOLDER = '/media/bigboy2/ESMRMB2025/book_fragments/'
+
+# Each session is rendered in its own shard, long sessions are split in blocks of SHARD_SIZE abstracts
+SHARD_SIZE = 50
+WORKERS = os.cpu_count() or 1
+
+RENDERER_HASH = renderer_hash()
+
+
+def book_abstracts():
+    """(program number, abstract) of the abstracts of the book, in the order of the session CSV."""
+    with open('abstracts_merged.json', 'r', encoding='utf-8') as f:
+        abstracts = KeyIndex(json.load(f), 'reference', 'abstracts_merged.json')
+
+    book = []
+    with open('assigned_sessions_final_cleaned.csv', 'r', encoding='utf-8') as f:
+        reader = csv.DictReader(f, delimiter=';', quotechar='"')
+        session_join = join(reader, abstracts, field_key('Id', '#'))
+        session_join.report('assigned_sessions_final_cleaned.csv', 'abstracts_merged.json', unmatched_right=False)
+        for row, abstract in session_join:
+            reference = '#' + row['Id']
+            program_number = row['Program number']
+            if not program_number:
+                continue
+            if not abstract:
+                print(f'Warning: Abstract with reference {reference} not found in abstracts_for_print.json')
+                break
+            book.append((program_number, abstract))
+    return book
+
+
+def make_shards(book, shard_size=SHARD_SIZE):
+    """Split the book in consecutive shards at each session change and every shard_size abstracts."""
+    shards = []
+    session = None
+    for program_number, abstract in book:
+        if not shards or abstract.get('session_number') != session or len(shards[-1]) >= shard_size:
+            shards.append([])
+            session = abstract.get('session_number')
+        shards[-1].append((program_number, abstract))
+    return shards
+
+
+def fragment_key(program_number, abstract):
+    """
+    Hash of everything the rendering of an abstract depends on: its merged record, its program number,
+    its figures and the rendering code. Figures are identified by their content hash in the manifest
+    (figure_manifest.py) if it is up to date, otherwise by their size and modification time.
+    """
+    manifest = load_manifest()
+    h = hashlib.sha256()
+    h.update(RENDERER_HASH.encode())
+    h.update(str(program_number).encode())
+    h.update(json.dumps(abstract, sort_keys=True).encode())
+    for figure in abstract.get('figure_files') or []:
+        figure_path = figure_names.figure_path(figure, IMAGE_FOLDER)
+        try:
+            stat = os.stat(figure_path)
+        except FileNotFoundError:
+            h.update(f'{figure_path}:missing'.encode())
             continue
-        abstract = find_abstract_by_reference(abstracts, reference)
-        if not abstract:
-            print(f'Warning: Abstract with reference {reference} not found in abstracts_for_print.json')
-            break
+        entry = manifest.get(figure_path) if manifest is not None else None
+        if entry and entry['exists'] and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+            h.update(f'{figure_path}:{entry["hash"]}'.encode())
+        else:
+            h.update(f'{figure_path}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return h.hexdigest()
+
+
+def save_atomic(doc, path):
+    """Save a document under a temporary name first, so that an interrupted build never leaves a partial file."""
+    tmp_path = path + '.tmp'
+    doc.save(tmp_path)
+    os.replace(tmp_path, path)
+
+
+def render_fragment(program_number, abstract, fragment_file):
+    """
+    Worker: render one abstract to its fragment docx. Returns (reference, seconds, error message).
+    An abstract that fails (e.g. a corrupt figure) has an error message and no fragment.
+    """
+    t0 = time.perf_counter()
+    print(f'Processing abstract {abstract["reference"]} - {abstract["title"]}')
+    try:
+        doc = Document()
+        add_abstract(doc, abstract, f'{int(program_number):03d}')
+        save_atomic(doc, fragment_file)
+        message = ''
+    except Exception as e:
+        message = f'{type(e).__name__}: {e}'
+        print(f"Error rendering {abstract['reference']}: {message}")
+    return abstract['reference'], time.perf_counter() - t0, message
+
+
+def merge_docx(docx_files, output_file):
+    """
+    Concatenate docx files in order. Only one file at a time is loaded next to the merged document,
+    but the merged document itself grows to the size of all the files.
+    """
+    composer = Composer(Document(docx_files[0]))
+    for docx_file in docx_files[1:]:
+        composer.append(Document(docx_file))
+    tmp_file = output_file + '.tmp'
+    composer.save(tmp_file)
+    os.replace(tmp_file, output_file)
+    return output_file
+
+
+def shard_to_pdf(shard_file):
+    pdf_file = os.path.splitext(shard_file)[0] + '.pdf'
+    if not os.path.exists(pdf_file):
+        docx_to_pdf(shard_file, pdf_file)
+    return pdf_file
+
+
+def merge_pdf(pdf_files, output_file):
+    writer = PdfWriter()
+    for pdf_file in pdf_files:
+        writer.append(pdf_file)
+    with open(output_file, 'wb') as f:
+        writer.write(f)
+
+
+def remove_unused(folder, used_files):
+    """Remove the cached fragments or shards that are not part of the book anymore."""
+    used = {os.path.basename(path) for path in used_files}
+    removed = 0
+    for name in os.listdir(folder):
+        if os.path.splitext(name)[0] + '.docx' not in used:
+            os.remove(os.path.join(folder, name))
+            removed += 1
+    return removed
+
+
+def build_book(output_file=OUTPUT_FILE, fragment_folder=FRAGMENT_FOLDER, shard_folder=SHARD_FOLDER,
+               shard_size=SHARD_SIZE, workers=WORKERS, merge='docx'):
+    """
+    Incremental build of the book. Every abstract is rendered to a fragment docx named after its fragment key,
+    and only the abstracts whose key changed are rendered again, in parallel worker processes.
+    The fragments are merged into shards (named after the keys of their fragments, so only the shards
+    with a changed abstract are merged again), and the shards are merged in program order,
+    either as docx, or by converting each shard to PDF and merging the PDFs.
+    The final docx merge holds the whole book in memory, like a single build; the PDF merge only copies the pages.
+    Abstracts that fail to render are reported and left out of the book, and rendered again by the next build.
+    """
+    shards = make_shards(book_abstracts(), shard_size)
+    os.makedirs(fragment_folder, exist_ok=True)
+    os.makedirs(shard_folder, exist_ok=True)
+
+    fragment_files = [[os.path.join(fragment_folder, fragment_key(program_number, abstract) + '.docx')
+                       for program_number, abstract in shard] for shard in shards]
+    to_render = [(program_number, abstract, fragment_file)
+                 for shard, files in zip(shards, fragment_files)
+                 for (program_number, abstract), fragment_file in zip(shard, files)
+                 if not os.path.exists(fragment_file)]
+    n_abstracts = sum(len(shard) for shard in shards)
+    print(f"{n_abstracts} abstracts in {len(shards)} shards: rendering {len(to_render)} abstracts with "
+          f"{workers} workers")
+
+    t0 = time.perf_counter()
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        render_times = list(executor.map(render_fragment, *zip(*to_render))) if to_render else []
+        print(f"Abstracts rendered in {time.perf_counter() - t0:.1f} s")
+        # the failed abstracts have no fragment, they are left out of their shard
+        failed = {fragment_file for (_, _, fragment_file), (_, _, message) in zip(to_render, render_times) if message}
+        fragment_files = [files for files in ([f for f in files if f not in failed] for files in fragment_files)
+                          if files]
+        shard_files = [os.path.join(shard_folder, hashlib.sha256(''.join(files).encode()).hexdigest() + '.docx')
+                       for files in fragment_files]
+        to_merge = [(files, shard_file) for files, shard_file in zip(fragment_files, shard_files)
+                    if not os.path.exists(shard_file)]
+        print(f"Merging {len(to_merge)} shards")
+        for shard_file in executor.map(merge_docx, *zip(*to_merge)) if to_merge else []:
+            print(f"{os.path.basename(shard_file)} merged")
+        if merge == 'pdf':
+            pdf_files = list(executor.map(shard_to_pdf, shard_files))
+    for reference, seconds, _ in sorted(render_times, key=lambda x: x[1], reverse=True)[:10]:
+        print(f"  {reference}: {seconds:.1f} s")
+
+    t0 = time.perf_counter()
+    if merge == 'pdf':
+        merge_pdf(pdf_files, os.path.splitext(output_file)[0] + '.pdf')
+    else:
+        merge_docx(shard_files, output_file)
+    print(f"Shards merged in {time.perf_counter() - t0:.1f} s")
+
+    removed = remove_unused(fragment_folder, [f for files in fragment_files for f in files])
+    removed += remove_unused(shard_folder, shard_files)
+    if removed:
+        print(f"Removed {removed} outdated fragments and shards")
+
+    errors = [(reference, message) for reference, _, message in render_times if message]
+    if errors:
+        print(f"Warning: {len(errors)} abstracts could not be rendered and are missing from the book:")
+        for reference, message in errors:
+            print(f"  - {reference}: {message}")
+
+
+def build_single(output_file=OUTPUT_FILE):
+    """Render the whole book in a single document in this process."""
+    doc = Document()
+    for abstract_number, (program_number, abstract) in enumerate(book_abstracts()):
         print(f'Processing abstract {abstract_number+1}: {abstract["reference"]} - {abstract["title"]}')
-        title_par = doc.add_paragraph()
-        title_par.add_run(f'{int(program_number):03d}' + ' \n' + abstract['title']).bold = True
-        authors_par = doc.add_paragraph('')
-        for i, (author_name, affiliations) in enumerate(abstract['authors']):
-            auth_run = authors_par.add_run(author_name)
-            if i == abstract['speaker']:
-                auth_run.underline = True
-            aff_run = authors_par.add_run(affiliations)
-            aff_run.font.superscript = True
-            if (i + 1) < len(abstract['authors']):
-                authors_par.add_run(', ')
-
-        affiliations_par = doc.add_paragraph('')
-        affiliations_par.italic = True
-        for i, aff in enumerate(abstract['affiliations']):
-            aff_run = affiliations_par.add_run(f'{i+1} {aff}').italic = True
-            if (i + 1) < len(abstract['affiliations']):
-                affiliations_par.add_run('\n')
-
-        p = doc.add_paragraph('')
-        p.add_run('Introduction: ').bold = True
-        p.add_run(abstract['introduction'])
-
-        p = doc.add_paragraph('')
-        p.add_run('Methods: ').bold = True
-        p.add_run(abstract['methods'])
-
-        p = doc.add_paragraph('')
-        p.add_run('Results: ').bold = True
-        p.add_run(abstract['results'])
-
-        p = doc.add_paragraph('')
-        p.add_run('Discussion: ').bold = True
-        p.add_run(abstract['discussion'])
-
-        p = doc.add_paragraph('')
-        p.add_run('Conclusion: ').bold = True
-        p.add_run(abstract['conclusion'])
-
-        if abstract['acknowledgments']:
-            p = doc.add_paragraph('')
-            p.add_run('Acknowledgments: ').bold = True
-            p.add_run(abstract['acknowledgments'])
-
-        if abstract['data_and_code_availability']:
-            p = doc.add_paragraph('')
-            p.add_run('Data and Code Availability: ').bold = True
-            p.add_run(abstract['data_and_code_availability'])
-
-        if abstract['figure_files']:
-            for f_num, figure in enumerate(abstract['figure_files']):
-                figure = unidecode(figure.replace('?', ''))
-                figure_path = os.path.join(IMAGE_FOLDER, figure)
-                img_path = figure_path
-                is_temp = False
-
-                if figure.lower().endswith('.pdf'):
-                    print("Converting PDF figure to image:", figure_path)
-                    with tempfile.TemporaryDirectory() as tmpdir:
-                        images = convert_from_path(figure_path, dpi=150, output_folder=tmpdir, fmt='png')
-                        if images:
-                            img = images[0]
-                            img = crop_whitespace(img)
-                            img_path = figure_path + '.png'
-                            img.save(img_path)
-                            is_temp = True
-                        else:
-                            print("Warning: PDF conversion failed for", figure_path)
-                            continue
-                try:
-                    doc.add_picture(img_path, width=Inches(5.0))
-                except FileNotFoundError:
-                    print("Warning: Figure file not found:", IMAGE_FOLDER + figure)
-                    continue
-                except UnrecognizedImageError:
-                    print("Warning: Unrecognized image format for file:", IMAGE_FOLDER + figure)
-                    continue
-                p = doc.add_paragraph('')
-                try:
-                    if not abstract['figure_refs'][f_num]:
-                        p.add_run('Figure ' + str(f_num + 1) + ' ').bold = True
-                    else:
-                        p.add_run(abstract['figure_refs'][f_num]).bold = True
-                    p.add_run(abstract['figure_captions'][f_num])
-                except IndexError:
-                    print('Warning: Figure caption not found for figure', f_num + 1)
-
-        if abstract['references']:
-            p = doc.add_paragraph('')
-            p.add_run('References:\n').bold = True
-            for i, ref in enumerate(abstract['references']):
-                ref_run = p.add_run(f'{i+1}. {ref}')
-                if i+1 < len(abstract['references']):
-                    p.add_run('\n')
-
-doc.save(OUTPUT_FILE)
-
+        add_abstract(doc, abstract, f'{int(program_number):03d}')
+    doc.save(output_file)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Build the final abstract book')
+    parser.add_argument('--workers', type=int, default=WORKERS,
+                        help='Number of shards rendered in parallel, 0 to build the book in a single document')
+    parser.add_argument('--shard-size', type=int, default=SHARD_SIZE, help='Maximum number of abstracts per shard')
+    parser.add_argument('--merge', choices=['docx', 'pdf'], default='docx',
+                        help='Merge the docx shards, or convert each shard to PDF and merge the PDFs. The docx '
+                             'merge loads the whole book in memory, use pdf for large books')
+    parser.add_argument('--rebuild', action='store_true', help='Render all abstracts again, ignoring the cache')
+    args = parser.parse_args()
+
+    if args.workers > 0:
+        if args.rebuild:
+            for folder in [FRAGMENT_FOLDER, SHARD_FOLDER]:
+                if os.path.isdir(folder):
+                    remove_unused(folder, [])
+        build_book(shard_size=args.shard_size, workers=args.workers, merge=args.merge)
+    else:
+        build_single()
+    # the figure cache is pruned once, after the figures of all abstracts were used
+    prune_cache()
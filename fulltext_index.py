@@ -0,0 +1,206 @@
+import argparse
+import hashlib
+import json
+import os
+import sqlite3
+import time
+from typing import Any, Dict, List, Tuple
+
+from category_abstracts import ABSTRACTS_BASE_OUTPUT, ABSTRACTS_FILE, export_list
+from score_matrix import score_value
+
+INDEX_FILE = 'abstracts_fts.sqlite'
+SECTIONS = ['introduction', 'methods', 'results', 'discussion', 'conclusion']
+
+# Porter stemming on top of the unicode61 tokenizer: 'glymphatics' matches glymphatic, accents are ignored
+SCHEMA = '''
+CREATE TABLE IF NOT EXISTS abstracts (
+    id INTEGER PRIMARY KEY,
+    reference TEXT NOT NULL UNIQUE,
+    position INTEGER NOT NULL,
+    program_number TEXT,
+    hash TEXT NOT NULL,
+    data TEXT NOT NULL
+);
+
+CREATE TABLE IF NOT EXISTS category_scores (
+    reference TEXT NOT NULL REFERENCES abstracts(reference) ON DELETE CASCADE,
+    category TEXT NOT NULL,
+    score REAL NOT NULL,
+    PRIMARY KEY (reference, category)
+);
+CREATE INDEX IF NOT EXISTS category_scores_category ON category_scores(category, score);
+
+-- the rowid of an abstract in abstracts_fts is its id
+CREATE VIRTUAL TABLE IF NOT EXISTS abstracts_fts USING fts5(
+    title, keywords, text, subcategories, tokenize='porter unicode61 remove_diacritics 2'
+);
+
+CREATE TABLE IF NOT EXISTS meta (
+    key TEXT PRIMARY KEY,
+    value TEXT
+);
+'''
+
+
+def record_hash(record: Dict[str, Any]) -> str:
+    return hashlib.sha256(json.dumps(record, sort_keys=True, ensure_ascii=False).encode('utf-8')).hexdigest()
+
+
+def fts_fields(record: Dict[str, Any]) -> Tuple[str, str, str, str]:
+    """Title, keywords, section texts and subcategories of an abstract, as indexed."""
+    return (record.get('title', ''),
+            ', '.join(record.get('keywords') or []),
+            '\n\n'.join(record.get(section, '') for section in SECTIONS),
+            '\n'.join([record.get('primary_subcategory', ''), record.get('secondary_subcategory', '')]))
+
+
+class FulltextIndex:
+    """
+    SQLite FTS5 index of the title, keywords, section texts and subcategories of the abstracts, with their
+    category scores. The full records are stored as JSON, to export the results in the format of
+    category_abstracts.py.
+    """
+
+    def __init__(self, index_file: str = INDEX_FILE):
+        self.connection = sqlite3.connect(index_file)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute('PRAGMA journal_mode=WAL')
+        self.connection.execute('PRAGMA synchronous=NORMAL')
+        self.connection.execute('PRAGMA foreign_keys=ON')
+        self.connection.executescript(SCHEMA)
+
+    def close(self):
+        self.connection.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.close()
+
+    def update(self, abstracts: List[Dict[str, Any]]) -> Tuple[int, int]:
+        """
+        Index new and modified abstracts (by hash of the record) and remove the abstracts that are no longer in
+        the list, in one transaction.
+
+        Returns:
+            Number of indexed and of removed abstracts
+        """
+        stored = {row['reference']: (row['id'], row['hash'])
+                  for row in self.connection.execute('SELECT id, reference, hash FROM abstracts')}
+        references = set()
+        n_indexed = 0
+        with self.connection:
+            for position, record in enumerate(abstracts):
+                reference = record['reference']
+                references.add(reference)
+                digest = record_hash(record)
+                if reference in stored:
+                    abstract_id, stored_digest = stored[reference]
+                    if stored_digest == digest:
+                        self.connection.execute('UPDATE abstracts SET position = ? WHERE id = ?',
+                                                (position, abstract_id))
+                        continue
+                    self._delete(abstract_id)
+                abstract_id = self.connection.execute(
+                    'INSERT INTO abstracts (reference, position, program_number, hash, data) VALUES (?, ?, ?, ?, ?)',
+                    (reference, position, record.get('program_number') or None, digest,
+                     json.dumps(record, ensure_ascii=False))).lastrowid
+                self.connection.executemany('INSERT INTO category_scores VALUES (?, ?, ?)',
+                                            [(reference, category, score) for category, score
+                                             in (record.get('category_scores') or {}).items()])
+                self.connection.execute('INSERT INTO abstracts_fts (rowid, title, keywords, text, subcategories) '
+                                        'VALUES (?, ?, ?, ?, ?)', (abstract_id,) + fts_fields(record))
+                n_indexed += 1
+            removed = [abstract_id for reference, (abstract_id, _) in stored.items() if reference not in references]
+            for abstract_id in removed:
+                self._delete(abstract_id)
+        return n_indexed, len(removed)
+
+    def _delete(self, abstract_id: int):
+        self.connection.execute('DELETE FROM abstracts_fts WHERE rowid = ?', (abstract_id,))
+        self.connection.execute('DELETE FROM abstracts WHERE id = ?', (abstract_id,))
+
+    def update_from_file(self, json_file: str = ABSTRACTS_FILE, force: bool = False):
+        """Update the index from a JSON file of abstracts if it was modified since the last update."""
+        mtime = str(os.stat(json_file).st_mtime_ns)
+        row = self.connection.execute("SELECT value FROM meta WHERE key = ?", (json_file,)).fetchone()
+        if row and row['value'] == mtime and not force:
+            return
+        with open(json_file, 'r', encoding='utf-8') as f:
+            abstracts = json.load(f)
+        n_indexed, n_removed = self.update(abstracts)
+        with self.connection:
+            self.connection.execute('INSERT OR REPLACE INTO meta VALUES (?, ?)', (json_file, mtime))
+        print(f"Index of {json_file}: {n_indexed} abstracts indexed, {n_removed} removed")
+
+    def search(self, query: str = None, thresholds: Dict[str, float] = None, any_category: bool = False,
+               program_only: bool = True) -> List[Dict[str, Any]]:
+        """
+        Abstracts that match an FTS5 query (e.g. 'glymphatic OR BBB', '"blood brain barrier"',
+        'title:diffusion AND NOT cardiac', 'microstruct*') and have at least the given category scores
+        (all of them, or at least one with any_category), in the order of the abstract file.
+        """
+        conditions = []
+        parameters = []
+        if query:
+            conditions.append('a.id IN (SELECT rowid FROM abstracts_fts WHERE abstracts_fts MATCH ?)')
+            parameters.append(query)
+        if thresholds:
+            score_conditions = []
+            for category, threshold in thresholds.items():
+                score_conditions.append('a.reference IN (SELECT reference FROM category_scores '
+                                        'WHERE category = ? AND score >= ?)')
+                parameters += [category, threshold]
+            conditions.append('(' + (' OR ' if any_category else ' AND ').join(score_conditions) + ')')
+        if program_only:
+            conditions.append('a.program_number IS NOT NULL')
+        sql = 'SELECT a.data FROM abstracts a'
+        if conditions:
+            sql += ' WHERE ' + ' AND '.join(conditions)
+        return [json.loads(row['data']) for row in self.connection.execute(sql + ' ORDER BY a.position', parameters)]
+
+
+def parse_threshold(text: str) -> Tuple[str, float]:
+    category, _, threshold = text.rpartition('=')
+    if not category:
+        raise argparse.ArgumentTypeError(f"Expected CATEGORY=THRESHOLD, got {text}")
+    return category, float(threshold)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Full-text search of the abstracts, exported like category_abstracts.py')
+    parser.add_argument('query', nargs='?', help='FTS5 query over title, keywords, text and subcategories, '
+                                                 'e.g. \'glymphatic OR BBB\' or \'"white matter" AND diffusion\'')
+    parser.add_argument('--min-score', type=parse_threshold, action='append', default=[], metavar='CATEGORY=SCORE',
+                        help='Only abstracts with at least this category score (repeatable)')
+    parser.add_argument('--any-category', action='store_true', help='At least one of the --min-score conditions')
+    parser.add_argument('--all-abstracts', action='store_true', help='Include the abstracts without program number')
+    parser.add_argument('--abstracts', default=ABSTRACTS_FILE)
+    parser.add_argument('--index', default=INDEX_FILE)
+    parser.add_argument('--rebuild', action='store_true', help='Check every abstract, even if the file did not change')
+    parser.add_argument('--export', metavar='LIST_NAME', help='Write LIST_NAME.csv and the PDF files to '
+                                                              'a folder named LIST_NAME, like category_abstracts.py')
+    args = parser.parse_args()
+
+    with FulltextIndex(args.index) as index:
+        index.update_from_file(args.abstracts, args.rebuild)
+        if args.query is None and not args.min_score:
+            parser.exit()
+        thresholds = dict(args.min_score)
+        t0 = time.perf_counter()
+        try:
+            results = index.search(args.query, thresholds, args.any_category, not args.all_abstracts)
+        except sqlite3.OperationalError as e:
+            parser.error(f"Invalid query {args.query!r}: {e}")
+        print(f"{len(results)} abstracts in {(time.perf_counter() - t0) * 1000:.1f} ms")
+
+        if args.export:
+            # the artifact store writes a null category_scores placeholder
+            category_scores = [{category: score_value((a.get('category_scores') or {}).get(category, 0))
+                                for category in thresholds} for a in results]
+            export_list(args.export, os.path.join(ABSTRACTS_BASE_OUTPUT, args.export), results, category_scores)
+        else:
+            for a in results:
+                print(f"{a['program_number'] or '-':>6}  {a['reference']}  {a['title']}")
@@ -0,0 +1,122 @@
+from typing import Any, Callable, Dict, Iterable, List, Tuple, Union
+
+Key = Union[str, Callable[[Any], str]]
+
+
+def field_key(field: str, prefix: str = '') -> Callable[[Any], str]:
+    """
+    Key function reading a field of a record.
+
+    Args:
+        field: Name of the field, e.g. 'reference', 'number', 'Id' or 'program_number'
+        prefix: Prefix added to the value, e.g. '#' for the 'Id' column of the session CSV
+
+    Returns:
+        Function returning the key of a record
+    """
+    def key(record):
+        return prefix + str(record[field])
+    return key
+
+
+class KeyIndex:
+    """
+    Dict-backed index of records by key. If several records have the same key, the first one is kept
+    and the key is listed in duplicates.
+    """
+
+    def __init__(self, records: Iterable[Any], key: Key, name: str = 'records'):
+        self.key = key if callable(key) else field_key(key)
+        self.name = name
+        self.records = {}
+        self.duplicates = []
+        for record in records:
+            record_key = self.key(record)
+            if record_key in self.records:
+                self.duplicates.append(record_key)
+                continue
+            self.records[record_key] = record
+        if self.duplicates:
+            print(f"Warning: {len(self.duplicates)} duplicate keys in {name}: {self.duplicates}")
+
+    def __len__(self):
+        return len(self.records)
+
+    def __contains__(self, key: str):
+        return key in self.records
+
+    def __getitem__(self, key: str):
+        return self.records[key]
+
+    def get(self, key: str, default=None):
+        return self.records.get(key, default)
+
+    def keys(self):
+        return self.records.keys()
+
+
+class JoinResult:
+    """Matched pairs of a join, with the keys that could not be matched on either side."""
+
+    def __init__(self, pairs: List[Tuple[Any, Any]], unmatched_left: List[str], unmatched_right: List[str],
+                 repeated_left: List[str]):
+        self.pairs = pairs
+        self.unmatched_left = unmatched_left
+        self.unmatched_right = unmatched_right
+        self.repeated_left = repeated_left
+
+    def __iter__(self):
+        return iter(self.pairs)
+
+    def __len__(self):
+        return len(self.pairs)
+
+    def report(self, left_name: str = 'left', right_name: str = 'right', unmatched_right: bool = True):
+        """Print the keys that were not matched. Unmatched right keys are only printed if unmatched_right is set."""
+        if self.unmatched_left:
+            print(f"Warning: {len(self.unmatched_left)} keys of {left_name} not found in {right_name}: {self.unmatched_left}")
+        if self.unmatched_right and unmatched_right:
+            print(f"Warning: {len(self.unmatched_right)} keys of {right_name} not found in {left_name}: {self.unmatched_right}")
+        if self.repeated_left:
+            print(f"Warning: {len(self.repeated_left)} keys of {left_name} match the same record more than once: "
+                  f"{self.repeated_left}")
+
+
+def join(left: Iterable[Any], right: KeyIndex, left_key: Key, how: str = 'left',
+         one_to_one: bool = True) -> JoinResult:
+    """
+    Join a sequence of records with an index, keeping the order of the left records.
+
+    Args:
+        left: Records to join
+        right: Index of the records to look up
+        left_key: Field name or key function of the left records
+        how: 'left' keeps the unmatched left records, paired with None; 'inner' drops them
+        one_to_one: Report left keys that match the same right record more than once
+
+    Returns:
+        JoinResult with the (left, right) pairs
+    """
+    if how not in ('left', 'inner'):
+        raise ValueError(f"Unsupported join type: {how}")
+    key = left_key if callable(left_key) else field_key(left_key)
+
+    pairs = []
+    unmatched_left = []
+    matched = set()
+    repeated_left = []
+    for record in left:
+        record_key = key(record)
+        match = right.get(record_key)
+        if match is None:
+            unmatched_left.append(record_key)
+            if how == 'left':
+                pairs.append((record, None))
+            continue
+        if record_key in matched and one_to_one:
+            repeated_left.append(record_key)
+        matched.add(record_key)
+        pairs.append((record, match))
+
+    unmatched_right = [k for k in right.keys() if k not in matched]
+    return JoinResult(pairs, unmatched_left, unmatched_right, repeated_left)
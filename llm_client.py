@@ -0,0 +1,205 @@
+import atexit
+import json
+import os
+import threading
+import time
+from typing import Any, Dict, List
+
+import anthropic
+
+try:
+    import api_token
+except ImportError:
+    # running offline against mock_anthropic_server.py does not need a key
+    api_token = None
+
+# The CLAUDE_BASE_URL environment variable (or api_token.CLAUDE_BASE_URL) redirects all the
+# calls, e.g. to mock_anthropic_server.py for offline tests
+CLAUDE_BASE_URL = os.environ.get('CLAUDE_BASE_URL') or getattr(api_token, 'CLAUDE_BASE_URL', None)
+CLAUDE_API_KEY = getattr(api_token, 'CLAUDE_API_KEY', None)
+
+METRICS_FILE = 'llm_metrics.jsonl'
+
+# USD per million tokens: input, output, cache read, cache write
+MODEL_PRICES = {
+    'claude-3-7-sonnet-20250219': (3.0, 15.0, 0.30, 3.75),
+    'claude-sonnet-4-20250514': (3.0, 15.0, 0.30, 3.75),
+    'claude-opus-4-20250514': (15.0, 75.0, 1.50, 18.75),
+    'claude-3-5-haiku-20241022': (0.80, 4.0, 0.08, 1.0),
+}
+DEFAULT_PRICES = (3.0, 15.0, 0.30, 3.75)
+
+
+def estimate_cost(record: Dict[str, Any]) -> float:
+    """Estimated cost in USD of a single call."""
+    input_price, output_price, cache_read_price, cache_write_price = MODEL_PRICES.get(record['model'], DEFAULT_PRICES)
+    return (record['input_tokens'] * input_price +
+            record['output_tokens'] * output_price +
+            record['cache_read_tokens'] * cache_read_price +
+            record['cache_write_tokens'] * cache_write_price) / 1e6
+
+
+def percentile(values: List[float], q: float) -> float:
+    """Percentile with linear interpolation, q in 0-100."""
+    values = sorted(values)
+    if not values:
+        return 0.0
+    position = (len(values) - 1) * q / 100
+    lower = int(position)
+    upper = min(lower + 1, len(values) - 1)
+    return values[lower] + (values[upper] - values[lower]) * (position - lower)
+
+
+def summarize(records: List[Dict[str, Any]]):
+    """Print latency, token, cost and throughput statistics of a list of call records."""
+    if not records:
+        return
+    succeeded = [r for r in records if r['error'] is None]
+    latencies = [r['latency'] for r in succeeded]
+    input_tokens = sum(r['input_tokens'] for r in succeeded)
+    output_tokens = sum(r['output_tokens'] for r in succeeded)
+    cache_read_tokens = sum(r['cache_read_tokens'] for r in succeeded)
+    cache_write_tokens = sum(r['cache_write_tokens'] for r in succeeded)
+    cost = sum(estimate_cost(r) for r in succeeded)
+    wall_time = max(r['start'] + r['latency'] for r in records) - min(r['start'] for r in records)
+
+    print("\n--- LLM Call Statistics ---")
+    print(f"Calls: {len(records)} ({len(records) - len(succeeded)} failed)")
+    print(f"Retries: {sum(r['retries'] for r in records)}")
+    print(f"Latency p50: {percentile(latencies, 50):.2f} s, p95: {percentile(latencies, 95):.2f} s")
+    print(f"Tokens: {input_tokens} input, {output_tokens} output, "
+          f"{cache_read_tokens} cache read, {cache_write_tokens} cache write")
+    print(f"Estimated cost: ${cost:.2f}")
+    if wall_time > 0:
+        print(f"Throughput: {len(succeeded) / wall_time * 60:.1f} calls/min, "
+              f"{output_tokens / wall_time:.1f} output tokens/s")
+
+
+class CallMetrics:
+    """Thread-safe collection of per-call metrics, appended to a JSONL file as they come in."""
+
+    def __init__(self, metrics_file: str = METRICS_FILE):
+        self.metrics_file = metrics_file
+        self.records = []
+        self.lock = threading.Lock()
+
+    def record(self, record: Dict[str, Any]):
+        with self.lock:
+            if not self.records:
+                # the summary is only printed by scripts that made calls
+                atexit.register(self.print_summary)
+            self.records.append(record)
+            if self.metrics_file:
+                with open(self.metrics_file, 'a', encoding='utf-8') as f:
+                    f.write(json.dumps(record) + '\n')
+
+    def print_summary(self):
+        with self.lock:
+            summarize(self.records)
+
+
+class InstrumentedMessages:
+    """Drop-in replacement of client.messages that records usage, latency and retries of every call."""
+
+    def __init__(self, messages, metrics: CallMetrics, script: str):
+        self.messages = messages
+        self.metrics = metrics
+        self.script = script
+
+    def create(self, **kwargs):
+        start = time.time()
+        t0 = time.perf_counter()
+        record = {
+            'script': self.script,
+            'model': kwargs.get('model'),
+            'start': start,
+            'latency': None,
+            'retries': 0,
+            'input_tokens': 0,
+            'output_tokens': 0,
+            'cache_read_tokens': 0,
+            'cache_write_tokens': 0,
+            'error': None
+        }
+        try:
+            # the raw response exposes the number of retries done by the SDK
+            raw_response = self.messages.with_raw_response.create(**kwargs)
+            response = raw_response.parse()
+        except Exception as e:
+            record['latency'] = time.perf_counter() - t0
+            record['error'] = f'{type(e).__name__}: {e}'
+            self.metrics.record(record)
+            raise
+
+        usage = response.usage
+        record['latency'] = time.perf_counter() - t0
+        record['retries'] = getattr(raw_response, 'retries_taken', 0)
+        record['model'] = response.model
+        record['input_tokens'] = usage.input_tokens
+        record['output_tokens'] = usage.output_tokens
+        record['cache_read_tokens'] = getattr(usage, 'cache_read_input_tokens', None) or 0
+        record['cache_write_tokens'] = getattr(usage, 'cache_creation_input_tokens', None) or 0
+        self.metrics.record(record)
+        return response
+
+
+class InstrumentedClient:
+    """
+    Thin wrapper around anthropic.Anthropic. Only the messages endpoint is instrumented.
+    The Anthropic client is created on first use, so importing a script that creates one does not need an API key.
+    """
+
+    def __init__(self, script: str, metrics_file: str = METRICS_FILE, **client_kwargs):
+        self.script = script
+        self.client_kwargs = client_kwargs
+        self.metrics = shared_metrics(metrics_file)
+        self._client = None
+        self._messages = None
+
+    @property
+    def client(self):
+        if self._client is None:
+            if CLAUDE_API_KEY is None and not CLAUDE_BASE_URL:
+                raise RuntimeError('Place your Claude API key in api_token.py in a variable called CLAUDE_API_KEY')
+            self._client = anthropic.Anthropic(**self.client_kwargs)
+        return self._client
+
+    @property
+    def messages(self):
+        if self._messages is None:
+            self._messages = InstrumentedMessages(self.client.messages, self.metrics, self.script)
+        return self._messages
+
+    def __getattr__(self, name):
+        return getattr(self.client, name)
+
+
+# Call metrics of each metrics file, shared by the clients of the scripts imported by one process
+metrics_by_file = {}
+
+
+def shared_metrics(metrics_file: str = METRICS_FILE) -> CallMetrics:
+    if metrics_file not in metrics_by_file:
+        metrics_by_file[metrics_file] = CallMetrics(metrics_file)
+    return metrics_by_file[metrics_file]
+
+
+def create_client(script: str, metrics_file: str = METRICS_FILE) -> InstrumentedClient:
+    """
+    Create the Claude client used by the scripts. The client connects on its first call.
+
+    Args:
+        script: Name of the calling script, stored with every call record
+        metrics_file: JSONL file where the call records are appended
+
+    Returns:
+        Instrumented client. The statistics of the calls of all the clients of the process that share
+        metrics_file are printed once when the process exits, if any call was made.
+    """
+    return InstrumentedClient(script, metrics_file, api_key=CLAUDE_API_KEY or 'offline', base_url=CLAUDE_BASE_URL)
+
+
+if __name__ == "__main__":
+    # summary of all the calls recorded so far
+    with open(METRICS_FILE, 'r', encoding='utf-8') as f:
+        summarize([json.loads(line) for line in f if line.strip()])
@@ -0,0 +1,144 @@
+import json
+import pickle
+from typing import Any, Dict, List, Tuple
+
+import numpy as np
+from sklearn.feature_extraction.text import TfidfVectorizer
+from sklearn.linear_model import Ridge
+from sklearn.model_selection import train_test_split
+
+TRAINING_FILE = 'categorized_abstracts.json'
+CATEGORIES_FILE = 'categories.txt'
+MODEL_FILE = 'category_model.pkl'
+
+N_MODELS = 10  # bootstrap ensemble size, its spread is the uncertainty estimate
+RIDGE_ALPHA = 1.0
+MAX_FEATURES = 50000
+# Abstracts whose uncertainty (in score points, 0-10 scale) is above this are sent to the LLM
+UNCERTAINTY_THRESHOLD = 1.0
+
+
+def abstract_to_text(abstract: Dict[str, Any]) -> str:
+    """Concatenate the fields that are sent to the LLM in categorize_abstract."""
+    return '\n'.join([
+        abstract.get('title', ''),
+        ', '.join(abstract.get('keywords', [])),
+        abstract.get('text', '')
+    ])
+
+
+class CategoryModel:
+    """
+    TF-IDF features with a bootstrap ensemble of per-category ridge regressions.
+
+    The mean of the ensemble is the predicted category score, the standard deviation
+    across the ensemble is used as uncertainty.
+    """
+
+    def __init__(self, categories: List[str], n_models: int = N_MODELS, alpha: float = RIDGE_ALPHA):
+        self.categories = categories
+        self.n_models = n_models
+        self.alpha = alpha
+        self.vectorizer = TfidfVectorizer(sublinear_tf=True, ngram_range=(1, 2), min_df=2,
+                                          max_features=MAX_FEATURES, stop_words='english')
+        self.coefs = None
+        self.intercepts = None
+
+    def _targets(self, abstracts: List[Dict[str, Any]]) -> np.ndarray:
+        return np.array([[a['category_scores'].get(c, 0) for c in self.categories] for a in abstracts],
+                        dtype=np.float32)
+
+    def fit(self, abstracts: List[Dict[str, Any]], seed: int = 0):
+        """
+        Train the model on abstracts that have been categorized by the LLM.
+
+        Args:
+            abstracts: List of abstracts with a non-empty 'category_scores' field
+            seed: Random seed of the bootstrap resampling
+        """
+        X = self.vectorizer.fit_transform([abstract_to_text(a) for a in abstracts])
+        Y = self._targets(abstracts)
+        rng = np.random.default_rng(seed)
+        coefs = []
+        intercepts = []
+        for _ in range(self.n_models):
+            sample = rng.integers(0, X.shape[0], X.shape[0])
+            # a multi-output Ridge solves one independent ridge regression per category
+            ridge = Ridge(alpha=self.alpha)
+            ridge.fit(X[sample], Y[sample])
+            coefs.append(ridge.coef_.astype(np.float32))
+            intercepts.append(ridge.intercept_.astype(np.float32))
+        self.coefs = np.stack(coefs)  # (n_models, n_categories, n_features)
+        self.intercepts = np.stack(intercepts)  # (n_models, n_categories)
+        return self
+
+    def predict(self, abstracts: List[Dict[str, Any]]) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Predict the category scores of a list of abstracts.
+
+        Returns:
+            Tuple of (scores, uncertainty): scores is an (n_abstracts, n_categories) array in the 0-10
+            range, uncertainty is the largest ensemble standard deviation over the categories of each abstract
+        """
+        X = self.vectorizer.transform([abstract_to_text(a) for a in abstracts])
+        predictions = np.stack([X @ coef.T + intercept for coef, intercept in zip(self.coefs, self.intercepts)])
+        scores = np.clip(predictions.mean(axis=0), 0, 10)
+        uncertainty = predictions.std(axis=0).max(axis=1)
+        return scores, uncertainty
+
+    def category_scores(self, scores_row: np.ndarray) -> Dict[str, int]:
+        """Convert a row of predicted scores to the category_scores format produced by the LLM."""
+        return {category: int(round(score)) for category, score in zip(self.categories, scores_row)}
+
+    def save(self, model_file: str = MODEL_FILE):
+        """
+        Pickle the fitted state as a dict of sklearn and numpy objects, not the CategoryModel instance, so that the
+        file does not depend on the module the model was trained from (e.g. __main__).
+        """
+        state = {'categories': self.categories, 'n_models': self.n_models, 'alpha': self.alpha,
+                 'vectorizer': self.vectorizer, 'coefs': self.coefs, 'intercepts': self.intercepts}
+        with open(model_file, 'wb') as f:
+            pickle.dump(state, f)
+
+    @classmethod
+    def load(cls, model_file: str = MODEL_FILE) -> 'CategoryModel':
+        with open(model_file, 'rb') as f:
+            state = pickle.load(f)
+        model = cls(state['categories'], state['n_models'], state['alpha'])
+        model.vectorizer = state['vectorizer']
+        model.coefs = state['coefs']
+        model.intercepts = state['intercepts']
+        return model
+
+
+def load_training_data(training_file: str = TRAINING_FILE):
+    with open(training_file, 'r') as f:
+        abstracts = json.load(f)
+    return [a for a in abstracts if a.get('category_scores')]
+
+
+def main():
+    with open(CATEGORIES_FILE, 'r') as f:
+        categories = [line.strip() for line in f if line.strip()]
+
+    abstracts = load_training_data()
+    print(f"Training on {len(abstracts)} categorized abstracts and {len(categories)} categories")
+
+    # validate on a held out split to choose the uncertainty threshold
+    train, test = train_test_split(abstracts, test_size=0.2, random_state=0)
+    model = CategoryModel(categories).fit(train)
+    scores, uncertainty = model.predict(test)
+    errors = np.abs(scores - model._targets(test))
+    confident = uncertainty <= UNCERTAINTY_THRESHOLD
+    print(f"Validation mean absolute error: {errors.mean():.2f}")
+    print(f"Abstracts below the uncertainty threshold: {confident.sum()}/{len(test)}")
+    if confident.any():
+        print(f"Mean absolute error of these abstracts: {errors[confident].mean():.2f}")
+
+    model = CategoryModel(categories).fit(abstracts)
+    model.save(MODEL_FILE)
+    print(f"Model saved to {MODEL_FILE}")
+
+
+if __name__ == "__main__":
+    main()
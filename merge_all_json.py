@@ -1,52 +1,50 @@
 import json
 import csv
 from abstract_csv_to_json_print import parse_author_list
-
-def find_abstract_by_reference(abstracts, reference):
-    for abstract in abstracts:
-        if abstract['number'] == reference:
-            return abstract
-    return None
+from abstract_store import load_store
+from join_index import KeyIndex, field_key, join
 
 with open('abstracts_for_print_fixed.json', 'r') as f:
     abstracts_for_print = json.load(f)
 
 with open('categorized_abstracts_clean.json', 'r') as f:
-    categorized_abstracts = json.load(f)
+    categorized_abstracts = KeyIndex(json.load(f), 'number', 'categorized_abstracts_clean.json')
 
-original_exported_abstracts = {}
-with open('Export_ESMRMB_2025_Abstract_20250621_093641_utf8.csv', 'r', encoding='utf-8') as f:
-    reader = csv.DictReader(f, delimiter=';', quotechar='"')
-    for row in reader:
-        original_exported_abstracts['#' + row['Reference']] = row
+original_exported_abstracts = KeyIndex(load_store('Export_ESMRMB_2025_Abstract_20250621_093641_utf8.csv', encoding='utf-8'),
+                                       'reference', 'export')
 
-session_assignments = {}
 with open('assigned_sessions_final_cleaned.csv', 'r', encoding='utf-8') as f:
     reader = csv.DictReader(f, delimiter=';', quotechar='"')
-    for row in reader:
-        session_assignments['#' + row['Id']] = row
-
-for abstract in abstracts_for_print:
-    reference = abstract['reference']
-    abstract_categorized = find_abstract_by_reference(categorized_abstracts, reference)
+    session_assignments = KeyIndex(reader, field_key('Id', '#'), 'assigned_sessions_final_cleaned.csv')
+
+categorized_join = join(abstracts_for_print, categorized_abstracts, 'reference')
+categorized_join.report('abstracts_for_print_fixed.json', 'categorized_abstracts_clean.json')
+exported_join = join(abstracts_for_print, original_exported_abstracts, 'reference')
+exported_join.report('abstracts_for_print_fixed.json', 'export', unmatched_right=False)
+session_join = join(abstracts_for_print, session_assignments, 'reference')
+session_join.report('abstracts_for_print_fixed.json', 'assigned_sessions_final_cleaned.csv')
+
+merged_abstracts = []
+for (abstract, abstract_categorized), (_, exported_row), (_, assignment_row) in zip(categorized_join, exported_join, session_join):
+    if abstract_categorized is None or exported_row is None or assignment_row is None:
+        print(f"Warning: skipping abstract {abstract['reference']}, not found in all the inputs")
+        continue
     abstract['general_audience_pitch'] = abstract_categorized['general_audience_pitch']
     abstract['category_scores'] = abstract_categorized['category_scores']
     abstract['keywords'] = abstract_categorized['keywords']
     abstract['primary_subcategory'] = abstract_categorized['primary_subcategory']
     abstract['secondary_subcategory'] = abstract_categorized['secondary_subcategory']
 
-    exported_row = original_exported_abstracts[reference]
-    abstract['submitter'] = exported_row['Soumissionaire prénom'] + ' ' + exported_row['Soumissionaire nom']
-    abstract['submitter_email'] = exported_row['Soumissionaire Email']
+    abstract['submitter'] = exported_row['submitter_first_name'] + ' ' + exported_row['submitter_last_name']
+    abstract['submitter_email'] = exported_row['submitter_email']
 
-    assignment_row = session_assignments[reference]
     abstract['program_number'] = assignment_row['Program number']
     abstract['presentation_type'] = assignment_row['Presentation type']
     abstract['focus_topic'] = assignment_row['Focus topic']
     abstract['session_number'] = assignment_row['Session number']
     abstract['session_title'] = assignment_row['Session title']
     abstract['order_in_session'] = assignment_row['Order in Session']
-    authors_new = parse_author_list(exported_row['Auteurs'])
+    authors_new = parse_author_list(exported_row['authors'])
     separated_authors = []
     for (author, aff) in authors_new:
         author = author.strip()
@@ -56,8 +54,9 @@ for abstract in abstracts_for_print:
         else:
             separated_authors.append(('', author))
     abstract['authors_separated'] = separated_authors
+    merged_abstracts.append(abstract)
 
 
 
 with open('abstracts_merged.json', 'w', encoding='utf-8') as f:
-    json.dump(abstracts_for_print, f, indent=4, ensure_ascii=False)
+    json.dump(merged_abstracts, f, indent=4, ensure_ascii=False)
@@ -0,0 +1,193 @@
+import argparse
+import hashlib
+import json
+import random
+import re
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+# Offline stand-in for the Anthropic messages endpoint.
+# Start it, then point the scripts to it with the CLAUDE_BASE_URL environment variable
+# (or a CLAUDE_BASE_URL variable in api_token.py), e.g.:
+#   python mock_anthropic_server.py --port 8765 --latency 1.5 --rate-limit 0.05 --malformed 0.02
+#   CLAUDE_BASE_URL=http://127.0.0.1:8765 python process_abstracts.py
+
+CATEGORIES_START = 'Categories to rate'
+CATEGORIES_END = 'Please return your response'
+REFS_START = 'Text to parse:'
+reference_line_re = re.compile(r'^\s*(?:\[\d+\]|\(\d+\)|\d+[.)])\s*(.*)')
+
+
+def stable_seed(text: str) -> int:
+    return int.from_bytes(hashlib.sha256(text.encode('utf-8')).digest()[:8], 'big')
+
+
+def count_tokens(text: str) -> int:
+    """Rough token estimate, good enough for throughput tests."""
+    return max(1, len(text) // 4)
+
+
+def canned_categorization(prompt: str) -> str:
+    """Deterministic scores for the categories listed in a categorize_abstract prompt."""
+    block = prompt[prompt.find(CATEGORIES_START):]
+    block = block[block.find('\n') + 1:block.find(CATEGORIES_END)]
+    categories = [line.strip() for line in block.splitlines() if line.strip()]
+    rng = random.Random(stable_seed(prompt))
+    # mostly irrelevant categories, with a few relevant ones, as the real model does
+    scores = {c: rng.choice([0, 0, 0, 1, 2, 3, 5, 7, 8, 10]) for c in categories}
+    return '```json\n' + json.dumps(scores, indent=2) + '\n```'
+
+
+def canned_refs(prompt: str) -> str:
+    """Split the text of a parse_refs prompt into acknowledgments and references."""
+    text = prompt[prompt.find(REFS_START) + len(REFS_START):].strip()
+    acknowledgments = []
+    availability = []
+    references = []
+    for line in text.splitlines():
+        match = reference_line_re.match(line)
+        if match:
+            references.append(match.group(1).strip())
+        elif 'availab' in line.lower() or 'github' in line.lower():
+            availability.append(line.strip())
+        elif line.strip():
+            acknowledgments.append(line.strip())
+    return json.dumps({
+        'Acknowledgments': ' '.join(acknowledgments) or None,
+        'Data and Code Availability Statement': ' '.join(availability) or None,
+        'References': references or None
+    }, indent=4)
+
+
+def canned_response(prompt: str) -> str:
+    if CATEGORIES_START in prompt:
+        return canned_categorization(prompt)
+    if REFS_START in prompt:
+        return canned_refs(prompt)
+    return 'OK'
+
+
+def prompt_text(request: dict) -> str:
+    """Concatenate the text of all the user messages of a request."""
+    parts = []
+    for message in request.get('messages', []):
+        content = message.get('content', '')
+        if isinstance(content, str):
+            parts.append(content)
+        else:
+            parts.extend(block.get('text', '') for block in content if block.get('type') == 'text')
+    return '\n'.join(parts)
+
+
+class MockConfig:
+    def __init__(self, latency=0.0, latency_jitter=0.0, token_latency=0.0, rate_limit=0.0, malformed=0.0, seed=0):
+        self.latency = latency
+        self.latency_jitter = latency_jitter
+        self.token_latency = token_latency
+        self.rate_limit = rate_limit
+        self.malformed = malformed
+        # fault injection is random, but reproducible for a given seed and request order
+        self.rng = random.Random(seed)
+        self.lock = threading.Lock()
+        self.counters = {'requests': 0, 'rate_limited': 0, 'malformed': 0}
+
+    def draw(self):
+        with self.lock:
+            self.counters['requests'] += 1
+            return self.rng.random(), self.rng.random(), self.rng.uniform(-1, 1)
+
+    def count(self, counter):
+        with self.lock:
+            self.counters[counter] += 1
+
+
+class MessagesHandler(BaseHTTPRequestHandler):
+    config: MockConfig = None
+
+    def log_message(self, format, *args):
+        pass
+
+    def send_json(self, status, body, headers=None):
+        data = json.dumps(body).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        self.send_header('Content-Length', str(len(data)))
+        self.send_header('request-id', 'req_mock_' + hashlib.md5(data).hexdigest()[:16])
+        for key, value in (headers or {}).items():
+            self.send_header(key, value)
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_POST(self):
+        if self.path.split('?')[0].rstrip('/') != '/v1/messages':
+            self.send_json(404, {'type': 'error', 'error': {'type': 'not_found_error', 'message': self.path}})
+            return
+
+        request = json.loads(self.rfile.read(int(self.headers.get('Content-Length', 0))))
+        rate_limit_draw, malformed_draw, jitter_draw = self.config.draw()
+
+        if rate_limit_draw < self.config.rate_limit:
+            self.config.count('rate_limited')
+            self.send_json(429, {'type': 'error', 'error': {'type': 'rate_limit_error',
+                                                             'message': 'Mock rate limit'}},
+                           headers={'retry-after': '1'})
+            return
+
+        prompt = prompt_text(request)
+        system = request.get('system', '')
+        if not isinstance(system, str):
+            system = ' '.join(block.get('text', '') for block in system)
+        text = canned_response(prompt)
+        if malformed_draw < self.config.malformed:
+            self.config.count('malformed')
+            text = text[:len(text) // 2]
+
+        output_tokens = count_tokens(text)
+        delay = self.config.latency + self.config.latency_jitter * jitter_draw + \
+            self.config.token_latency * output_tokens
+        time.sleep(max(0.0, delay))
+
+        self.send_json(200, {
+            'id': 'msg_mock_' + hashlib.sha256(prompt.encode('utf-8')).hexdigest()[:24],
+            'type': 'message',
+            'role': 'assistant',
+            'model': request.get('model', 'mock'),
+            'content': [{'type': 'text', 'text': text}],
+            'stop_reason': 'end_turn',
+            'stop_sequence': None,
+            'usage': {
+                'input_tokens': count_tokens(system + prompt),
+                'output_tokens': output_tokens,
+                'cache_creation_input_tokens': 0,
+                'cache_read_input_tokens': 0
+            }
+        })
+
+
+def main():
+    parser = argparse.ArgumentParser(description='Offline stand-in for the Anthropic messages endpoint')
+    parser.add_argument('--host', default='127.0.0.1')
+    parser.add_argument('--port', type=int, default=8765)
+    parser.add_argument('--latency', type=float, default=0.0, help='Base latency of every response in seconds')
+    parser.add_argument('--latency-jitter', type=float, default=0.0, help='Uniform jitter (+/-) added to the latency in seconds')
+    parser.add_argument('--token-latency', type=float, default=0.0, help='Additional latency per output token in seconds')
+    parser.add_argument('--rate-limit', type=float, default=0.0, help='Fraction of requests answered with a 429')
+    parser.add_argument('--malformed', type=float, default=0.0, help='Fraction of responses with truncated JSON')
+    parser.add_argument('--seed', type=int, default=0, help='Seed of the fault injection')
+    args = parser.parse_args()
+
+    MessagesHandler.config = MockConfig(args.latency, args.latency_jitter, args.token_latency,
+                                        args.rate_limit, args.malformed, args.seed)
+    server = ThreadingHTTPServer((args.host, args.port), MessagesHandler)
+    print(f"Mock Anthropic API listening on http://{args.host}:{args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
+    server.server_close()
+    print("Requests served:", MessagesHandler.config.counters)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,18 @@
+import argparse
 import json
+import mmap
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from typing import Any, Dict, Iterator
 from unidecode import unidecode
 import re
 
-abstracts = []
+ABSTRACTS_MD = 'abstracts.md'
+ABSTRACTS_JSON = 'abstracts.json'
+ABSTRACTS_JSONL = 'abstracts.jsonl'
 
 STATUS_NEWABSTRACT = 1
 STATUS_TITLE = 2
@@ -11,23 +21,44 @@ STATUS_PRE_AUTHORS = 4
 STATUS_AUTHORS = 5
 STATUS_POST_AUTHORS = 6
 STATUS_TEXT = 7
-current_abstract = None
-status = None
 
 parentheses_re = re.compile(r'\([^)]*\)')
 
 def remove_parentheses(line):
     return re.sub(parentheses_re, '', line)
 
-with (open('abstracts.md', 'r') as f):
-    for line in f:
+
+def iter_lines(path: str) -> Iterator[str]:
+    """Read a text file line by line through a memory map, without loading it in memory."""
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mm:
+            for line in iter(mm.readline, b''):
+                yield line.decode('utf-8')
+
+
+def iter_abstracts(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Parse the markitdown version of the abstract book.
+
+    Args:
+        path: Markdown file produced by markitdown
+
+    Yields:
+        Each abstract as soon as its record is closed
+    """
+    current_abstract = None
+    status = None
+    authors_line = ''
+
+    for line in iter_lines(path):
         line = line.strip()
         if line.startswith('FOCUS TOPIC: ') or line == 'OTHER':
             status = STATUS_NEWABSTRACT
             # close the previous abstract
             if current_abstract:
-                abstracts.append(current_abstract)
-                print(current_abstract)
+                yield current_abstract
             # create a new abstract
             current_abstract = {}
             if line == 'OTHER':
@@ -40,7 +71,7 @@ with (open('abstracts.md', 'r') as f):
         if status == STATUS_TEXT:
             if line.startswith('Data and Code Availability'):
                 # close the abstract
-                abstracts.append(current_abstract)
+                yield current_abstract
                 current_abstract = None
                 status = None
                 continue
@@ -99,5 +130,96 @@ with (open('abstracts.md', 'r') as f):
                 current_abstract['text'] = unidecode(line.strip() + '\n')
                 status = STATUS_TEXT
 
-with (open('abstracts.json', 'w') as f):
-    json.dump(abstracts, f, indent=4)
\ No newline at end of file
+
+def write_abstracts(abstracts: Iterator[Dict[str, Any]], json_file: str, jsonl_file: str = None,
+                    verbose: bool = True) -> int:
+    """
+    Write the abstracts as they come: as a JSON list to the JSON file and, optionally, one per line to the JSONL file.
+
+    Returns:
+        Number of abstracts written
+    """
+    n_abstracts = 0
+    with open(json_file, 'w') as json_list, open(jsonl_file or os.devnull, 'w') as jsonl:
+        json_list.write('[')
+        for abstract in abstracts:
+            if jsonl_file:
+                jsonl.write(json.dumps(abstract) + '\n')
+            json_list.write(',\n' if n_abstracts else '\n')
+            json_list.write(json.dumps(abstract, indent=4))
+            n_abstracts += 1
+            if verbose:
+                print(f"{abstract.get('number', '')} {abstract.get('title', '')}")
+        json_list.write('\n]')
+    return n_abstracts
+
+
+def write_synthetic_book(path: str, n_abstracts: int, seed: int = 0):
+    """Write a markdown abstract book with the structure produced by markitdown."""
+    rng = random.Random(seed)
+    words = ['magnetic', 'resonance', 'diffusion', 'brain', 'cardiac', 'quantitative', 'sequence',
+             'reconstruction', 'validation', 'phantom', 'patients', 'signal', 'contrast', 'tissue']
+
+    def text(n_words):
+        return ' '.join(rng.choice(words) for _ in range(n_words))
+
+    with open(path, 'w') as f:
+        for i in range(n_abstracts):
+            f.write(rng.choice(['FOCUS TOPIC: Translation', 'FOCUS TOPIC: Emerging technologies', 'OTHER']) + '\n\n')
+            f.write(f'#{10000 + i} : {text(10)}\n{text(5)}\n\n')
+            f.write('Authors:\n' + ', '.join(f'{text(2)} (1)' for _ in range(6)) + '\n\n')
+            f.write(f'Keywords: {text(2)}; {text(2)}; {text(2)}\n')
+            f.write(f'Primary Sub-Category: {text(2)}\nSecondary Sub-Category: {text(2)}\n')
+            f.write('>> http://esmrmb2025.org/general-audience-pitches/: No\n')
+            f.write('Introduction\n')
+            for _ in range(20):
+                f.write(text(25) + '\n')
+            f.write('Data and Code Availability\n' + text(30) + '\n\n')
+
+
+def measure(func):
+    """Wall time of a run without tracing, and peak traced memory of a second run."""
+    t0 = time.perf_counter()
+    func()
+    elapsed = time.perf_counter() - t0
+    tracemalloc.start()
+    func()
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed, peak
+
+
+def benchmark(n_abstracts: int):
+    """Compare the streaming writer with building the full list before dumping it, as the original script did."""
+    with tempfile.TemporaryDirectory() as tmpdir:
+        book = os.path.join(tmpdir, 'abstracts.md')
+        write_synthetic_book(book, n_abstracts)
+        size_mb = os.path.getsize(book) / 1e6
+        print(f"Synthetic book: {n_abstracts} abstracts, {size_mb:.1f} MB")
+
+        def full_list():
+            abstracts = list(iter_abstracts(book))
+            with open(os.path.join(tmpdir, 'list.json'), 'w') as f:
+                json.dump(abstracts, f, indent=4)
+
+        def streaming():
+            write_abstracts(iter_abstracts(book), os.path.join(tmpdir, 'stream.json'),
+                            os.path.join(tmpdir, 'stream.jsonl'), verbose=False)
+
+        for name, func in [('Full list, dump at the end', full_list), ('Streaming JSON and JSONL', streaming)]:
+            elapsed, peak = measure(func)
+            print(f"{name}: {elapsed:.2f} s ({size_mb / elapsed:.1f} MB/s), peak memory {peak / 1e6:.1f} MB")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert the markitdown abstract book to JSON')
+    parser.add_argument('input', nargs='?', default=ABSTRACTS_MD)
+    parser.add_argument('--benchmark', type=int, metavar='N_ABSTRACTS',
+                        help='Benchmark the parser on a synthetic book instead')
+    args = parser.parse_args()
+
+    if args.benchmark:
+        benchmark(args.benchmark)
+    else:
+        n = write_abstracts(iter_abstracts(args.input), ABSTRACTS_JSON, ABSTRACTS_JSONL)
+        print(f"Parsed {n} abstracts")
@@ -1,8 +1,9 @@
-import csv
 import json
 import re
 from unidecode import unidecode
 
+from abstract_store import load_store
+
 ABSTRACT_EXPORT = 'Export_ESMRMB_2025_Abstract_20250520_141544.csv'
 
 FT_MAP = {
@@ -22,32 +23,30 @@ def remove_parentheses(line):
 
 
 
-with open(ABSTRACT_EXPORT, 'r', encoding='ISO-8859-15') as f:
-    reader = csv.DictReader(f, delimiter=';', quotechar='"')
-    abstracts = []
-    for row in reader:
-        if row['Statut'] != 'Reviewing Pending':
-            continue
-        abstract = {}
-        abstract['focus_topic'] = FT_MAP[row['Theme']]
-        abstract['number'] = '#' + row['Reference']
-        abstract['title'] = unidecode(row['Titre'])
-        abstract['general_audience_pitch'] = row['?\xa0COMPETITION: I would like to participate in the General Audience Pitches Competition and, if accepted, I will submit a short video >> https://esmrmb2025.org/general-audience-pitches/'][0] == 'Y'
-        authors_line = remove_parentheses(row['Auteurs'])
-        authors_list = [unidecode(a.strip()) for a in authors_line.split(',')]
-        abstract['authors'] = authors_list
-        keywords_line = row['Mots-clefs']
-        keywords_line = keywords_line.replace(';', ',')
-        keywords = [unidecode(k.strip()) for k in keywords_line.split(',')]
-        abstract['keywords'] = keywords
-        abstract['primary_subcategory'] = unidecode(row['Primary Sub-Category'])
-        abstract['secondary_subcategory'] = unidecode(row['Secondary Sub-Category'])
-        abstract['text'] = 'Introduction\n' + unidecode(row['Résumé']) + \
-                            '\n\nMethods\n' + unidecode(row['Methods']) + \
-                            '\n\nResults\n' + unidecode(row['Results']) + \
-                            '\n\nDiscussion\n' + unidecode(row['Discussion']) + \
-                            '\n\nConclusion\n' + unidecode(row['Conclusion'])
-        abstracts.append(abstract)
+abstracts = []
+for row in load_store(ABSTRACT_EXPORT):
+    if row['status'] != 'Reviewing Pending':
+        continue
+    abstract = {}
+    abstract['focus_topic'] = FT_MAP[row['theme']]
+    abstract['number'] = row['reference']
+    abstract['title'] = unidecode(row['title'])
+    abstract['general_audience_pitch'] = row['general_audience_pitch']
+    authors_line = remove_parentheses(row['authors'])
+    authors_list = [unidecode(a.strip()) for a in authors_line.split(',')]
+    abstract['authors'] = authors_list
+    keywords_line = row['keywords']
+    keywords_line = keywords_line.replace(';', ',')
+    keywords = [unidecode(k.strip()) for k in keywords_line.split(',')]
+    abstract['keywords'] = keywords
+    abstract['primary_subcategory'] = unidecode(row['primary_subcategory'])
+    abstract['secondary_subcategory'] = unidecode(row['secondary_subcategory'])
+    abstract['text'] = 'Introduction\n' + unidecode(row['introduction']) + \
+                        '\n\nMethods\n' + unidecode(row['methods']) + \
+                        '\n\nResults\n' + unidecode(row['results']) + \
+                        '\n\nDiscussion\n' + unidecode(row['discussion']) + \
+                        '\n\nConclusion\n' + unidecode(row['conclusion'])
+    abstracts.append(abstract)
 
 print('Number of abstracts:', len(abstracts))
 
@@ -0,0 +1,354 @@
+import argparse
+import ast
+import hashlib
+import json
+import os
+import re
+import subprocess
+import sys
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, ThreadPoolExecutor, wait
+from typing import Dict, List
+
+STATE_FILE = '.pipeline_state.json'
+LOG_FOLDER = 'pipeline_logs'
+JOBS = 4
+
+ABSTRACT_EXPORT = 'Export_ESMRMB_2025_Abstract_20250520_141544.csv'
+SCORES_EXPORT = 'Export_ESMRMB_2025_Abstract_20250619_095047_review.csv'
+MERGE_EXPORT = 'Export_ESMRMB_2025_Abstract_20250621_093641_utf8.csv'
+SESSIONS_CSV = 'assigned_sessions_final_cleaned.csv'
+
+# import statements, for the files that this Python version cannot parse
+import_re = re.compile(r'^\s*(?:from\s+(\w+)|import\s+([\w., ]+))', re.MULTILINE)
+
+
+class Stage:
+    """
+    A script of the pipeline with the files it reads and writes.
+
+    Optional inputs (e.g. a model that is only used if it exists) are hashed when they exist,
+    but do not prevent the stage from running. The modules of the repository imported by the script
+    are found by local_modules and hashed with it.
+    """
+
+    def __init__(self, name: str, script: str, inputs: List[str], outputs: List[str],
+                 optional_inputs: List[str] = None, args: List[str] = None):
+        self.name = name
+        self.script = script
+        self.inputs = inputs
+        self.outputs = outputs
+        self.optional_inputs = optional_inputs or []
+        self.args = args or []
+
+    def command(self):
+        return [sys.executable, self.script] + self.args
+
+
+# Files written by score_matrix.py for categorized_abstracts.json
+SCORE_MATRIX = ['categorized_abstracts.scores.npy', 'categorized_abstracts.scores.references.txt',
+                'categorized_abstracts.scores.categories.txt']
+
+# Files that are edited by hand between stages (abstracts_for_print_fixed.json, categorized_abstracts_clean.json,
+# the session CSV) and the exports of the conference system are source files: they are only hashed.
+# parse_abstracts.py (from the markitdown book) is an alternative to parse_abstracts_csv.py; both write abstracts.json.
+STAGES = [
+    Stage('extract_categories', 'extract_categories.py', ['reviewers.csv'], ['categories.txt']),
+    Stage('reviewers2json', 'reviewers2json.py', ['reviewers.csv'], ['reviewers.json']),
+    Stage('parse_abstracts_csv', 'parse_abstracts_csv.py', [ABSTRACT_EXPORT], ['abstracts.json']),
+    Stage('process_abstracts', 'process_abstracts.py', ['categories.txt', 'abstracts.json'],
+          ['categorized_abstracts.json'], optional_inputs=['category_model.pkl']),
+    Stage('score_matrix', 'score_matrix.py', ['categorized_abstracts.json'], SCORE_MATRIX,
+          args=['categorized_abstracts.json']),
+    # the score matrix is read, not exported, by these stages (load_scores with export=False)
+    Stage('reviewer_assignment_optimizer', 'reviewer_assignment_optimizer.py',
+          ['categorized_abstracts.json', *SCORE_MATRIX, 'reviewers.json'],
+          ['reviewer_assignments.json', 'reviewer_assignments_statistics.json']),
+    Stage('abstract_clustering', 'abstract_clustering.py',
+          ['categorized_abstracts.json', *SCORE_MATRIX],
+          ['clusters.csv', 'cluster_assignments.csv']),
+    Stage('abstract_csv_to_json_print', 'abstract_csv_to_json_print.py', [ABSTRACT_EXPORT],
+          ['abstracts_for_print.json']),
+    Stage('extract_scores', 'extract_scores.py', [SCORES_EXPORT, 'categorized_abstracts_clean.json'],
+          ['abstract_scores_output.csv']),
+    Stage('merge_all_json', 'merge_all_json.py',
+          ['abstracts_for_print_fixed.json', 'categorized_abstracts_clean.json', MERGE_EXPORT, SESSIONS_CSV],
+          ['abstracts_merged.json']),
+    Stage('author_index', 'author_index.py', ['abstracts_merged.json'], ['authors_index.docx']),
+    Stage('gap_list', 'gap_list.py', ['abstracts_merged.json'], ['gap_list.csv']),
+]
+
+
+def imported_names(path: str) -> List[str]:
+    """Top-level names of all the modules imported by a Python file (import a, b / from a import b), anywhere in it."""
+    with open(path, 'r', encoding='utf-8') as f:
+        source = f.read()
+    try:
+        tree = ast.parse(source, path)
+    except SyntaxError:
+        # syntax of a newer Python version than this one: scan the import lines
+        names = []
+        for module, modules in import_re.findall(source):
+            names += [module] if module else [name.split()[0].split('.')[0] for name in modules.split(',')]
+        return names
+    names = []
+    for node in ast.walk(tree):
+        if isinstance(node, ast.Import):
+            names += [alias.name.split('.')[0] for alias in node.names]
+        elif isinstance(node, ast.ImportFrom) and node.module and not node.level:
+            names.append(node.module.split('.')[0])
+    return names
+
+
+def local_modules(script: str) -> List[str]:
+    """
+    Files of the modules of the repository imported by a script, directly or through other modules,
+    including the imports inside functions.
+    """
+    folder = os.path.dirname(script)
+    modules = []
+    pending = [script]
+    while pending:
+        for name in imported_names(pending.pop()):
+            path = os.path.join(folder, name + '.py')
+            if path != script and path not in modules and os.path.exists(path):
+                modules.append(path)
+                pending.append(path)
+    return sorted(modules)
+
+
+def file_hash(path: str) -> str:
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()
+
+
+class HashCache:
+    """
+    Content hashes of files. A hash is only recomputed if the size or the modification time of the file changed,
+    so large exports are not read again at every run.
+    """
+
+    def __init__(self, entries: Dict[str, Dict] = None):
+        self.entries = entries or {}
+        self.lock = threading.Lock()
+
+    def get(self, path: str):
+        """Hash of a file, or None if it does not exist."""
+        try:
+            stat = os.stat(path)
+        except FileNotFoundError:
+            return None
+        with self.lock:
+            entry = self.entries.get(path)
+            if entry and entry['size'] == stat.st_size and entry['mtime'] == stat.st_mtime_ns:
+                return entry['hash']
+        digest = file_hash(path)
+        with self.lock:
+            self.entries[path] = {'size': stat.st_size, 'mtime': stat.st_mtime_ns, 'hash': digest}
+        return digest
+
+
+class Pipeline:
+    """Run the stages whose script, inputs or outputs changed since their last successful run."""
+
+    def __init__(self, stages: List[Stage], state_file: str = STATE_FILE, log_folder: str = LOG_FOLDER):
+        self.stages = {stage.name: stage for stage in stages}
+        self.state_file = state_file
+        self.log_folder = log_folder
+        self.producers = {}
+        for stage in stages:
+            for output in stage.outputs:
+                if output in self.producers:
+                    raise ValueError(f"{output} is written by both {self.producers[output]} and {stage.name}")
+                self.producers[output] = stage.name
+        self.upstream = {stage.name: {self.producers[f] for f in stage.inputs + stage.optional_inputs
+                                      if f in self.producers} for stage in stages}
+        self.modules = {}
+
+        state = {}
+        if os.path.exists(state_file):
+            with open(state_file, 'r', encoding='utf-8') as f:
+                state = json.load(f)
+        self.records = state.get('stages', {})
+        self.hashes = HashCache(state.get('files', {}))
+        self.state_lock = threading.Lock()
+
+    def save_state(self):
+        with self.state_lock:
+            tmp_file = self.state_file + '.tmp'
+            with open(tmp_file, 'w', encoding='utf-8') as f:
+                json.dump({'stages': self.records, 'files': self.hashes.entries}, f, indent=2)
+            os.replace(tmp_file, self.state_file)
+
+    def select(self, targets: List[str] = None) -> List[str]:
+        """Names of the target stages and of all their upstream stages, in declaration order."""
+        if not targets:
+            return list(self.stages)
+        selected = set()
+        pending = list(targets)
+        while pending:
+            name = pending.pop()
+            if name not in self.stages:
+                raise ValueError(f"Unknown stage: {name}")
+            if name not in selected:
+                selected.add(name)
+                pending.extend(self.upstream[name])
+        return [name for name in self.stages if name in selected]
+
+    def stage_modules(self, stage: Stage) -> List[str]:
+        if stage.name not in self.modules:
+            self.modules[stage.name] = local_modules(stage.script) if os.path.exists(stage.script) else []
+        return self.modules[stage.name]
+
+    def fingerprint(self, stage: Stage) -> Dict[str, str]:
+        files = [stage.script] + self.stage_modules(stage) + stage.inputs + stage.optional_inputs
+        return {path: self.hashes.get(path) for path in files}
+
+    def rebuild_reason(self, stage: Stage):
+        """Why the stage must run, or None if it is up to date."""
+        record = self.records.get(stage.name)
+        if record is None:
+            return 'never run'
+        if record['args'] != stage.args:
+            return 'arguments changed'
+        for path, digest in self.fingerprint(stage).items():
+            if record['inputs'].get(path) != digest:
+                return f'{path} changed'
+        for path in stage.outputs:
+            digest = self.hashes.get(path)
+            if digest is None:
+                return f'{path} missing'
+            if record['outputs'].get(path) != digest:
+                return f'{path} modified'
+        return None
+
+    def missing_inputs(self, stage: Stage, selected: List[str]) -> List[str]:
+        """Required inputs that do not exist and are not produced by a selected stage."""
+        return [path for path in stage.inputs
+                if not os.path.exists(path) and self.producers.get(path) not in selected]
+
+    def plan(self, targets: List[str] = None, force: bool = False):
+        """
+        Stages that would run, assuming every rebuilt stage changes its outputs.
+
+        Returns:
+            List of (stage name, reason) pairs, reason is None for up to date stages
+        """
+        selected = self.select(targets)
+        rebuilt = set()
+        plan = []
+        for name in selected:
+            stage = self.stages[name]
+            reason = 'forced' if force else None
+            if reason is None:
+                changed_upstream = [u for u in self.upstream[name] if u in rebuilt]
+                if changed_upstream:
+                    reason = f'upstream {", ".join(sorted(changed_upstream))} rebuilds'
+            if reason is None:
+                missing = self.missing_inputs(stage, selected)
+                reason = f'missing inputs {missing}' if missing else self.rebuild_reason(stage)
+            if reason is not None:
+                rebuilt.add(name)
+            plan.append((name, reason))
+        return plan
+
+    def run_stage(self, stage: Stage):
+        """Run the script of a stage, with its output in the log folder. Returns True on success."""
+        os.makedirs(self.log_folder, exist_ok=True)
+        log_file = os.path.join(self.log_folder, stage.name + '.log')
+        fingerprint = self.fingerprint(stage)
+        t0 = time.perf_counter()
+        with open(log_file, 'w', encoding='utf-8') as log:
+            result = subprocess.run(stage.command(), stdout=log, stderr=subprocess.STDOUT)
+        elapsed = time.perf_counter() - t0
+        if result.returncode != 0:
+            print(f"[{stage.name}] failed with exit code {result.returncode} after {elapsed:.1f} s, see {log_file}")
+            return False
+        missing = [path for path in stage.outputs if not os.path.exists(path)]
+        if missing:
+            print(f"[{stage.name}] did not write {missing}, see {log_file}")
+            return False
+        with self.state_lock:
+            self.records[stage.name] = {
+                'args': stage.args,
+                'inputs': fingerprint,
+                'outputs': {path: self.hashes.get(path) for path in stage.outputs},
+                'finished': time.strftime('%Y-%m-%d %H:%M:%S'),
+            }
+        self.save_state()
+        print(f"[{stage.name}] done in {elapsed:.1f} s")
+        return True
+
+    def run(self, targets: List[str] = None, force: bool = False, jobs: int = JOBS):
+        """
+        Run the selected stages, as soon as their upstream stages are done, at most jobs at a time.
+        Whether a stage is up to date is decided when it is ready, so a rebuilt stage that writes
+        identical outputs does not trigger its downstream stages.
+
+        Returns:
+            True if no stage failed
+        """
+        selected = self.select(targets)
+        pending = {name: {u for u in self.upstream[name] if u in selected} for name in selected}
+        failed = set()
+        running = {}
+        with ThreadPoolExecutor(max_workers=jobs) as executor:
+            while pending or running:
+                unfinished = set(pending) | set(running.values())
+                ready = [name for name, deps in pending.items() if not deps & unfinished]
+                if not ready and not running:
+                    raise ValueError(f"Circular dependencies between {sorted(pending)}")
+                for name in ready:
+                    deps = pending.pop(name)
+                    stage = self.stages[name]
+                    if deps & failed:
+                        print(f"[{name}] skipped, upstream failed")
+                        failed.add(name)
+                        continue
+                    missing = self.missing_inputs(stage, [])
+                    if missing:
+                        print(f"[{name}] missing inputs {missing}")
+                        failed.add(name)
+                        continue
+                    reason = 'forced' if force else self.rebuild_reason(stage)
+                    if reason is None:
+                        print(f"[{name}] up to date")
+                        continue
+                    print(f"[{name}] running ({reason})")
+                    running[executor.submit(self.run_stage, stage)] = name
+                if not running:
+                    continue
+                finished, _ = wait(running, return_when=FIRST_COMPLETED)
+                for future in finished:
+                    name = running.pop(future)
+                    if not future.result():
+                        failed.add(name)
+        if failed:
+            print(f"Failed stages: {sorted(failed)}")
+        return not failed
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Run the stages of the pipeline whose inputs changed')
+    parser.add_argument('stages', nargs='*', help='Stages to run, with their upstream stages (default: all)')
+    parser.add_argument('--dry-run', action='store_true', help='Only show which stages would run')
+    parser.add_argument('--force', action='store_true', help='Run the selected stages even if they are up to date')
+    parser.add_argument('--jobs', type=int, default=JOBS, help='Number of stages run in parallel')
+    parser.add_argument('--list', action='store_true', help='List the stages with their inputs and outputs')
+    args = parser.parse_args()
+
+    pipeline = Pipeline(STAGES)
+    if args.list:
+        for stage in STAGES:
+            print(f"{stage.name}: {', '.join(stage.inputs + stage.optional_inputs)} -> {', '.join(stage.outputs)}"
+                  f" (modules: {', '.join(pipeline.stage_modules(stage)) or '-'})")
+    elif args.dry_run:
+        for name, reason in pipeline.plan(args.stages, args.force):
+            print(f"{name}: {'runs, ' + reason if reason else 'up to date'}")
+        pipeline.save_state()
+    else:
+        sys.exit(0 if pipeline.run(args.stages, args.force, args.jobs) else 1)
@@ -1,12 +1,20 @@
 import json
 from typing import Dict, List, Any
-import anthropic
 import time
+import os
 
-from api_token import CLAUDE_API_KEY
+from category_validation import CategoryValidator
+from llm_client import create_client
 
 # Initialize the Anthropic client
-client = anthropic.Anthropic(api_key=CLAUDE_API_KEY)
+client = create_client('process_abstracts')
+
+# The follow-up request only contains the missing categories, its answer is about this many tokens per category
+COMPLETION_TOKENS_PER_CATEGORY = 30
+COMPLETION_MIN_TOKENS = 100
+
+# Category validators, one per list of categories
+validators = {}
 
 
 def load_data(categories_file: str, abstracts_file: str):
@@ -22,8 +30,9 @@ def load_data(categories_file: str, abstracts_file: str):
     return categories, abstracts
 
 
-def categorize_abstract(abstract: Dict[str, Any], categories: List[str]) -> Dict[str, int]:
-    """Use Claude API to categorize an abstract."""
+def request_category_scores(abstract: Dict[str, Any], categories: List[str], max_tokens: int = 4000,
+                            raise_errors: bool = False) -> Dict[str, Any]:
+    """Ask Claude to rate an abstract for the given categories and return the raw JSON object."""
 
     # Prepare the prompt for Claude
     prompt = f"""
@@ -47,7 +56,7 @@ def categorize_abstract(abstract: Dict[str, Any], categories: List[str]) -> Dict
     # Call the Claude API
     response = client.messages.create(
         model="claude-3-7-sonnet-20250219",
-        max_tokens=4000,
+        max_tokens=max_tokens,
         temperature=0,
         system="You are a scientific categorization assistant. You analyze academic abstracts and rate how well they fit into given categories. Return ONLY a JSON object with categories as keys and scores (0-10) as values.",
         messages=[
@@ -71,13 +80,83 @@ def categorize_abstract(abstract: Dict[str, Any], categories: List[str]) -> Dict
         return json.loads(json_str)
     except json.JSONDecodeError:
         print(f"Failed to parse JSON response: {response_text}")
+        if raise_errors:
+            raise
+        return {}
+
+
+def get_validator(categories: List[str]) -> CategoryValidator:
+    key = tuple(categories)
+    if key not in validators:
+        validators[key] = CategoryValidator(categories)
+    return validators[key]
+
+
+def categorize_abstract(abstract: Dict[str, Any], categories: List[str], raise_errors: bool = False) -> Dict[str, int]:
+    """
+    Use Claude API to categorize an abstract. If raise_errors is set, JSON errors and responses without any known
+    category raise an exception instead of returning {}, so that a retry queue keeps the abstract.
+
+    The keys of the response are mapped to the exact names in categories, and the scores are clamped to 0-10.
+    Categories missing from the response are requested again in a short follow-up prompt.
+    """
+    validator = get_validator(categories)
+    scores, missing, unknown = validator.validate(request_category_scores(abstract, categories, raise_errors=raise_errors))
+    if unknown:
+        print(f"Warning: unrecognized categories in the response: {unknown}")
+    if not scores:
+        if raise_errors:
+            raise ValueError(f"No known category in the response (unrecognized: {unknown})")
         return {}
 
+    if missing:
+        print(f"Requesting {len(missing)} missing categories: {missing}")
+        max_tokens = min(4000, COMPLETION_MIN_TOKENS + COMPLETION_TOKENS_PER_CATEGORY * len(missing))
+        try:
+            completion, _, _ = validator.validate(request_category_scores(abstract, missing, max_tokens=max_tokens))
+        except Exception as e:
+            # the scores of the first response are still usable
+            print(f"Warning: follow-up request failed: {e}")
+            completion = {}
+        scores.update({c: s for c, s in completion.items() if c not in scores})
+        missing = [c for c in categories if c not in scores]
+        if missing:
+            print(f"Warning: categories still missing after the follow-up request, set to 0: {missing}")
 
-def process_abstracts(categories_file: str, abstracts_file: str, output_file: str = "categorized_abstracts.json"):
-    """Process all abstracts and save results."""
+    return validator.complete(scores)
+
+
+def predict_local_scores(model_file: str, categories: List[str], abstracts: List[Dict[str, Any]]):
+    """
+    Score the abstracts with the local model trained by local_category_model.py.
+    Returns a list with the category scores of each abstract, or None where the model is too uncertain.
+    """
+    # imported here, scikit-learn is only needed when a trained model is used
+    from local_category_model import CategoryModel, UNCERTAINTY_THRESHOLD
+
+    model = CategoryModel.load(model_file)
+    if model.categories != categories:
+        print(f"Warning: {model_file} was trained on different categories, not using it")
+        return [None] * len(abstracts)
+
+    scores, uncertainty = model.predict(abstracts)
+    local_scores = [model.category_scores(scores[i]) if uncertainty[i] <= UNCERTAINTY_THRESHOLD else None
+                    for i in range(len(abstracts))]
+    n_local = sum(1 for s in local_scores if s is not None)
+    print(f"Local model scored {n_local}/{len(abstracts)} abstracts, the rest will be sent to Claude")
+    return local_scores
+
+
+def process_abstracts(categories_file: str, abstracts_file: str, output_file: str = "categorized_abstracts.json",
+                      model_file: str = None):
+    """Process all abstracts and save results. If a local model file is given, the LLM is only used for uncertain abstracts."""
     categories, abstracts = load_data(categories_file, abstracts_file)
 
+    if model_file and os.path.exists(model_file):
+        local_scores = predict_local_scores(model_file, categories, abstracts)
+    else:
+        local_scores = [None] * len(abstracts)
+
     results = []
 
     last_time = 0
@@ -85,12 +164,15 @@ def process_abstracts(categories_file: str, abstracts_file: str, output_file: st
 
     for i, abstract in enumerate(abstracts):
         print(f"Processing abstract {i + 1}/{len(abstracts)}: {abstract.get('title', '')}")
-        if time.time() - last_time < MIN_ABSTRACT_TIME:
-            time.sleep(MIN_ABSTRACT_TIME - (time.time() - last_time))
-        last_time = time.time()
+        if local_scores[i] is not None:
+            category_scores = local_scores[i]
+        else:
+            if time.time() - last_time < MIN_ABSTRACT_TIME:
+                time.sleep(MIN_ABSTRACT_TIME - (time.time() - last_time))
+            last_time = time.time()
 
-        # Get category scores
-        category_scores = categorize_abstract(abstract, categories)
+            # Get category scores
+            category_scores = categorize_abstract(abstract, categories)
 
         # Add scores to the abstract
         abstract_result = abstract.copy()
@@ -111,8 +193,10 @@ def main():
     """Main function to run the script."""
     categories_file = "categories.txt"
     abstracts_file = "abstracts.json"
+    # trained with local_category_model.py, ignored if it does not exist
+    model_file = "category_model.pkl"
 
-    results = process_abstracts(categories_file, abstracts_file)
+    results = process_abstracts(categories_file, abstracts_file, model_file=model_file)
 
     print("Processing complete!")
 
@@ -1,13 +1,32 @@
+import argparse
+import json
 import os
-from unidecode import unidecode
-
-IMAGE_FOLDER = '/media/bigboy2/ESMRMB2025/image/'
-
-for filename in os.listdir(IMAGE_FOLDER):
-    src = os.path.join(IMAGE_FOLDER, filename)
-    if os.path.isfile(src):
-        new_filename = unidecode(filename)
-        dst = os.path.join(IMAGE_FOLDER, new_filename)
-        if src != dst:
-            os.rename(src, dst)
-            print(f'Renamed: {filename} -> {new_filename}')
\ No newline at end of file
+
+from figure_names import IMAGE_FOLDER, NAME_MAP_FILE, FigureNames, plan_renames, reference_map, rename_files
+
+parser = argparse.ArgumentParser(description='Rename the figures to ASCII names and write the figure name map')
+parser.add_argument('--abstracts', default='abstracts_for_print.json', help='Abstracts whose figure names are mapped')
+parser.add_argument('--dry-run', action='store_true', help='Only print the renames and the collisions')
+args = parser.parse_args()
+
+filenames = [entry.name for entry in os.scandir(IMAGE_FOLDER) if entry.is_file()]
+renames, collisions = plan_renames(filenames)
+for name, normalized, new_name in collisions:
+    print(f'Warning: {name} collides with another file as {normalized}, renamed to {new_name}')
+for name, new_name in renames.items():
+    if name != new_name:
+        print(f'Renamed: {name} -> {new_name}')
+
+if not args.dry_run:
+    rename_files(renames, IMAGE_FOLDER)
+    names = FigureNames(NAME_MAP_FILE)
+    # keep the names of the previous runs, the abstracts may still use them
+    names.files.update(renames)
+    if os.path.exists(args.abstracts):
+        with open(args.abstracts, 'r', encoding='utf-8') as f:
+            abstracts = json.load(f)
+        figures = {figure for abstract in abstracts for figure in abstract.get('figure_files') or []}
+        names.references = reference_map(figures, names.files)
+    names.save()
+    print(f'{sum(1 for name, new_name in renames.items() if name != new_name)} files renamed, '
+          f'{len(collisions)} collisions, name map written to {NAME_MAP_FILE}')
@@ -1,19 +1,99 @@
-from api_token import CLAUDE_API_KEY
-import anthropic
+import argparse
 import json
+import os
 
 from abstract_csv_to_json_print import parse_refs
+from process_abstracts import categorize_abstract
+from retry_queue import RetryQueue
 
-with open('abstracts_for_print.json', 'r') as f:
-    abstracts = json.load(f)
+ABSTRACTS_FOR_PRINT = 'abstracts_for_print.json'
+CATEGORIZED_ABSTRACTS = 'categorized_abstracts.json'
+CATEGORIES_FILE = 'categories.txt'
 
-for abstract in abstracts:
-    if abstract['acknowledgments'] == "PARSE FAILED":
-        print(f"Re-parsing abstract {abstract['reference']} due to failed acknowledgment parsing.")
-        parsed_refs = parse_refs(abstract['original_availability'])
+# Retry abstracts whose references failed to parse
+REPARSE_REFERENCES = True
+# Retry abstracts whose categorization came back empty
+RECATEGORIZE = True
+
+MAX_ATTEMPTS = 5
+CONCURRENCY = 4
+
+
+def reparse_references(reset=False):
+    with open(ABSTRACTS_FOR_PRINT, 'r', encoding='utf-8') as f:
+        abstracts = json.load(f)
+
+    queue = RetryQueue('parse_refs_queue.json', 'parse_refs_checkpoint.jsonl',
+                       max_attempts=MAX_ATTEMPTS, concurrency=CONCURRENCY)
+    if reset:
+        print(f"Reset {queue.reset()} exhausted items of the reference queue")
+    for abstract in abstracts:
+        if abstract['acknowledgments'] == "PARSE FAILED":
+            print(f"Re-parsing abstract {abstract['reference']} due to failed acknowledgment parsing.")
+            queue.add(abstract['reference'], abstract['original_availability'])
+
+    results = queue.run(lambda text: parse_refs(text, raise_errors=True))
+    if not results:
+        print("No abstract was re-parsed successfully, leaving", ABSTRACTS_FOR_PRINT, "untouched.")
+        return
+
+    for abstract in abstracts:
+        parsed_refs = results.get(abstract['reference'])
+        if parsed_refs is None:
+            continue
         abstract['acknowledgments'] = parsed_refs.get('Acknowledgments', '')
         abstract['data_and_code_availability'] = parsed_refs.get('Data and Code Availability Statement', '')
         abstract['references'] = parsed_refs.get('References', [])
 
-with open('abstracts_for_print.json', 'w', encoding='utf-8') as f:
-    json.dump(abstracts, f, indent=4, ensure_ascii=False)
+    with open(ABSTRACTS_FOR_PRINT, 'w', encoding='utf-8') as f:
+        json.dump(abstracts, f, indent=4, ensure_ascii=False)
+    queue.clear_checkpoint()
+    print(f"Updated {len(results)} abstracts in {ABSTRACTS_FOR_PRINT}")
+
+
+def recategorize(reset=False):
+    with open(CATEGORIES_FILE, 'r') as f:
+        categories = [line.strip() for line in f if line.strip()]
+
+    with open(CATEGORIZED_ABSTRACTS, 'r') as f:
+        abstracts = json.load(f)
+
+    queue = RetryQueue('categorize_queue.json', 'categorize_checkpoint.jsonl',
+                       max_attempts=MAX_ATTEMPTS, concurrency=CONCURRENCY)
+    if reset:
+        print(f"Reset {queue.reset()} exhausted items of the categorization queue")
+    for abstract in abstracts:
+        if not abstract.get('category_scores'):
+            print(f"Re-categorizing abstract {abstract['number']} due to empty category scores.")
+            # the queue only needs the fields used by the prompt
+            queue.add(abstract['number'], {
+                'title': abstract.get('title', ''),
+                'keywords': abstract.get('keywords', []),
+                'text': abstract.get('text', '')
+            })
+
+    results = queue.run(lambda payload: categorize_abstract(payload, categories, raise_errors=True))
+    if not results:
+        print("No abstract was re-categorized successfully, leaving", CATEGORIZED_ABSTRACTS, "untouched.")
+        return
+
+    for abstract in abstracts:
+        if abstract['number'] in results:
+            abstract['category_scores'] = results[abstract['number']]
+
+    with open(CATEGORIZED_ABSTRACTS, 'w') as f:
+        json.dump(abstracts, f, indent=2)
+    queue.clear_checkpoint()
+    print(f"Updated {len(results)} abstracts in {CATEGORIZED_ABSTRACTS}")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Retry the failed reference parsing and categorizations')
+    parser.add_argument('--reset', action='store_true',
+                        help='Retry the items that reached the maximum number of attempts in previous runs')
+    args = parser.parse_args()
+
+    if REPARSE_REFERENCES and os.path.exists(ABSTRACTS_FOR_PRINT):
+        reparse_references(args.reset)
+    if RECATEGORIZE and os.path.exists(CATEGORIZED_ABSTRACTS):
+        recategorize(args.reset)
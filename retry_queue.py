@@ -0,0 +1,211 @@
+import json
+import os
+import random
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Callable, Dict
+
+import anthropic
+
+# Default retry policy
+MAX_ATTEMPTS = 5
+CONCURRENCY = 4
+BASE_DELAY = 2.0  # seconds, doubled at every attempt
+MAX_DELAY = 120.0  # seconds
+
+FAILURE_RATE_LIMIT = 'rate_limit'
+FAILURE_JSON = 'json_error'
+FAILURE_API = 'api_error'
+
+
+def classify_failure(exc: Exception) -> str:
+    """
+    Classify an exception raised by an LLM call.
+
+    Args:
+        exc: The exception raised by the worker
+
+    Returns:
+        One of FAILURE_RATE_LIMIT, FAILURE_JSON or FAILURE_API
+    """
+    if isinstance(exc, anthropic.RateLimitError):
+        return FAILURE_RATE_LIMIT
+    if isinstance(exc, anthropic.APIStatusError) and exc.status_code in (429, 529):
+        return FAILURE_RATE_LIMIT
+    # json.JSONDecodeError is a ValueError, like a response without any usable content
+    if isinstance(exc, ValueError):
+        return FAILURE_JSON
+    return FAILURE_API
+
+
+def backoff_delay(attempt: int, base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY) -> float:
+    """
+    Exponential backoff with full jitter.
+
+    Args:
+        attempt: Number of attempts made so far (1 for the first failure)
+        base_delay: Delay after the first failure, before jitter
+        max_delay: Upper bound of the delay
+
+    Returns:
+        Number of seconds to wait before the next attempt
+    """
+    return random.uniform(0, min(max_delay, base_delay * 2 ** (attempt - 1)))
+
+
+def _retry_after(exc: Exception) -> float:
+    """Return the retry-after header of a rate limit response in seconds, or 0."""
+    response = getattr(exc, 'response', None)
+    if response is None:
+        return 0.0
+    try:
+        return float(response.headers.get('retry-after', 0))
+    except (TypeError, ValueError):
+        return 0.0
+
+
+class RetryQueue:
+    """
+    Persistent queue of failed items that are retried with bounded concurrency.
+
+    The queue state (payload, attempts, last failure) is stored in a JSON file, so an
+    interrupted run can be resumed. Every successful result is appended to a JSONL
+    checkpoint file as soon as it is available.
+    """
+
+    def __init__(self, queue_file: str, checkpoint_file: str,
+                 max_attempts: int = MAX_ATTEMPTS, concurrency: int = CONCURRENCY,
+                 base_delay: float = BASE_DELAY, max_delay: float = MAX_DELAY):
+        self.queue_file = queue_file
+        self.checkpoint_file = checkpoint_file
+        self.max_attempts = max_attempts
+        self.concurrency = concurrency
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+        self.lock = threading.Lock()
+        self.items = {}
+        if os.path.exists(queue_file):
+            with open(queue_file, 'r', encoding='utf-8') as f:
+                self.items = json.load(f)
+
+    def __len__(self):
+        return len(self.items)
+
+    def add(self, key: str, payload: Any):
+        """
+        Add an item to the queue. Items that are already queued keep their attempt count.
+        The queue file is written by save() or at the start of run(), not for every item.
+        """
+        with self.lock:
+            if key not in self.items:
+                self.items[key] = {'payload': payload, 'attempts': 0, 'failure': None, 'error': None}
+
+    def save(self):
+        with self.lock:
+            self._save()
+
+    def pending(self):
+        """Keys of the items that have attempts left."""
+        return [key for key, item in self.items.items() if item['attempts'] < self.max_attempts]
+
+    def exhausted(self):
+        """Keys of the items that reached the maximum number of attempts."""
+        return [key for key, item in self.items.items() if item['attempts'] >= self.max_attempts]
+
+    def reset(self) -> int:
+        """Give the exhausted items a new set of attempts. Returns the number of reset items."""
+        exhausted = self.exhausted()
+        with self.lock:
+            for key in exhausted:
+                self.items[key].update({'attempts': 0, 'failure': None, 'error': None})
+            self._save()
+        return len(exhausted)
+
+    def load_checkpoint(self) -> Dict[str, Any]:
+        """Load all the results stored in the checkpoint file."""
+        results = {}
+        if not os.path.exists(self.checkpoint_file):
+            return results
+        with open(self.checkpoint_file, 'r', encoding='utf-8') as f:
+            for line in f:
+                if not line.strip():
+                    continue
+                try:
+                    entry = json.loads(line)
+                except json.JSONDecodeError:
+                    # truncated last line of an interrupted run
+                    continue
+                results[entry['key']] = entry['result']
+        return results
+
+    def clear_checkpoint(self):
+        """Remove the checkpoint file, once its results have been merged."""
+        if os.path.exists(self.checkpoint_file):
+            os.remove(self.checkpoint_file)
+
+    def _save(self):
+        tmp_file = self.queue_file + '.tmp'
+        with open(tmp_file, 'w', encoding='utf-8') as f:
+            json.dump(self.items, f, indent=4, ensure_ascii=False)
+        os.replace(tmp_file, self.queue_file)
+
+    def _checkpoint(self, key: str, result: Any):
+        with open(self.checkpoint_file, 'a', encoding='utf-8') as f:
+            f.write(json.dumps({'key': key, 'result': result}, ensure_ascii=False) + '\n')
+
+    def _process(self, key: str, worker: Callable[[Any], Any]):
+        item = self.items[key]
+        while item['attempts'] < self.max_attempts:
+            try:
+                result = worker(item['payload'])
+            except Exception as e:
+                failure = classify_failure(e)
+                with self.lock:
+                    item['attempts'] += 1
+                    item['failure'] = failure
+                    item['error'] = str(e)
+                    self._save()
+                print(f"Attempt {item['attempts']}/{self.max_attempts} for {key} failed ({failure}): {e}")
+                if item['attempts'] >= self.max_attempts:
+                    print(f"Giving up on {key}")
+                    return
+                delay = backoff_delay(item['attempts'], self.base_delay, self.max_delay)
+                if failure == FAILURE_RATE_LIMIT:
+                    delay = max(delay, _retry_after(e))
+                time.sleep(delay)
+                continue
+
+            with self.lock:
+                self._checkpoint(key, result)
+                del self.items[key]
+                self._save()
+            print(f"Retry of {key} succeeded")
+            return
+
+    def run(self, worker: Callable[[Any], Any]) -> Dict[str, Any]:
+        """
+        Process all pending items.
+
+        Args:
+            worker: Function called with the payload of an item. It must raise an exception on failure.
+
+        Returns:
+            Dictionary key -> result of all the checkpointed items, including those of previous runs
+        """
+        self.save()
+        pending = self.pending()
+        print(f"Retrying {len(pending)} items with {self.concurrency} workers")
+        with ThreadPoolExecutor(max_workers=self.concurrency) as executor:
+            for future in [executor.submit(self._process, key, worker) for key in pending]:
+                future.result()
+
+        # also the items exhausted by previous runs, which are no longer retried
+        exhausted = self.exhausted()
+        if exhausted:
+            print(f"{len(exhausted)} items reached the maximum number of attempts and are not retried "
+                  f"(reset them to retry):")
+            for key in exhausted:
+                print(f"  - {key}: {self.items[key]['failure']} ({self.items[key]['error']})")
+
+        return self.load_checkpoint()
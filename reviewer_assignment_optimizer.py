@@ -1,10 +1,15 @@
+import argparse
 import json
+import time
 import numpy as np
 import pulp
 from tqdm import tqdm
-from unidecode import unidecode
 from collections import defaultdict
 
+from abstract_clustering import load_assignments
+from author_identity import AuthorIndex
+from score_matrix import load_scores
+
 # configuration
 TOPIC_MULTIPLIER = 1.2
 MINIMUM_MATCH_SCORE = 10
@@ -12,25 +17,35 @@ MAX_ABSTRACTS_PER_REVIEWER = 30
 MIN_ABSTRACTS_PER_REVIEWER = 10
 REVIEWERS_PER_ABSTRACT = 3
 EXPERIENCE_THRESHOLD = 10  # years of experience
+# a reviewer is scored for the abstracts of a cluster if its score with the cluster centroid, with the focus topic
+# multiplier, exceeds this fraction of MINIMUM_MATCH_SCORE (lower: better recall, more exact scoring)
+CANDIDATE_SLACK = 0.5
 
-def calculate_match(abstract, reviewer):
+def calculate_match(abstract, reviewer, authors=None, category_score=None):
     """
     Calculate the match score between an abstract and a reviewer.
     The score is based on the number of matching categories and focus topics.
+    authors is the AuthorIndex of the abstracts (by number), built from the abstract if not given.
+    category_score is the sum of the scores of the abstract in the categories of the reviewer, computed from
+    category_scores if not given.
     """
     # Initialize match score
     match_score = 0
 
     # Check for conflicts of interest
-    for author in abstract['authors']:
-        if unidecode(reviewer['last_name']).lower() in unidecode(author).lower():
-            return 0  # avoid COIs
+    if authors is None:
+        authors = AuthorIndex([abstract], 'number')
+    if authors.has_author(abstract['number'], reviewer['last_name']):
+        return 0  # avoid COIs
 
     # Check for matching categories
-    for category, score in abstract['category_scores'].items():
-        cats = [c.lower() for c in reviewer['categories']]
-        if category.lower() in cats:
-            match_score += score
+    if category_score is not None:
+        match_score = category_score
+    else:
+        for category, score in abstract['category_scores'].items():
+            cats = [c.lower() for c in reviewer['categories']]
+            if category.lower() in cats:
+                match_score += score
 
     # Apply focus topic multiplier
     if abstract['focus_topic'] in reviewer['focus_topic']:
@@ -40,9 +55,54 @@ def calculate_match(abstract, reviewer):
 
     return match_score
 
-def prepare_data(abstracts_file, reviewers_file):
+def reviewer_profiles(reviewer_dict, categories):
+    """
+    Reviewers x categories matrix (rows in the order of the reviewer indices), 1 where the category is one of
+    the categories of the reviewer. Multiplied by a row of the score matrix, it gives the category score of
+    the abstract for every reviewer, like the category loop of calculate_match.
+    """
+    columns = defaultdict(list)
+    for i, category in enumerate(categories):
+        columns[category.lower()].append(i)
+    profiles = np.zeros((len(reviewer_dict), len(categories)))
+    for row, reviewer in enumerate(reviewer_dict.values()):
+        for category in {c.lower() for c in reviewer['categories']}:
+            profiles[row, columns.get(category, [])] = 1
+    return profiles
+
+
+def cluster_candidates(scores, reviewer_dict, profiles, assignments):
+    """
+    Candidate reviewers of each clustered abstract, from the clusters of abstract_clustering.py.
+    The reviewers are scored against the centroid of each cluster (a clusters x reviewers matrix product),
+    and the reviewers whose categories overlap the centroid enough are the candidates of all its abstracts.
+
+    Returns:
+        Abstract number (as a string) -> reviewer keys to score. Abstracts without a cluster are not in it.
+    """
+    rows = [i for i, reference in enumerate(scores.references) if reference in assignments]
+    if not rows:
+        return {}
+    labels = np.array([assignments[scores.references[i]] for i in rows])
+    reviewer_keys = list(reviewer_dict.keys())
+    experience = np.array([reviewer_dict[key]['experience'] for key in reviewer_keys], dtype=np.float32)
+
+    candidates = {}
+    for cluster in np.unique(labels):
+        members = [rows[i] for i in np.flatnonzero(labels == cluster)]
+        centroid = scores.matrix[members].mean(axis=0)
+        bound = (profiles @ centroid) * TOPIC_MULTIPLIER * experience
+        cluster_reviewers = [reviewer_keys[i] for i in np.flatnonzero(bound > MINIMUM_MATCH_SCORE * CANDIDATE_SLACK)]
+        for i in members:
+            candidates[scores.references[i]] = cluster_reviewers
+    return candidates
+
+
+def prepare_data(abstracts_file, reviewers_file, assignments_file=None, check_recall=False):
     """
     Load and prepare data for optimization.
+    With the cluster assignments of abstract_clustering.py, each abstract is only scored against the candidate
+    reviewers of its cluster; check_recall also scores all pairs and reports the matches that were missed.
     """
     print("Loading data...")
     with open(abstracts_file, 'r') as f:
@@ -68,15 +128,35 @@ def prepare_data(abstracts_file, reviewers_file):
     
     # Calculate all valid matches
     print("Calculating matches...")
+    authors = AuthorIndex(abstract_dict.values(), 'number')
+    # category scores of the abstracts, memory-mapped from the matrix of score_matrix.py
+    scores = load_scores(abstracts_file, export=False)
+    profiles = reviewer_profiles(reviewer_dict, scores.categories)
+    candidates = {}
+    if assignments_file:
+        candidates = cluster_candidates(scores, reviewer_dict, profiles, load_assignments(assignments_file))
+        n_pairs = sum(len(candidates.get(str(num), reviewer_dict)) for num in abstract_dict)
+        print(f"Scoring {n_pairs} candidate pairs instead of {len(abstract_dict) * len(reviewer_dict)} "
+              f"({len(abstract_dict) - len(candidates)} abstracts without a cluster are scored against all reviewers)")
+    t0 = time.perf_counter()
     matches = {}
     eligible_reviewers = {}
     
     for abstract_num, abstract in tqdm(abstract_dict.items()):
         abstract_matches = {}
         eligible_list = []
-        
-        for reviewer_key, reviewer in reviewer_dict.items():
-            match_score = calculate_match(abstract, reviewer)
+        reviewer_keys = candidates.get(str(abstract_num))
+        if reviewer_keys is None:
+            reviewer_keys = reviewer_dict
+            category_scores = profiles @ scores.row(abstract_num)
+        else:
+            # only the rows of the candidate reviewers, in the order of reviewer_keys
+            candidate_idx = [reviewer_dict[reviewer_key]['index'] for reviewer_key in reviewer_keys]
+            category_scores = profiles[candidate_idx] @ scores.row(abstract_num)
+
+        for position, reviewer_key in enumerate(reviewer_keys):
+            reviewer = reviewer_dict[reviewer_key]
+            match_score = calculate_match(abstract, reviewer, authors, category_scores[position])
             if match_score > MINIMUM_MATCH_SCORE:
                 reviewer_idx = reviewer['index']
                 abstract_matches[reviewer_idx] = match_score
@@ -85,6 +165,10 @@ def prepare_data(abstracts_file, reviewers_file):
         matches[abstract_num] = abstract_matches
         eligible_reviewers[abstract_num] = eligible_list
         print(f"Abstract {abstract_num} has {len(eligible_list)} eligible reviewers")
+    print(f"Matches calculated in {time.perf_counter() - t0:.1f} s")
+
+    if check_recall:
+        check_match_recall(abstract_dict, reviewer_dict, authors, matches, scores, profiles)
     
     # Identify experienced reviewers (5+ years of experience)
     experienced_reviewers = []
@@ -115,6 +199,26 @@ def prepare_data(abstracts_file, reviewers_file):
         'problematic_abstracts': problematic_abstracts
     }
 
+def check_match_recall(abstract_dict, reviewer_dict, authors, matches, scores, profiles):
+    """Score all abstract/reviewer pairs and report the matches that are missing from matches."""
+    t0 = time.perf_counter()
+    n_matches = 0
+    missed = []
+    for abstract_num, abstract in abstract_dict.items():
+        category_scores = profiles @ scores.row(abstract_num)
+        for reviewer_key, reviewer in reviewer_dict.items():
+            if calculate_match(abstract, reviewer, authors, category_scores[reviewer['index']]) > MINIMUM_MATCH_SCORE:
+                n_matches += 1
+                if reviewer['index'] not in matches[abstract_num]:
+                    missed.append((abstract_num, reviewer_key))
+    recall = 1 - len(missed) / n_matches if n_matches else 1
+    print(f"Full computation in {time.perf_counter() - t0:.1f} s: {n_matches} matches, {len(missed)} missed, "
+          f"recall {recall:.4f}")
+    for abstract_num, reviewer_key in missed[:20]:
+        print(f"  - Abstract {abstract_num}, reviewer {reviewer_key}")
+    return recall
+
+
 def optimize_assignments(data, reviewers_per_abstract=3, max_abstracts_per_reviewer=30, min_abstracts_per_reviewer=10):
     """
     Perform optimization to assign reviewers to abstracts.
@@ -450,13 +554,20 @@ def convert_to_output_format(assignments, data):
 
 def main():
     """Main function to run the optimization."""
+    parser = argparse.ArgumentParser(description='Assign reviewers to the abstracts')
+    parser.add_argument('--clusters', help='Cluster assignments of abstract_clustering.py (cluster_assignments.csv): '
+                                           'only score the candidate reviewers of the cluster of each abstract')
+    parser.add_argument('--check-recall', action='store_true',
+                        help='With --clusters, also score all pairs and report the matches that were missed')
+    args = parser.parse_args()
+
     # Files with your data
     abstracts_file = 'categorized_abstracts.json'
     reviewers_file = 'reviewers.json'
 
     
     # Prepare data
-    data = prepare_data(abstracts_file, reviewers_file)
+    data = prepare_data(abstracts_file, reviewers_file, args.clusters, args.check_recall)
     
     # Run optimization
     print("\nRunning assignment optimization...")
@@ -0,0 +1,158 @@
+import argparse
+import json
+import os
+import time
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from artifact_store import record_reference
+
+
+def build_matrix(abstracts: List[Dict[str, Any]], categories: Optional[Sequence[str]] = None
+                 ) -> Tuple[np.ndarray, List[str], List[Any]]:
+    """
+    Category score matrix of the abstracts, one row per abstract and one column per category.
+    The columns are the sorted union of the categories of all abstracts (or the given categories), and each
+    score goes to the column of its category, so abstracts with missing or differently ordered categories
+    stay aligned. Missing scores are 0.
+
+    Returns:
+        Matrix, categories of the columns, references of the rows
+    """
+    if categories is None:
+        categories = sorted({category for a in abstracts for category in a['category_scores']})
+    columns = {category: i for i, category in enumerate(categories)}
+    matrix = np.zeros((len(abstracts), len(categories)), dtype=np.float32)
+    n_incomplete = 0
+    for row, a in enumerate(abstracts):
+        scores = a['category_scores']
+        if len(scores) != len(categories):
+            n_incomplete += 1
+        for category, score in scores.items():
+            column = columns.get(category)
+            if column is not None:
+                matrix[row, column] = score
+    if n_incomplete:
+        print(f"Warning: {n_incomplete} abstracts do not have a score for every category, missing scores are 0.")
+    return matrix, list(categories), [record_reference(a) for a in abstracts]
+
+
+def score_value(value) -> float:
+    """A score of the matrix as in the original JSON: int for integer scores."""
+    value = float(value)
+    return int(value) if value.is_integer() else value
+
+
+def matrix_files(json_file: str) -> Tuple[str, str, str]:
+    """Matrix, row index and column index files of the scores of a JSON file, next to it."""
+    base = os.path.splitext(json_file)[0] + '.scores'
+    return base + '.npy', base + '.references.txt', base + '.categories.txt'
+
+
+class ScoreMatrix:
+    """
+    Category scores of a JSON file of abstracts, memory-mapped from the .npy matrix exported by export_scores.
+    The matrix is read-only and shared by all the processes that map it.
+
+    - matrix: abstracts x categories, float32
+    - references: reference of each row ('reference' or 'number' of the records)
+    - categories: category of each column
+    """
+
+    def __init__(self, matrix: np.ndarray, references: List[str], categories: List[str]):
+        self.matrix = matrix
+        self.references = references
+        self.categories = categories
+        self.rows = {reference: i for i, reference in enumerate(references)}
+        self.columns = {category: i for i, category in enumerate(categories)}
+
+    @classmethod
+    def open(cls, json_file: str):
+        matrix_file, references_file, categories_file = matrix_files(json_file)
+        with open(references_file, 'r', encoding='utf-8') as f:
+            references = f.read().splitlines()
+        with open(categories_file, 'r', encoding='utf-8') as f:
+            categories = f.read().splitlines()
+        return cls(np.load(matrix_file, mmap_mode='r'), references, categories)
+
+    def __len__(self):
+        return len(self.references)
+
+    def row(self, reference: str) -> np.ndarray:
+        return self.matrix[self.rows[str(reference)]]
+
+    def column(self, category: str) -> np.ndarray:
+        """Scores of a category for all abstracts, 0 if no abstract has a score for it."""
+        column = self.columns.get(category)
+        if column is None:
+            return np.zeros(len(self.references), dtype=np.float32)
+        return self.matrix[:, column]
+
+    def scores(self, reference: str) -> Dict[str, float]:
+        """Category scores of an abstract as a dict, like its category_scores."""
+        return {category: score_value(score) for category, score in zip(self.categories, self.row(reference))}
+
+
+def _write_lines(path: str, lines: List[str]):
+    tmp_file = f'{path}.{os.getpid()}.tmp'
+    with open(tmp_file, 'w', encoding='utf-8') as f:
+        f.write(''.join(f'{line}\n' for line in lines))
+    os.replace(tmp_file, path)
+
+
+def export_scores(json_file: str, abstracts: List[Dict[str, Any]] = None) -> ScoreMatrix:
+    """Export the category scores of a JSON file of abstracts to the .npy matrix and its index files."""
+    if abstracts is None:
+        with open(json_file, 'r', encoding='utf-8') as f:
+            abstracts = json.load(f)
+    matrix, categories, references = build_matrix(abstracts)
+    matrix_file, references_file, categories_file = matrix_files(json_file)
+    # the index files are written first, a matrix newer than the JSON file always has its index files.
+    # Temporary files are per process, as the tools of a parallel pipeline run may export the same file.
+    _write_lines(references_file, [str(reference) for reference in references])
+    _write_lines(categories_file, categories)
+    tmp_file = f'{matrix_file}.{os.getpid()}.tmp'
+    with open(tmp_file, 'wb') as f:
+        np.save(f, matrix)
+    os.replace(tmp_file, matrix_file)
+    return ScoreMatrix.open(json_file)
+
+
+def is_current(json_file: str) -> bool:
+    """Whether the exported matrix exists and is newer than the JSON file."""
+    matrix_file = matrix_files(json_file)[0]
+    return os.path.exists(matrix_file) and os.path.getmtime(matrix_file) >= os.path.getmtime(json_file)
+
+
+def load_scores(json_file: str, export: bool = True) -> ScoreMatrix:
+    """
+    Memory-mapped category scores of a JSON file. If the matrix is missing or out of date, it is exported first,
+    or with export=False built in memory, so that the pipeline stages do not write the files of the
+    score_matrix stage.
+    """
+    if is_current(json_file):
+        return ScoreMatrix.open(json_file)
+    if export:
+        print(f"Exporting the category scores of {json_file}")
+        return export_scores(json_file)
+    print(f"Warning: the score matrix of {json_file} is missing or out of date, using the scores in memory "
+          f"(run score_matrix.py {json_file} to export it)")
+    with open(json_file, 'r', encoding='utf-8') as f:
+        abstracts = json.load(f)
+    matrix, categories, references = build_matrix(abstracts)
+    return ScoreMatrix(matrix, [str(reference) for reference in references], categories)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Export the category scores of JSON files of abstracts to '
+                                                 'memory-mapped .npy matrices')
+    parser.add_argument('json_files', nargs='+')
+    parser.add_argument('--force', action='store_true', help='Export even if the matrix is up to date')
+    args = parser.parse_args()
+
+    for json_file in args.json_files:
+        t0 = time.perf_counter()
+        scores = export_scores(json_file) if args.force else load_scores(json_file)
+        print(f"{json_file}: {len(scores)} abstracts x {len(scores.categories)} categories "
+              f"({time.perf_counter() - t0:.2f} s) in {matrix_files(json_file)[0]}")
@@ -0,0 +1,41 @@
+import json
+
+import pytest
+
+np = pytest.importorskip('numpy')
+pytest.importorskip('sklearn')
+
+from abstract_clustering import clustered_scores, inertia_knee, select_k
+
+
+def test_inertia_knee_of_an_elbow_curve():
+    assert inertia_knee([2, 3, 4, 5, 6, 7], [100, 40, 20, 17, 15, 14]) == 4
+
+
+def test_inertia_knee_with_less_than_three_points():
+    assert inertia_knee([5], [10.0]) == 5
+    assert inertia_knee([3, 4], [10.0, 5.0]) == 3
+
+
+def test_inertia_knee_of_a_flat_curve():
+    assert inertia_knee([2, 3, 4], [1.0, 1.0, 1.0]) == 2
+
+
+def test_select_k_falls_back_to_the_knee_without_silhouette():
+    results = [{'k': k, 'inertia': inertia, 'silhouette': None}
+               for k, inertia in zip([2, 3, 4, 5, 6], [100, 30, 20, 16, 14])]
+    assert select_k(results)['k'] == 3
+    results[3]['silhouette'] = 0.5
+    assert select_k(results)['k'] == 5
+
+
+def test_abstracts_without_scores_are_not_clustered(tmp_path):
+    abstracts = [{'number': '#1', 'category_scores': {'a': 5, 'b': 0}},
+                 {'number': '#2', 'category_scores': {}},
+                 {'number': '#3', 'category_scores': {'a': 0, 'b': 8}}]
+    abstracts_file = tmp_path / 'abstracts.json'
+    abstracts_file.write_text(json.dumps(abstracts), encoding='utf-8')
+    matrix, categories, references = clustered_scores(str(abstracts_file))
+    assert categories == ['a', 'b']
+    assert references == ['#1', '#3']
+    assert np.array_equal(matrix, [[5, 0], [0, 8]])
@@ -0,0 +1,19 @@
+import os
+
+from abstract_store import STORE_SUFFIX, load_store, write_synthetic_export
+
+
+def test_store_is_reused_and_rebuilt_when_truncated(tmp_path):
+    export_file = str(tmp_path / 'export.csv')
+    write_synthetic_export(export_file, 20)
+    store = load_store(export_file)
+    assert len(store) == 20
+    assert load_store(export_file).column('title') == store.column('title')
+
+    store_file = export_file + STORE_SUFFIX
+    with open(store_file, 'rb') as f:
+        data = f.read()
+    with open(store_file, 'wb') as f:
+        f.write(data[:len(data) // 2])
+    assert load_store(export_file).column('reference') == store.column('reference')
+    assert sorted(os.listdir(tmp_path)) == ['export.csv', 'export.csv' + STORE_SUFFIX]
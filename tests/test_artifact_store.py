@@ -0,0 +1,77 @@
+import json
+
+from artifact_store import ArtifactStore
+
+PRINT_ABSTRACTS = [
+    {
+        'reference': '#101',
+        'title': 'Glymphatic imaging',
+        'authors': [['Anna Smith', '1'], ['Jan Kowalski', '1, 2']],
+        'category_scores': {'diffusion': 7, 'brain function': 2.5},
+        'program_number': '12',
+        'figure_files': ['fig1.png'],
+        'figure_refs': ['Figure 1'],
+        'figure_captions': ['A figure'],
+    },
+    {
+        'reference': '#102',
+        'title': 'Cardiac T1 mapping',
+        'category_scores': {},
+        'authors': [['Li Wei', '1']],
+        'program_number': '',
+    },
+    {
+        'reference': '#103',
+        'title': 'Not categorized',
+        'authors': [],
+        'program_number': '13',
+    },
+]
+
+
+def round_trip(tmp_path, abstracts):
+    json_file = tmp_path / 'abstracts.json'
+    exported_file = tmp_path / 'exported.json'
+    json_file.write_text(json.dumps(abstracts), encoding='utf-8')
+    with ArtifactStore(str(tmp_path / 'abstracts.sqlite')) as store:
+        assert store.import_json(str(json_file)) == len(abstracts)
+        store.export_json(str(exported_file))
+    return json.loads(exported_file.read_text(encoding='utf-8'))
+
+
+def test_round_trip_keeps_records_and_key_order(tmp_path):
+    exported = round_trip(tmp_path, PRINT_ABSTRACTS)
+    assert exported == PRINT_ABSTRACTS
+    assert [list(a) for a in exported] == [list(a) for a in PRINT_ABSTRACTS]
+
+
+def test_partial_reads_and_updates(tmp_path):
+    with ArtifactStore(str(tmp_path / 'abstracts.sqlite')) as store:
+        for record in PRINT_ABSTRACTS:
+            store.upsert_abstract(record)
+        assert store.get_abstract('#101', ['title', 'category_scores']) == {
+            'title': 'Glymphatic imaging', 'category_scores': {'diffusion': 7, 'brain function': 2.5}}
+        assert store.get_abstract('#999', ['title']) is None
+
+        store.update_fields('#103', category_scores={'diffusion': 8}, title='Categorized')
+        record = store.get_abstract('#103')
+        assert record['title'] == 'Categorized'
+        assert record['category_scores'] == {'diffusion': 8}
+
+        assert store.references(program_numbers_only=True) == ['#101', '#103']
+        assert store.find_by_program_number(12)['reference'] == '#101'
+        assert store.abstracts_with_score('diffusion', 7.5) == ['#103']
+
+
+def test_merge_of_categorized_fields(tmp_path):
+    json_file = tmp_path / 'categorized.json'
+    json_file.write_text(json.dumps([{'number': '#102', 'authors': ['Li Wei'], 'keywords': ['T1'],
+                                      'category_scores': {'cardiac': 9}}]), encoding='utf-8')
+    with ArtifactStore(str(tmp_path / 'abstracts.sqlite')) as store:
+        for record in PRINT_ABSTRACTS:
+            store.upsert_abstract(record)
+        store.import_json(str(json_file), fields=['category_scores', 'keywords'])
+        record = store.get_abstract('#102')
+    assert record['authors'] == [['Li Wei', '1']]
+    assert record['keywords'] == ['T1']
+    assert record['category_scores'] == {'cardiac': 9}
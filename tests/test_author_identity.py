@@ -0,0 +1,46 @@
+import pytest
+
+pytest.importorskip('unidecode')
+
+from author_identity import AuthorIndex, author_key, initials
+
+ABSTRACTS = [
+    {'program_number': '1', 'authors_separated': [['Jean pierre', 'Müller'], ['Oliver', 'Smith']]},
+    {'program_number': '2', 'authors_separated': [['Łukasz', 'Nowak'], ['J. P.', 'Muller']]},
+    {'program_number': '', 'authors_separated': [['Anna', 'Li']]},
+    {'program_number': '3', 'authors_separated': [['Ö', 'Yılmaz'], ['Wei', 'Li']]},
+]
+
+
+def test_initials_keep_the_original_characters():
+    assert initials('Jean pierre') == 'J. P.'
+    assert initials('Łukasz') == 'Ł.'
+    assert author_key('Łukasz', 'Nowak') == ('nowak', 'L.')
+
+
+def test_accents_and_spacing_are_one_author():
+    index = AuthorIndex(ABSTRACTS)
+    assert index.numbers[('muller', 'J. P.')] == ['1', '2']
+    assert index.names[('muller', 'J. P.')] == ('Müller', 'J. P.')
+
+
+def test_display_names_keep_the_accented_initials():
+    index = AuthorIndex(ABSTRACTS)
+    assert index.names[('nowak', 'L.')] == ('Nowak', 'Ł.')
+    assert index.names[('yilmaz', 'O.')] == ('Yılmaz', 'Ö.')
+
+
+def test_abstracts_without_number_are_skipped():
+    index = AuthorIndex(ABSTRACTS)
+    assert ('li', 'A.') not in index.numbers
+    assert len(index) == 5
+
+
+def test_coi_matches_whole_words_of_the_names():
+    index = AuthorIndex(ABSTRACTS)
+    assert index.has_author('1', 'Muller')
+    assert index.has_author('1', 'Jean-Pierre Müller')
+    assert index.has_author('3', 'li')
+    # a short last name does not match inside another name (Li in Oliver)
+    assert not index.has_author('1', 'Li')
+    assert not index.has_author('2', 'Smith')
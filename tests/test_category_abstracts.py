@@ -0,0 +1,76 @@
+import json
+import random
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from category_abstracts import LISTS, AbstractIndex
+
+CATEGORIES = ['diffusion', 'brain function', 'open science', 'brain tumors']
+WORDS = ['Diffusion-weighted', 'microstructural', 'BBB', 'blood-brain', 'barrier', 'water', 'exchange', 'white',
+         'matter', 'connectivity', 'tractography', 'relaxation', 'cardiac', 'open', 'science', 'grey']
+SUBCATEGORIES = ['Open Science', 'Reproducibility and Validation', 'Neuro', 'Body', '']
+
+
+def baseline_select(abstracts, definition, threshold=6):
+    """Selection of the original script: nested loops over the abstracts and the list definition."""
+    selected = []
+    for i, a in enumerate(abstracts):
+        include = any(a['category_scores'].get(category, 0) >= threshold for category in definition['categories'])
+        for keyword in definition['keywords']:
+            if any(keyword.lower() in k.lower() for k in a['keywords']) or keyword.lower() in a['title'].lower():
+                include = True
+        for subcategory in definition['subcategories']:
+            if subcategory.lower() in a['primary_subcategory'].lower() or \
+                    subcategory.lower() in a['secondary_subcategory'].lower():
+                include = True
+        if include:
+            selected.append(i)
+    return selected
+
+
+def synthetic_abstracts(n, seed=0):
+    rng = random.Random(seed)
+    abstracts = []
+    for i in range(n):
+        abstracts.append({
+            'reference': f'#{1000 + i}',
+            'program_number': str(i) if i % 7 else '',
+            'title': ' '.join(rng.choice(WORDS) for _ in range(rng.randint(2, 8))),
+            'keywords': [' '.join(rng.choice(WORDS) for _ in range(rng.randint(1, 3))) for _ in range(rng.randint(0, 4))],
+            'primary_subcategory': rng.choice(SUBCATEGORIES),
+            'secondary_subcategory': rng.choice(SUBCATEGORIES),
+            'category_scores': {category: rng.randint(0, 10) for category in CATEGORIES},
+        })
+    return abstracts
+
+
+@pytest.fixture
+def index(tmp_path):
+    abstracts = synthetic_abstracts(300)
+    abstracts_file = tmp_path / 'abstracts.json'
+    abstracts_file.write_text(json.dumps(abstracts), encoding='utf-8')
+    return AbstractIndex(abstracts, str(abstracts_file))
+
+
+@pytest.mark.parametrize('name', sorted(LISTS))
+def test_select_matches_the_baseline(index, name):
+    assert index.select(LISTS[name]) == baseline_select(index.abstracts, LISTS[name])
+
+
+@pytest.mark.parametrize('keyword', ['diffusion', 'Diffusion-Weighted', 'water exchange', 'structur', 'bbb',
+                                     'blood-brain barrier', 'matter white', '-', 'absent'])
+def test_keywords_match_the_baseline(index, keyword):
+    definition = {'categories': [], 'keywords': [keyword], 'subcategories': []}
+    assert index.select(definition) == baseline_select(index.abstracts, definition)
+
+
+def test_subcategories_and_unknown_categories(index):
+    definition = {'categories': ['not a category'], 'keywords': [], 'subcategories': ['science', 'neuro']}
+    assert index.select(definition) == baseline_select(index.abstracts, definition)
+
+
+def test_abstracts_without_program_number_are_not_indexed(index):
+    assert all(a['program_number'] for a in index.abstracts)
+    assert len(index.abstracts) == 300 - len(range(0, 300, 7))
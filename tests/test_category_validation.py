@@ -0,0 +1,45 @@
+from category_validation import CategoryValidator, clamp_score
+
+CATEGORIES = ['Brain tumors', 'Diffusion MRI', 'Cardiac imaging']
+
+
+def test_keys_are_mapped_to_canonical_names():
+    validator = CategoryValidator(CATEGORIES)
+    scores, missing, unknown = validator.validate({'brain tumors': 7, 'Diffusion  MRI.': 3, 'Cardiac imagin': 5})
+    assert scores == {'Brain tumors': 7, 'Diffusion MRI': 3, 'Cardiac imaging': 5}
+    assert missing == []
+    assert unknown == []
+
+
+def test_missing_and_unknown_categories():
+    validator = CategoryValidator(CATEGORIES)
+    scores, missing, unknown = validator.validate({'Brain tumors': 4, 'Musculoskeletal': 8, 'Cardiac imaging': 'n/a'})
+    assert scores == {'Brain tumors': 4}
+    assert missing == ['Diffusion MRI', 'Cardiac imaging']
+    assert unknown == ['Musculoskeletal', 'Cardiac imaging']
+
+
+def test_duplicate_variants_keep_the_highest_score():
+    validator = CategoryValidator(CATEGORIES)
+    scores, _, _ = validator.validate({'Brain tumors': 2, 'brain-tumors': 6})
+    assert scores['Brain tumors'] == 6
+
+
+def test_invalid_response():
+    validator = CategoryValidator(CATEGORIES)
+    assert validator.validate(['Brain tumors']) == ({}, CATEGORIES, [])
+
+
+def test_complete_orders_and_fills_scores():
+    validator = CategoryValidator(CATEGORIES)
+    completed = validator.complete({'Cardiac imaging': 9, 'Brain tumors': 1})
+    assert list(completed) == CATEGORIES
+    assert completed == {'Brain tumors': 1, 'Diffusion MRI': 0, 'Cardiac imaging': 9}
+
+
+def test_clamp_score():
+    assert clamp_score(12) == 10
+    assert clamp_score(-1) == 0
+    assert clamp_score('6.6') == 7
+    assert clamp_score(True) is None
+    assert clamp_score(None) is None
@@ -0,0 +1,34 @@
+import pytest
+
+pytest.importorskip('unidecode')
+
+from figure_names import normalize_name, plan_renames, reference_map
+
+
+def test_normalize_name():
+    assert normalize_name('Fig?1_é.png') == 'Fig1_e.png'
+
+
+def test_normalized_names_are_kept():
+    renames, collisions = plan_renames(['fig1.png', 'fig2.pdf'])
+    assert renames == {'fig1.png': 'fig1.png', 'fig2.pdf': 'fig2.pdf'}
+    assert collisions == []
+
+
+def test_collision_with_a_normalized_file_gets_a_suffix():
+    renames, collisions = plan_renames(['résumé.png', 'resume.png'])
+    assert renames == {'resume.png': 'resume.png', 'résumé.png': 'resume_2.png'}
+    assert collisions == [('résumé.png', 'resume.png', 'resume_2.png')]
+
+
+def test_colliding_files_get_distinct_names():
+    renames, collisions = plan_renames(['è.png', 'é.png', 'ê.png', 'e_2.png'])
+    assert renames['e_2.png'] == 'e_2.png'
+    assert sorted(renames.values()) == ['e.png', 'e_2.png', 'e_3.png', 'e_4.png']
+    assert len(collisions) == 2
+
+
+def test_reference_map_resolves_original_names():
+    renames, _ = plan_renames(['résumé.png', 'resume.png'])
+    assert reference_map(['résumé.png', 'resume.png', 'Ärger.png'], renames) == {
+        'résumé.png': 'resume_2.png', 'resume.png': 'resume.png', 'Ärger.png': 'Arger.png'}
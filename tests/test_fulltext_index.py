@@ -0,0 +1,70 @@
+import pytest
+
+pytest.importorskip('numpy')
+
+from fulltext_index import FulltextIndex
+
+
+def abstract(reference, title, program_number='1', keywords=(), scores=None, **sections):
+    record = {'reference': reference, 'program_number': program_number, 'title': title, 'keywords': list(keywords),
+              'primary_subcategory': 'Neuro', 'secondary_subcategory': '', 'category_scores': scores or {}}
+    record.update(sections)
+    return record
+
+
+ABSTRACTS = [
+    abstract('#1', 'Glymphatic clearance in sleep', keywords=['BBB'], scores={'brain function': 8}),
+    abstract('#2', 'Diffusion tractography of white matter', scores={'diffusion': 9, 'brain function': 3}),
+    abstract('#3', 'Cardiac T1 mapping', program_number='', methods='A blood brain barrier phantom'),
+    abstract('#4', 'Water exchange across the blood-brain barrier', scores={'diffusion': 6}),
+]
+
+
+@pytest.fixture
+def index(tmp_path):
+    with FulltextIndex(str(tmp_path / 'index.sqlite')) as index:
+        yield index
+
+
+def references(results):
+    return [a['reference'] for a in results]
+
+
+def test_update_indexes_new_changed_and_removed_abstracts(index):
+    assert index.update(ABSTRACTS) == (4, 0)
+    assert index.update(ABSTRACTS) == (0, 0)
+    changed = [dict(ABSTRACTS[0], title='Perivascular spaces')] + ABSTRACTS[1:3]
+    assert index.update(changed) == (1, 1)
+    assert references(index.search('perivascular')) == ['#1']
+    assert index.search('glymphatic') == []
+    assert references(index.search(thresholds={'diffusion': 5})) == ['#2']
+
+
+def test_search_query_syntax(index):
+    index.update(ABSTRACTS)
+    # porter stemming, phrases, prefixes and columns
+    assert references(index.search('glymphatics')) == ['#1']
+    assert references(index.search('"blood brain barrier"')) == ['#4']
+    assert references(index.search('"blood brain barrier"', program_only=False)) == ['#3', '#4']
+    assert references(index.search('tract*')) == ['#2']
+    assert references(index.search('keywords:bbb OR title:water')) == ['#1', '#4']
+
+
+def test_search_category_thresholds(index):
+    index.update(ABSTRACTS)
+    assert references(index.search(thresholds={'diffusion': 6})) == ['#2', '#4']
+    assert references(index.search(thresholds={'diffusion': 6, 'brain function': 3})) == ['#2']
+    assert references(index.search(thresholds={'diffusion': 9, 'brain function': 8}, any_category=True)) == ['#1', '#2']
+    assert references(index.search('white', thresholds={'diffusion': 9})) == ['#2']
+
+
+def test_results_follow_the_order_of_the_abstracts(index):
+    index.update(ABSTRACTS)
+    index.update(list(reversed(ABSTRACTS)))
+    assert references(index.search(program_only=False)) == ['#4', '#3', '#2', '#1']
+
+
+def test_records_with_null_category_scores(index):
+    index.update(ABSTRACTS + [dict(abstract('#5', 'Glymphatic flow'), category_scores=None)])
+    assert references(index.search('glymphatic')) == ['#1', '#5']
+    assert references(index.search(thresholds={'diffusion': 0})) == ['#2', '#4']
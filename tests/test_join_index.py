@@ -0,0 +1,46 @@
+import pytest
+
+from join_index import KeyIndex, field_key, join
+
+SESSIONS = [{'Id': '101', 'session': 'A'}, {'Id': '102', 'session': 'B'}, {'Id': '103', 'session': 'C'}]
+
+
+def test_key_index_keeps_the_first_duplicate():
+    index = KeyIndex([{'reference': '#1', 'v': 1}, {'reference': '#1', 'v': 2}, {'reference': '#2', 'v': 3}],
+                     'reference')
+    assert len(index) == 2
+    assert index['#1']['v'] == 1
+    assert index.duplicates == ['#1']
+
+
+def test_field_key_prefix():
+    assert field_key('Id', '#')({'Id': 101}) == '#101'
+
+
+def test_left_join_keeps_order_and_unmatched_records():
+    abstracts = [{'reference': '#103'}, {'reference': '#999'}, {'reference': '#101'}]
+    result = join(abstracts, KeyIndex(SESSIONS, field_key('Id', '#')), 'reference')
+    assert [(a['reference'], s and s['session']) for a, s in result] == [('#103', 'C'), ('#999', None),
+                                                                          ('#101', 'A')]
+    assert result.unmatched_left == ['#999']
+    assert result.unmatched_right == ['#102']
+    assert result.repeated_left == []
+
+
+def test_inner_join_drops_unmatched_records():
+    abstracts = [{'reference': '#103'}, {'reference': '#999'}]
+    result = join(abstracts, KeyIndex(SESSIONS, field_key('Id', '#')), 'reference', how='inner')
+    assert len(result) == 1
+    assert result.unmatched_left == ['#999']
+
+
+def test_repeated_left_keys():
+    abstracts = [{'reference': '#101'}, {'reference': '#101'}]
+    index = KeyIndex(SESSIONS, field_key('Id', '#'))
+    assert join(abstracts, index, 'reference').repeated_left == ['#101']
+    assert join(abstracts, index, 'reference', one_to_one=False).repeated_left == []
+
+
+def test_unsupported_join_type():
+    with pytest.raises(ValueError):
+        join([], KeyIndex([], 'reference'), 'reference', how='outer')
@@ -0,0 +1,23 @@
+from pipeline import local_modules
+
+
+def write(folder, name, source):
+    path = folder / name
+    path.write_text(source, encoding='utf-8')
+    return str(path)
+
+
+def test_local_modules_of_all_import_forms(tmp_path):
+    script = write(tmp_path, 'script.py', 'import os, first\nfrom second import x\n\n'
+                                         'def f():\n    import third.sub as t, json\n')
+    for name in ['first', 'second', 'third', 'fourth']:
+        write(tmp_path, name + '.py', '')
+    write(tmp_path, 'second.py', 'import sys, fourth\n')
+    assert local_modules(script) == [str(tmp_path / f'{name}.py') for name in ['first', 'fourth', 'second', 'third']]
+
+
+def test_local_modules_of_a_file_that_cannot_be_parsed(tmp_path):
+    script = write(tmp_path, 'script.py', 'import os, first\nfrom second import x\nprint(f"{")\n')
+    write(tmp_path, 'first.py', '')
+    write(tmp_path, 'second.py', '')
+    assert local_modules(script) == [str(tmp_path / 'first.py'), str(tmp_path / 'second.py')]